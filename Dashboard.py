@@ -1,10 +1,10 @@
 import threading, traceback, datetime
 from models import ClientProfile
-from app import run_discovery
-from reporter import save_results, generate_todo
+from worker import discover
+from reporter import generate_todo
+from store import get_store
 
 import tkinter as tk
-from PIL import Image, ImageTk
 import os
 from typing import Optional
 
@@ -51,6 +51,8 @@ class DashboardApp:
 
         if logo_path:
             try:
+                # Pillow is only needed for this, so it is not imported at startup
+                from PIL import Image, ImageTk
                 pil_logo = Image.open(logo_path)
                 # Scale logo to fit nicely in the left panel
                 logo_height = 180
@@ -264,13 +266,15 @@ class DashboardApp:
                 except Exception:
                     pass
 
-            # Include all sites listed in sites.json, even if marked disabled
-            results = run_discovery(profile, progress_cb=progress_cb, include_disabled=True)
+            # Include all sites listed in sites.json, even if marked disabled.
+            # Runs on the worker daemon when one is up, so closing the window doesn't stop the scan
+            results, _, run_id = discover(profile, progress_cb=progress_cb, include_disabled=True, source="dashboard")
 
             # Save reports into reports/<slug>_<YYYYmmdd-HHMMSS>*
             ts = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
             outdir = os.path.join("reports", full_name.lower().replace(" ", "_"))
-            csv_path, json_path, txt_path = save_results(full_name, results, outdir)
+            # The run is kept in the results store; these files are an export of it
+            csv_path, json_path, txt_path = get_store().export(run_id, outdir)
             checklist = generate_todo(full_name, profile, results)
 
             # Update UI on main thread
@@ -1,11 +1,9 @@
 import tkinter as tk
 from tkinter import ttk
 import threading
-import time
 from typing import Optional
 from datetime import datetime
-from brokers import get_brokers, get_specialized
-from utils import search_site_for_name
+from models import ClientProfile
 
 
 class WebClearApp:
@@ -88,15 +86,18 @@ class WebClearApp:
         self.root.bind("<Escape>", lambda e: self.root.attributes('-fullscreen', False))
 
     def _start_web_clear(self):
-        # Placeholder handler; wire to your clearing workflow here
         name = self.name_entry.get().strip()
         city = self.city_entry.get().strip()
         state = self.state_entry.get().strip()
 
-        # Kick off async workflow (placeholder demo) and update progress bar
+        if not name:
+            self._set_progress(0, "Enter a full name first")
+            return
+
+        # Run discovery in the background and update the progress bar
         self._disable_inputs(True)
         self._set_progress(0, "Starting...")
-        threading.Thread(target=self._simulate_clear_workflow,
+        threading.Thread(target=self._run_clear_workflow,
                          args=(name, city, state), daemon=True).start()
 
     def _go_back(self):
@@ -120,125 +121,104 @@ class WebClearApp:
         for w in (self.name_entry, self.city_entry, self.state_entry):
             w.configure(state=state)
 
-    def _simulate_clear_workflow(self, name: str, city: str, state: str):
+    def _run_clear_workflow(self, name: str, city: str, state: str):
+        # Same registry and engine as the CLI and Dashboard (through the worker when one is running)
+        from app import selected_plugins
+        from worker import discover
         started_all = datetime.now().isoformat(timespec="seconds")
 
-        # Helper to animate progress smoothly to a target percent
-        def _progress_to(target: int, label: str, delay: float = 0.02):
-            while self.progress_var.get() < target:
-                current = self.progress_var.get() + 1
-                self.root.after(0, self._set_progress, current, label)
-                time.sleep(delay)
-
-        # Initial validation and setup
-        _progress_to(5, "Validating input")
-        _progress_to(10, "Loading providers")
-
-        # Load providers from sites.json via brokers package
-        providers = [{"key": b["key"], "display": b["display"], "domain": b.get("domain")} for b in get_brokers()]
-        if not providers:
-            providers = [{"key": "default", "display": "Default Provider"}]
-        provider_results = {}
+        def progress_cb(percent: int, message: str = ""):
+            self.root.after(0, self._set_progress, min(99, int(percent)), message)
 
-        # Distribute progress roughly evenly across providers (10%..95%)
-        base = 10
-        span = 85
-        per = max(1, span // max(1, len(providers)))
-
-        for idx, p in enumerate(providers):
-            p_start = base + per * idx
-            p_end = base + per * (idx + 1) - 1
-            key = p["key"]
-            disp = p["display"]
-            domain = p.get("domain")
-            started = datetime.now().isoformat(timespec="seconds")
-
-            # Phase 1: search via specialized broker if available; otherwise fallback
-            step1 = min(p_start + max(1, per // 3), p_end)
-            _progress_to(step1, f"{disp}: searching")
-            urls = []
-            err_msg = None
-            try:
-                if domain and name:
-                    spec = get_specialized(domain)
-                    if spec is not None:
-                        urls = spec(name, city or None, state or None, timeout=12.0, limit=5)
-                    else:
-                        urls = search_site_for_name(domain, name, city or None, state or None, limit=3, timeout=12.0)
-            except Exception as e:
-                urls = []
-                err_msg = str(e)
-
-            # Phase 2: basic analysis
-            step2 = min(p_start + max(2, (2 * per) // 3), p_end)
-            _progress_to(step2, f"{disp}: analyzing")
-            time.sleep(0.02)
-            _progress_to(p_end, f"{disp}: done")
-
-            finished = datetime.now().isoformat(timespec="seconds")
-            provider_results[key] = {
-                "display_name": disp,
-                "status": "found" if urls else "not_found",
-                "message": ("Matches found" if urls else (err_msg or "No results detected")),
+        profile = ClientProfile(name=name, city=(city or None), state=(state or None))
+        plugins = selected_plugins(include_disabled=True)
+        provider_results = {}
+        status = "completed"
+        journal = stored_id = None
+        try:
+            results, journal, stored_id = discover(profile, progress_cb=progress_cb, include_disabled=True,
+                                                   source="webclear")
+        except Exception as e:
+            results, status = [], f"failed: {e}"
+
+        finished = datetime.now().isoformat(timespec="seconds")
+        times = journal.tasks(profile) if journal is not None else {}
+
+        def _stamp(ts, default):
+            return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else default
+
+        for plugin, r in zip(plugins, results):
+            urls = [r.url] if r.found and r.url else []
+            t = times.get(plugin.name) or {}
+            provider_results[plugin.key] = {
+                "display_name": plugin.name,
+                "domain": plugin.domain,
+                "status": "found" if r.found else "not_found",
+                "message": ("Matches found" if r.found else (r.notes or "No results detected")),
                 "records_found": len(urls),
                 "opt_out_submitted": False,
                 "urls": urls,
-                "started_at": started,
-                "finished_at": finished,
+                "title": r.title,
+                "started_at": _stamp(t.get("started_at"), started_all),
+                "finished_at": _stamp(t.get("finished_at"), finished),
             }
 
-            # Small throttle between providers to avoid rate limiting
-            time.sleep(0.2)
-
-        # Final wrap-up to 100%
-        _progress_to(100, "Completed")
         finished_all = datetime.now().isoformat(timespec="seconds")
 
         summary = f"Done: {name or 'N/A'}" + (f", {city}" if city else "") + (f", {state}" if state else "")
 
-        # Save a detailed report with provider results
+        # Keep the detailed report with the run in the results store; "Open Report" exports it
+        report = {
+            "name": name,
+            "city": city,
+            "state": state,
+            "status": status,
+            "started_at": started_all,
+            "finished_at": finished_all,
+            "providers": provider_results,
+        }
+        run_id = run_status = None
         try:
-            from reporter import save_webclear_report
-        except Exception:
-            save_webclear_report = None
-
-        report_path = None
-        try:
-            if save_webclear_report is not None:
-                report_path = save_webclear_report({
-                    "name": name,
-                    "city": city,
-                    "state": state,
-                    "status": "completed",
-                    "started_at": started_all,
-                    "finished_at": finished_all,
-                    "providers": provider_results,
-                })
+            from store import FAILED, OK, get_store
+            rs = get_store()
+            if stored_id is not None:
+                run_id = stored_id
+                rs.set_meta(run_id, report)
+            else:
+                # Kept for its report, but a failed scan is never the client's latest run
+                run_id = rs.add_run(profile, [], source="webclear", meta=report, status=FAILED)
+            run_status = (rs.run(run_id) or {}).get("status")
         except Exception:
-            report_path = None
-
-        self._last_report_path = report_path
-        self.root.after(0, self._set_progress, 100, summary if not report_path else f"Completed • Saved: {report_path}")
+            run_id = None
+
+        self._last_run_id = run_id
+        if run_id:
+            # What the store recorded (a run the worker marked failed included), not what this thread assumed
+            outcome = "Completed" if run_status == OK else "Failed"
+            message = f"{outcome} • Stored as run #{run_id}"
+        else:
+            message = summary if status == "completed" else f"Scan {status}"
+        self.root.after(0, self._set_progress, 100, message)
         self.root.after(0, self._disable_inputs, False)
-        if report_path:
-            self.root.after(0, self._show_report_ui, report_path)
+        if run_id:
+            self.root.after(0, self._show_report_ui, f"Run #{run_id}")
 
     # Public hook to allow an external clearing routine to update progress
     def update_progress(self, percent: int, message: Optional[str] = None):
         self._set_progress(percent, message)
 
     # --- Report helpers ---
-    def _show_report_ui(self, path: str):
+    def _show_report_ui(self, label: str):
         if getattr(self, "report_frame", None):
             try:
-                self.report_path_var.set(path)
+                self.report_path_var.set(label)
             except Exception:
                 pass
             return
         self.report_frame = tk.Frame(self.card, bg="#333333")
         self.report_frame.pack(fill="x", padx=40, pady=(12, 0))
-        tk.Label(self.report_frame, text="Report saved:", fg="#dddddd", bg="#333333").pack(side="left")
-        self.report_path_var = tk.StringVar(value=path)
+        tk.Label(self.report_frame, text="Report stored:", fg="#dddddd", bg="#333333").pack(side="left")
+        self.report_path_var = tk.StringVar(value=label)
         tk.Label(self.report_frame, textvariable=self.report_path_var, fg="#aaaaaa", bg="#333333").pack(side="left", padx=(6, 12))
         open_btn = tk.Button(self.report_frame, text="Open Report", bg="#ffffff", fg="#000000",
                              relief="solid", borderwidth=1, command=self._open_report)
@@ -246,8 +226,15 @@ class WebClearApp:
 
     def _open_report(self):
         import os, platform, subprocess
-        path = getattr(self, "_last_report_path", None)
-        if not path or not os.path.exists(path):
+        run_id = getattr(self, "_last_run_id", None)
+        if not run_id:
+            return
+        # Exported on demand from the results store (one file per run, rewritten on each open)
+        try:
+            from store import get_store
+            from reporter import save_webclear_report
+            path = save_webclear_report(get_store().run(run_id)["meta"], run_id=run_id)
+        except Exception:
             return
         system = platform.system()
         try:
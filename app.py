@@ -1,51 +1,544 @@
-import argparse, importlib, json, os
+import argparse, asyncio, csv, json, os, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import replace
+from typing import List, Optional
 from dotenv import load_dotenv
 from models import ClientProfile, BrokerResult
 from reporter import save_results, print_summary, generate_todo
+from brokers import BrokerPlugin, BrokerRegistry, async_adapter, get_async_search, load_module
+import brokers
+from ratelimit import host_key
+from singleflight import SingleFlight, AsyncSingleFlight
+from monitor import Monitor, format_changes, site_key
+from journal import Run, open_run
+from tracing import Tracer, traced_broker
+from sinks import StreamSink, read_results, stream_path
+import cache, jobqueue, metrics, parsepool, policy, ratelimit, replay, session, store
 
-def load_sites():
+def load_config():
     with open("sites.json", "r", encoding="utf-8") as f:
-        return json.load(f)["brokers"]
+        return json.load(f)
 
-def run_discovery(profile: ClientProfile, progress_cb=None, include_disabled: bool = False):
-    """Run discovery across configured sites.
+def load_sites():
+    return load_config()["brokers"]
+
+def apply_site_config(config):
+    """Push per-site/per-host tuning from sites.json into the shared HTTP layer."""
+    raw_sites = config.get("brokers", [])
+    ratelimit.configure_from_sites(raw_sites, config.get("hosts"))
+    session.configure_from_sites(raw_sites, config.get("hosts"))
+    cache.configure_from_sites(raw_sites, config.get("hosts"))
+    policy.configure_from_sites(raw_sites, config.get("hosts"))
+
+DEFAULT_MAX_WORKERS = 8
+
+def _max_workers(value=None) -> int:
+    """Resolve the global concurrency limit (argument, ARGUS_MAX_WORKERS, default)."""
+    if value is None:
+        value = os.getenv("ARGUS_MAX_WORKERS") or DEFAULT_MAX_WORKERS
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_WORKERS
+
+def _site_label(site) -> str:
+    return site.get("name") or site.get("module") or "unknown"
+
+def _error_result(site, exc: Exception) -> BrokerResult:
+    # Ensure one broken site does not stall the run
+    return BrokerResult(
+        broker=_site_label(site),
+        found=False,
+        notes=f"Error during search: {exc}"
+    )
 
-    If provided, progress_cb will be called as progress_cb(percent:int, message:str).
+def _with_optout(site, r: BrokerResult) -> BrokerResult:
+    if site.get("optout_url") and not r.notes:
+        r.notes = f"Opt-out: {site['optout_url']}"
+    return r
+
+def _count_result(site, r: BrokerResult, seconds: float):
+    broker = _site_label(site)
+    outcome = "error" if (r.notes or "").startswith("Error during search") else ("found" if r.found else "not_found")
+    metrics.inc("argus_broker_results_total", {"broker": broker, "outcome": outcome})
+    metrics.observe("argus_broker_seconds", seconds, {"broker": broker})
+
+def _query_key(profile: ClientProfile, site):
+    """Normalized identity of the logical search a site performs.
+
+    Duplicate domains, display-name aliases ("Information" vs information.com)
+    and disabled copies of a site all map to the same key.
     """
-    results = []
-    raw_sites = load_sites()
-    sites = [s for s in raw_sites if (include_disabled or not s.get("disabled"))]
-    total = max(1, len(sites))
+    target = ""
+    if site.get("module") == "generic":
+        target = host_key(site.get("domain") or site.get("name") or "")
+    fields = (profile.name, profile.city, profile.state, profile.phone, profile.address)
+    return (site.get("module"), target) + tuple(" ".join((v or "").lower().split()) for v in fields)
 
-    if progress_cb:
-        progress_cb(0, "Starting discovery")
+def _shared_copy(site, r: BrokerResult) -> BrokerResult:
+    # Each site gets its own copy so labels/notes can differ between aliases
+    if site.get("module") == "generic":
+        return replace(r, broker=site.get("name") or r.broker)
+    return replace(r)
 
-    for idx, site in enumerate(sites):
-        module_name = f"brokers.{site['module']}"
-        if progress_cb:
-            progress_cb(int((idx / total) * 100), f"Searching {site.get('name') or site.get('module')}")
+def _call_broker(profile: ClientProfile, site) -> BrokerResult:
+    if parsepool.get_pool() is not None and parsepool.splittable(site):
+        return parsepool.search(profile, site)
+    mod = load_module(site['module'])
+    # Generic broker requires site metadata (domain, etc.)
+    if site.get('module') == 'generic':
+        return mod.search(profile, site)  # type: ignore[call-arg]
+    return mod.search(profile)
+
+async def _async_call_broker(profile: ClientProfile, site) -> BrokerResult:
+    if parsepool.get_pool() is not None and parsepool.splittable(site):
+        return await parsepool.async_search(profile, site)
+    search = get_async_search(load_module(site['module']))
+    if site.get('module') == 'generic':
+        return await search(profile, site)
+    return await search(profile)
+
+def _search_site(profile: ClientProfile, site, flights: Optional[SingleFlight] = None,
+                 monitor: Optional[Monitor] = None, tracer: Optional[Tracer] = None) -> BrokerResult:
+    call = monitor.search if monitor is not None else _call_broker
+    started = time.perf_counter()
+    with traced_broker(tracer, _site_label(site)):
         try:
-            mod = importlib.import_module(module_name)
-            # Generic broker requires site metadata (domain, etc.)
-            if site.get('module') == 'generic':
-                r: BrokerResult = mod.search(profile, site)  # type: ignore[call-arg]
+            if flights is None:
+                r = call(profile, site)
             else:
-                r: BrokerResult = mod.search(profile)
+                r = _shared_copy(site, flights.do(_query_key(profile, site), call, profile, site))
         except Exception as e:
-            # Ensure one broken site does not stall the run
-            r = BrokerResult(
-                broker=site.get("name") or site.get("module") or "unknown",
-                found=False,
-                notes=f"Error during search: {e}"
-            )
-        if site.get("optout_url") and not r.notes:
-            r.notes = f"Opt-out: {site['optout_url']}"
-        results.append(r)
+            r = _error_result(site, e)
+    _count_result(site, r, time.perf_counter() - started)
+    return _with_optout(site, r)
+
+async def _async_search_site(profile: ClientProfile, site, flights: Optional[AsyncSingleFlight] = None,
+                             monitor: Optional[Monitor] = None, tracer: Optional[Tracer] = None) -> BrokerResult:
+    call = async_adapter(monitor.search) if monitor is not None else _async_call_broker
+    started = time.perf_counter()
+    with traced_broker(tracer, _site_label(site)):
+        try:
+            if flights is None:
+                r = await call(profile, site)
+            else:
+                r = _shared_copy(site, await flights.do(_query_key(profile, site), call, profile, site))
+        except Exception as e:
+            r = _error_result(site, e)
+    _count_result(site, r, time.perf_counter() - started)
+    return _with_optout(site, r)
+
+def load_registry(config=None) -> BrokerRegistry:
+    """Broker registry for sites.json (plus installed plugins); modules load on first search."""
+    return brokers.load_registry(config=config if config is not None else load_config())
+
+def selected_plugins(include_disabled: bool = False) -> List[BrokerPlugin]:
+    """The brokers a discovery run covers, in the order of its results.
+
+    Also pushes the sites.json tuning into the HTTP layer, so every entry
+    point (CLI, Dashboard, WebClear) runs with the same limits.
+    """
+    config = load_config()
+    apply_site_config(config)
+    return load_registry(config).enabled(include_disabled)
+
+def _selected_sites(include_disabled: bool):
+    return [p.site for p in selected_plugins(include_disabled)]
+
+def _batch_enabled(value: Optional[bool] = None) -> bool:
+    """Batched site: search is on unless disabled by argument or ARGUS_BATCH_SEARCH=0."""
+    if value is not None:
+        return bool(value)
+    return (os.getenv("ARGUS_BATCH_SEARCH") or "1").strip().lower() not in ("0", "false", "no", "off")
+
+def _plan_tasks(sites, batch: bool, skip=()):
+    """Split site indices into (indices, batched) tasks, leaving out those in skip.
+
+    With batching, generic sites are grouped by normalized domain into chunks
+    of brokers.generic.BATCH_SIZE, each covered by one OR-combined query.
+    """
+    if not batch:
+        return [([i], False) for i in range(len(sites)) if i not in skip]
+    from brokers.generic import BATCH_SIZE
+    tasks = []
+    by_domain = {}
+    for i, site in enumerate(sites):
+        if i in skip:
+            continue
+        if site.get("module") == "generic":
+            by_domain.setdefault(host_key(site.get("domain") or site.get("name") or ""), []).append(i)
+        else:
+            tasks.append(([i], False))
+    groups = list(by_domain.values())
+    for start in range(0, len(groups), BATCH_SIZE):
+        tasks.append(([i for g in groups[start:start + BATCH_SIZE] for i in g], True))
+    return sorted(tasks, key=lambda t: t[0][0])
+
+def _search_group(profile: ClientProfile, group, tracer: Optional[Tracer] = None) -> List[BrokerResult]:
+    from brokers import generic
+    label = _site_label(group[0]) + (f" (+{len(group) - 1} batched)" if len(group) > 1 else "")
+    started = time.perf_counter()
+    with traced_broker(tracer, label):
+        try:
+            rs = generic.search_batch(profile, group)
+        except Exception as e:
+            rs = [_error_result(site, e) for site in group]
+    for site, r in zip(group, rs):
+        # The group's time is shared by its sites
+        _count_result(site, r, (time.perf_counter() - started) / len(group))
+    return [_with_optout(site, r) for site, r in zip(group, rs)]
+
+def _run_task(profile: ClientProfile, sites, task, flights: Optional[SingleFlight] = None,
+              monitor: Optional[Monitor] = None, tracer: Optional[Tracer] = None,
+              journal: Optional[Run] = None) -> List[BrokerResult]:
+    idxs, batched = task
+    if journal is not None:
+        for i in idxs:
+            journal.started(profile, sites[i])
+    if batched:
+        rs = _search_group(profile, [sites[i] for i in idxs], tracer)
+    else:
+        rs = [_search_site(profile, sites[idxs[0]], flights, monitor, tracer)]
+    if journal is not None:
+        for i, r in zip(idxs, rs):
+            journal.finished(profile, sites[i], r)
+    return rs
+
+async def _async_run_task(profile: ClientProfile, sites, task, flights: Optional[AsyncSingleFlight] = None,
+                          monitor: Optional[Monitor] = None, tracer: Optional[Tracer] = None,
+                          journal: Optional[Run] = None) -> List[BrokerResult]:
+    idxs, batched = task
+    if journal is not None:
+        for i in idxs:
+            journal.started(profile, sites[i])
+    if batched:
+        rs = await async_adapter(_search_group)(profile, [sites[i] for i in idxs], tracer)
+    else:
+        rs = [await _async_search_site(profile, sites[idxs[0]], flights, monitor, tracer)]
+    if journal is not None:
+        for i, r in zip(idxs, rs):
+            journal.finished(profile, sites[i], r)
+    return rs
+
+def _resumed(profile: ClientProfile, sites, journal: Optional[Run]):
+    """{site index: result} for brokers this journal run already finished for the client."""
+    if journal is None:
+        return {}
+    done = journal.completed(profile)
+    return {i: done[site_key(site)] for i, site in enumerate(sites) if site_key(site) in done}
+
+def _task_label(sites, task) -> str:
+    idxs, batched = task
+    label = _site_label(sites[idxs[0]])
+    return f"{label} (+{len(idxs) - 1} batched)" if batched and len(idxs) > 1 else label
+
+class _Discovery:
+    """Per-task bookkeeping shared by the discovery engines.
+
+    Plans every client's tasks (leaving out brokers the journal already
+    finished, whose saved results are delivered straight away), runs a task
+    (call/acall) and records each result as it arrives: results list, monitor,
+    sink, progress and, once a client's last broker is in, sink.finish and
+    on_client_done. The engines only decide how tasks are scheduled.
+    """
+
+    def __init__(self, profiles: List[ClientProfile], include_disabled: bool = False,
+                 batch_search: Optional[bool] = None, monitors: Optional[List[Optional[Monitor]]] = None,
+                 tracer: Optional[Tracer] = None, sink: Optional[StreamSink] = None, journal: Optional[Run] = None,
+                 progress_cb=None, on_client_done=None, keep_results: bool = True, per_client: bool = False):
+        self.profiles = profiles
+        self.sites = _selected_sites(include_disabled)
+        self.monitors = monitors or [None] * len(profiles)
+        self.tracer, self.sink, self.journal = tracer, sink, journal
+        self.progress_cb, self.on_client_done = progress_cb, on_client_done
+        self.keep_results = keep_results
+        self.per_client = per_client  # progress messages name the client (batch runs)
+        self.results: List[List[Optional[BrokerResult]]] = [[None] * len(self.sites) for _ in profiles]
+        self.remaining = [len(self.sites) for _ in profiles]
+        self.total = max(1, len(self.sites) * len(profiles))
+        self.done = 0
+        # Batched groups bypass the monitor, so incremental runs search site by site
+        batch = _batch_enabled(batch_search) and all(m is None for m in self.monitors)
+        resumed = [_resumed(profile, self.sites, journal) for profile in profiles]
+        self.plans = [_plan_tasks(self.sites, batch, skip) for skip in resumed]
         if progress_cb:
-            progress_cb(int(((idx + 1) / total) * 100), f"Processed {site.get('name') or site.get('module')}")
-    if progress_cb:
-        progress_cb(100, "Discovery complete")
-    return results
+            if per_client:
+                progress_cb(0, f"Starting discovery for {len(profiles)} clients")
+            elif resumed and resumed[0]:
+                progress_cb(0, f"Resuming: {len(resumed[0])} brokers already done")
+            else:
+                progress_cb(0, "Starting discovery")
+        for c, profile in enumerate(profiles):
+            for idx, r in resumed[c].items():
+                self.deliver(c, idx, r)
+            if not self.sites and on_client_done:
+                on_client_done(profile, self.results[c])
+
+    def tasks(self) -> List:
+        """Every planned task as (client index, task)."""
+        return [(c, task) for c, plan in enumerate(self.plans) for task in plan]
+
+    def call(self, c: int, task, flights: Optional[SingleFlight] = None) -> List[BrokerResult]:
+        return _run_task(self.profiles[c], self.sites, task, flights, self.monitors[c], self.tracer, self.journal)
+
+    async def acall(self, c: int, task, flights: Optional[AsyncSingleFlight] = None) -> List[BrokerResult]:
+        return await _async_run_task(self.profiles[c], self.sites, task, flights, self.monitors[c], self.tracer,
+                                     self.journal)
+
+    def deliver(self, c: int, idx: int, r: BrokerResult):
+        self.results[c][idx] = r
+        if self.monitors[c] is not None:
+            self.monitors[c].record(self.sites[idx], r)
+        if self.sink is not None:
+            self.sink.write(self.profiles[c], idx, r)
+        self.remaining[c] -= 1
+        self.done += 1
+        if self.remaining[c] == 0:
+            if self.sink is not None:
+                self.sink.finish(self.profiles[c])
+            if self.on_client_done:
+                self.on_client_done(self.profiles[c], self.results[c])
+            if not self.keep_results:
+                self.results[c] = []
+
+    def task_done(self, c: int, task, rs: List[BrokerResult]):
+        for idx, r in zip(task[0], rs):
+            self.deliver(c, idx, r)
+        if self.progress_cb:
+            label = _task_label(self.sites, task) + (f" for {self.profiles[c].name}" if self.per_client else "")
+            self.progress_cb(int((self.done / self.total) * 100), f"Processed {label}")
+
+    def finish(self) -> List[List[Optional[BrokerResult]]]:
+        if self.journal is not None:
+            self.journal.complete()
+        if self.progress_cb:
+            self.progress_cb(100, "Discovery complete")
+        return self.results
+
+def run_discovery(profile: ClientProfile, progress_cb=None, include_disabled: bool = False,
+                  max_workers: Optional[int] = None, batch_search: Optional[bool] = None,
+                  monitor: Optional[Monitor] = None, tracer: Optional[Tracer] = None,
+                  sink: Optional[StreamSink] = None, journal: Optional[Run] = None):
+    """Run discovery across configured sites.
+
+    Sites are searched concurrently on up to max_workers threads (defaults to
+    ARGUS_MAX_WORKERS, else DEFAULT_MAX_WORKERS). Generic sites are grouped into
+    batched site: queries unless batch_search is False. Results keep sites.json order.
+
+    With a monitor.Monitor, pages are fetched conditionally and only re-parsed
+    when they changed; every result is recorded on it for change detection.
+    Batched search is turned off then: a combined site: query has no per-site
+    page to compare.
+    With a tracing.Tracer, every broker search and its stages (rate wait, HTTP,
+    backoff, parse) are recorded as spans.
+    With a sinks.StreamSink, each result is written out as soon as its broker
+    finishes (sink.write), and sink.finish(profile) is called at the end.
+    With a journal.Run, every broker is checkpointed before and after it runs;
+    brokers the run already finished (an interrupted run being resumed) are
+    not searched again, and the run is marked complete at the end.
+
+    If provided, progress_cb will be called as progress_cb(percent:int, message:str),
+    always from the calling thread.
+    """
+    run = _Discovery([profile], include_disabled, batch_search, [monitor], tracer, sink, journal, progress_cb)
+    tasks = run.tasks()
+    # Identical logical searches in this run share one network call and parse
+    flights = SingleFlight(memoize=True)
+    if tasks:
+        with ThreadPoolExecutor(max_workers=min(_max_workers(max_workers), len(tasks)),
+                                thread_name_prefix="broker") as pool:
+            futures = {pool.submit(run.call, c, task, flights): (c, task) for c, task in tasks}
+            for fut in as_completed(futures):
+                run.task_done(*futures[fut], fut.result())
+    return run.finish()[0]
+
+async def run_discovery_async(profile: ClientProfile, progress_cb=None, include_disabled: bool = False,
+                              max_concurrency: Optional[int] = None, batch_search: Optional[bool] = None,
+                              monitor: Optional[Monitor] = None, tracer: Optional[Tracer] = None,
+                              sink: Optional[StreamSink] = None, journal: Optional[Run] = None):
+    """Async counterpart of run_discovery driving every broker on the running event loop.
+
+    Brokers with a native async_search are awaited directly; legacy ones (and
+    batched generic groups) go through brokers.async_adapter. Several profiles
+    can be scanned at once with asyncio.gather(run_discovery_async(p1), ...).
+    """
+    run = _Discovery([profile], include_disabled, batch_search, [monitor], tracer, sink, journal, progress_cb)
+    sem = asyncio.Semaphore(_max_workers(max_concurrency))
+    flights = AsyncSingleFlight(memoize=True)
+
+    async def _one(c, task):
+        async with sem:
+            return c, task, await run.acall(c, task, flights)
+
+    for next_done in asyncio.as_completed([_one(c, task) for c, task in run.tasks()]):
+        run.task_done(*await next_done)
+    return run.finish()[0]
+
+def run_discovery_batch(profiles: List[ClientProfile], on_client_done=None, progress_cb=None,
+                        include_disabled: bool = False, max_workers: Optional[int] = None,
+                        batch_search: Optional[bool] = None, monitors: Optional[List[Monitor]] = None,
+                        tracer: Optional[Tracer] = None, sink: Optional[StreamSink] = None,
+                        keep_results: bool = True, journal: Optional[Run] = None):
+    """Run discovery for many clients through one shared worker pool.
+
+    Every (client x broker) task is submitted to the same pool, so the global
+    concurrency limit and the per-host rate limiter apply across the whole
+    batch. on_client_done(profile, results) is called from the calling thread
+    as soon as a client's last broker finishes; progress_cb as in run_discovery.
+    monitors, if given, holds one Monitor per profile (see run_discovery); a
+    tracer collects spans for the whole batch; a sink receives every result as
+    it completes and a journal checkpoints every task (see run_discovery).
+    Returns one result list per profile, in input order. With keep_results
+    False each client's list is dropped (left empty) once on_client_done has
+    seen it, so memory stays flat however many clients there are.
+    """
+    run = _Discovery(profiles, include_disabled, batch_search, monitors, tracer, sink, journal, progress_cb,
+                     on_client_done, keep_results, per_client=True)
+    tasks = run.tasks()
+    flights = SingleFlight(memoize=True)
+    if tasks:
+        with ThreadPoolExecutor(max_workers=min(_max_workers(max_workers), len(tasks)),
+                                thread_name_prefix="broker") as pool:
+            futures = {pool.submit(run.call, c, task, flights): (c, task) for c, task in tasks}
+            for fut in as_completed(futures):
+                run.task_done(*futures.pop(fut), fut.result())
+    return run.finish()
+
+_PROFILE_FIELDS = ("name", "city", "state", "phone", "address")
+
+def load_profiles(path: str) -> List[ClientProfile]:
+    """Read client profiles from a CSV (with a header row) or JSONL file."""
+    rows = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    profiles = []
+    for row in rows:
+        # JSONL values may be numbers (e.g. phone), not just strings
+        fields = {k: (str(row[k]).strip() or None) if row.get(k) is not None else None for k in _PROFILE_FIELDS}
+        if fields["name"]:
+            profiles.append(ClientProfile(**fields))
+    return profiles
+
+def load_latest(name: str) -> Optional[List[BrokerResult]]:
+    """The client's latest results: the (possibly partial) stream, else an older _latest.json."""
+    path = stream_path(name)
+    if os.path.exists(path):
+        return read_results(path)
+    legacy = stream_path(name, "json")
+    if os.path.exists(legacy):
+        with open(legacy, "r", encoding="utf-8") as f:
+            return [BrokerResult(**r) for r in json.load(f)]
+    return None
+
+def _timings_path(name: str) -> str:
+    return f".cache/{name.replace(' ', '_').lower()}_timings.json"
+
+def save_trace(profile: ClientProfile, tracer: Tracer, outdir: Optional[str] = None, fmt: str = "json") -> Optional[str]:
+    """Keep per-broker stage timings for `report`; with outdir, also export the full trace there."""
+    os.makedirs(".cache", exist_ok=True)
+    with open(_timings_path(profile.name), "w", encoding="utf-8") as f:
+        json.dump(tracer.broker_times(), f, indent=2)
+    if not outdir:
+        return None
+    suffix = "_trace.chrome.json" if fmt == "chrome" else "_trace.json"
+    return tracer.save(os.path.join(outdir, profile.name.replace(' ', '_').lower() + suffix), fmt)
+
+def load_timings(name: str):
+    path = _timings_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _start_metrics(args):
+    """Start the --metrics-port endpoint and --metrics-jsonl dumper; returns a stop() callable."""
+    server = metrics.serve(args.metrics_port) if args.metrics_port else None
+    dumper = metrics.JsonlDumper(args.metrics_jsonl, args.metrics_interval).start() if args.metrics_jsonl else None
+    if server is not None:
+        print(f"Metrics: http://127.0.0.1:{server.server_address[1]}/metrics")
+
+    def stop():
+        if dumper is not None:
+            dumper.stop()
+        if server is not None:
+            server.shutdown()
+    return stop
+
+def _add_client_args(p):
+    p.add_argument("--name", required=True)
+    p.add_argument("--city")
+    p.add_argument("--state")
+    p.add_argument("--phone")
+    p.add_argument("--address")
+
+def _profile_from(args) -> ClientProfile:
+    return ClientProfile(name=args.name, city=args.city, state=args.state, phone=args.phone, address=args.address)
+
+def _job_options(args) -> dict:
+    return {"incremental": args.incremental, "include_disabled": args.include_disabled}
+
+def _add_job_args(p):
+    p.add_argument("--incremental", action="store_true", help="Compare each run with the client's previous scan")
+    p.add_argument("--include-disabled", action="store_true", help="Also search sites marked disabled in sites.json")
+
+def _when(ts: Optional[float]) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else ""
+
+def _client_label(name: str, city: Optional[str] = None, state: Optional[str] = None) -> str:
+    """Client name with city/state when known (stored runs are kept per client identity)."""
+    where = ", ".join(v for v in (city, state) if v)
+    return f"{name} ({where})" if where else name
+
+def _print_jobs(jobs):
+    from tabulate import tabulate
+    rows = [{"id": j["id"], "client": j["client"]["name"], "status": j["status"],
+             "progress": f"{j['progress']}%", "found": "" if j["found"] is None else f"{j['found']}/{j['total']}",
+             "created": _when(j["created_at"]), "finished": _when(j["finished_at"]),
+             "message": (j["error"] or "").splitlines()[0] if j["error"] else (j["message"] or "")}
+            for j in jobs]
+    print(tabulate(rows, headers="keys", tablefmt="github") if rows else "No jobs.")
+
+def _add_metrics_args(p):
+    p.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this local port while running")
+    p.add_argument("--metrics-jsonl", help="Append a metrics snapshot to this JSONL file periodically")
+    p.add_argument("--metrics-interval", type=float, default=60.0, help="Seconds between --metrics-jsonl snapshots")
+
+def _add_journal_args(p):
+    p.add_argument("--fresh", action="store_true",
+                   help="Start a new run instead of resuming an interrupted one for the same client(s)")
+
+def _open_journal(profiles, fresh: bool) -> Optional[Run]:
+    run = open_run(profiles, resume=not fresh)
+    if run is not None and run.resumed:
+        print(f"Resuming interrupted run #{run.id} (use --fresh to start over)")
+    return run
+
+def _add_parse_args(p, default: int = 0):
+    p.add_argument("--parse-procs", type=int, default=default,
+                   help=f"Parse pages in this many processes, 0 = in the fetching threads (default {default})")
+
+def _add_replay_args(p):
+    g = p.add_mutually_exclusive_group()
+    g.add_argument("--record", metavar="ARCHIVE", help="Also save every HTTP response to this replay archive")
+    g.add_argument("--replay", metavar="ARCHIVE", help="Serve HTTP responses from this archive only (no network)")
+
+def _print_http_summary():
+    pool = parsepool.get_pool()
+    if pool is not None:
+        print(pool.summary())
+    tape = replay.get_archive()
+    if tape is not None:
+        print(tape.summary())
+        if tape.mode == replay.REPLAY:
+            return
+    print(session.pool_summary())
+    rc = cache.get_cache()
+    if rc is not None:
+        print(rc.summary())
+    print(policy.get_policy().summary())
 
 def main():
     load_dotenv()
@@ -53,37 +546,304 @@ def main():
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     p_disc = sub.add_parser("discover", help="Run discovery for a client")
-    p_disc.add_argument("--name", required=True)
-    p_disc.add_argument("--city")
-    p_disc.add_argument("--state")
-    p_disc.add_argument("--phone")
-    p_disc.add_argument("--address")
-
-    p_rep = sub.add_parser("report", help="Generate report after discovery")
-    p_rep.add_argument("--name", required=True)
+    _add_client_args(p_disc)
+    p_disc.add_argument("--workers", type=int, help="Max concurrent broker searches (default: ARGUS_MAX_WORKERS or 8)")
+    p_disc.add_argument("--async", dest="use_async", action="store_true",
+                        help="Drive brokers on one asyncio event loop instead of a thread pool")
+    p_disc.add_argument("--no-batch", dest="batch_search", action="store_false", default=None,
+                        help="Query each generic site separately instead of batched site: searches")
+    p_disc.add_argument("--incremental", action="store_true",
+                        help="Re-check against the last scan: skip unchanged pages and print only what changed"
+                             " (implies --no-batch)")
+    p_disc.add_argument("--trace", choices=("json", "chrome"),
+                        help="Export per-broker/per-stage timing spans in this format")
+    p_disc.add_argument("--trace-dir", default="reports/output", help="Where --trace writes <name>_trace*.json")
+    _add_metrics_args(p_disc)
+    _add_replay_args(p_disc)
+    _add_journal_args(p_disc)
+    _add_parse_args(p_disc)
+
+    p_batch = sub.add_parser("discover-batch", help="Run discovery for many clients from a CSV or JSONL file")
+    p_batch.add_argument("--input", required=True, help="CSV with a header row or JSONL; fields: name, city, state, phone, address")
+    p_batch.add_argument("--workers", type=int, help="Max concurrent broker searches across all clients")
+    p_batch.add_argument("--no-batch", dest="batch_search", action="store_false", default=None,
+                         help="Query each generic site separately instead of batched site: searches")
+    p_batch.add_argument("--incremental", action="store_true",
+                         help="Re-check each client against its last scan and print only what changed"
+                              " (implies --no-batch)")
+    p_batch.add_argument("--trace", choices=("json", "chrome"),
+                         help="Export timing spans for the whole batch in this format")
+    p_batch.add_argument("--trace-dir", default="reports/output", help="Where --trace writes batch_trace*.json")
+    _add_metrics_args(p_batch)
+    _add_replay_args(p_batch)
+    _add_journal_args(p_batch)
+    _add_parse_args(p_batch, parsepool.default_procs())
+
+    p_rep = sub.add_parser("report", help="Export a run as CSV/JSON/TXT (default: the client's latest)")
+    p_rep.add_argument("--name", help="Client whose latest run to export")
+    p_rep.add_argument("--run", type=int, help="Stored run id (see 'runs')")
     p_rep.add_argument("--out", default="reports/output")
 
+    p_runs = sub.add_parser("runs", help="List stored discovery runs")
+    p_runs.add_argument("--client", help="Only this client's runs")
+    p_runs.add_argument("--limit", type=int, default=20)
+
+    p_query = sub.add_parser("query", help="Which clients were found on which brokers (from the results store)")
+    p_query.add_argument("--broker", help="Broker name, e.g. Spokeo")
+    p_query.add_argument("--client", help="Only this client")
+    p_query.add_argument("--since", help="Only runs on or after this date (YYYY-MM-DD)")
+    p_query.add_argument("--month", action="store_true", help="Only runs this calendar month")
+    p_query.add_argument("--latest", action="store_true", help="Only each client's most recent run (listed right now)")
+
+    p_imp = sub.add_parser("import-reports", help="Load old per-run JSON files from reports/ into the results store")
+    p_imp.add_argument("--dir", default="reports")
+
+    p_sub = sub.add_parser("submit", help="Queue a discovery job for the worker and return immediately")
+    _add_client_args(p_sub)
+    _add_job_args(p_sub)
+    p_sub.add_argument("--priority", type=int, default=0, help="Higher runs first")
+
+    p_jobs = sub.add_parser("jobs", help="Show queued, running and finished jobs")
+    p_jobs.add_argument("--status", choices=("queued", "running", "done", "failed", "cancelled"))
+    p_jobs.add_argument("--limit", type=int, default=20)
+    p_jobs.add_argument("--schedules", action="store_true", help="List recurring schedules instead")
+
+    p_cancel = sub.add_parser("cancel", help="Cancel a queued job")
+    p_cancel.add_argument("id", type=int)
+
+    p_sched = sub.add_parser("schedule", help="Re-scan a client on a recurring schedule (run by the worker)")
+    p_sched_sub = p_sched.add_subparsers(dest="action", required=True)
+    p_sched_add = p_sched_sub.add_parser("add", help="Add a schedule")
+    _add_client_args(p_sched_add)
+    _add_job_args(p_sched_add)
+    p_sched_add.add_argument("--every", required=True, help="Interval, e.g. 12h, 7d, 2w")
+    p_sched_rm = p_sched_sub.add_parser("remove", help="Stop a schedule")
+    p_sched_rm.add_argument("id", type=int)
+
+    p_work = sub.add_parser("worker", help="Run queued and scheduled discovery jobs until stopped")
+    p_work.add_argument("--concurrency", type=int, default=2, help="Jobs run at the same time")
+    p_work.add_argument("--poll", type=float, default=2.0, help="Seconds between queue checks")
+    _add_metrics_args(p_work)
+    _add_parse_args(p_work)
+
+    p_node = sub.add_parser("node", help="Serve broker tasks to a cluster coordinator over HTTP")
+    p_node.add_argument("--host", default="127.0.0.1", help="Interface to listen on (0.0.0.0 for other machines)")
+    p_node.add_argument("--port", type=int, default=8701, help="0 picks a free port")
+    p_node.add_argument("--slots", type=int, help="Max concurrent tasks (default: ARGUS_MAX_WORKERS or 8)")
+    _add_metrics_args(p_node)
+
+    p_clu = sub.add_parser("cluster", help="Run discover-batch with the searches spread over several nodes")
+    p_clu.add_argument("--input", required=True, help="CSV with a header row or JSONL; fields: name, city, state, phone, address")
+    g = p_clu.add_mutually_exclusive_group(required=True)
+    g.add_argument("--nodes", help="Comma-separated node URLs, e.g. http://hostA:8701,http://hostB:8701")
+    g.add_argument("--local", type=int, metavar="N", help="Start N nodes on this machine for the run")
+    p_clu.add_argument("--no-batch", dest="batch_search", action="store_false", default=None,
+                       help="Query each generic site separately instead of batched site: searches")
+    _add_journal_args(p_clu)
+
     args = parser.parse_args()
+    stop_metrics = _start_metrics(args) if args.cmd in ("discover", "discover-batch", "worker", "node") else None
+    if getattr(args, "parse_procs", 0):
+        parsepool.configure(args.parse_procs)
+    if getattr(args, "record", None) or getattr(args, "replay", None):
+        replay.configure(replay.RECORD if args.record else replay.REPLAY, args.record or args.replay)
+    try:
+        _run_command(args)
+    finally:
+        # Also on errors and Ctrl-C, so --metrics-jsonl gets its final snapshot
+        if stop_metrics is not None:
+            stop_metrics()
 
+def _run_command(args):
     if args.cmd == "discover":
-        profile = ClientProfile(name=args.name, city=args.city, state=args.state,
-                                phone=args.phone, address=args.address)
-        results = run_discovery(profile)
-        os.makedirs(".cache", exist_ok=True)
-        with open(f".cache/{profile.name.replace(' ', '_').lower()}_latest.json", "w", encoding="utf-8") as f:
-            json.dump([r.to_dict() for r in results], f, indent=2, ensure_ascii=False)
-        print_summary(results)
+        profile = _profile_from(args)
+        monitor = Monitor.for_profile(profile) if args.incremental else None
+        tracer = Tracer(profile.name)
+        started = time.time()
+        # Results stream to .cache/<name>_latest.jsonl/.csv as each broker finishes
+        sink = StreamSink()
+        journal = _open_journal([profile], args.fresh)
+        try:
+            if args.use_async:
+                results = asyncio.run(run_discovery_async(profile, max_concurrency=args.workers,
+                                                          batch_search=args.batch_search, monitor=monitor,
+                                                          tracer=tracer, sink=sink, journal=journal))
+            else:
+                results = run_discovery(profile, max_workers=args.workers, batch_search=args.batch_search,
+                                        monitor=monitor, tracer=tracer, sink=sink, journal=journal)
+        finally:
+            sink.close()
+        run_id = store.record(profile, results, "discover", started_at=started, timings=tracer.broker_times())
+        trace_path = save_trace(profile, tracer, args.trace_dir if args.trace else None, args.trace or "json")
+        if trace_path:
+            print(f"Trace: {trace_path}")
+        if monitor is not None:
+            monitor.save()
+            print(format_changes(monitor.changes()))
+            print(monitor.summary())
+        else:
+            print_summary(results)
+        print(f"Stored as run #{run_id} (export with: report --run {run_id})")
+        _print_http_summary()
+
+    elif args.cmd == "discover-batch":
+        profiles = load_profiles(args.input)
+        if not profiles:
+            raise SystemExit(f"No client profiles found in {args.input}")
+
+        monitors = [Monitor.for_profile(p) for p in profiles] if args.incremental else None
+
+        def client_done(profile, results):
+            run_id = store.record(profile, results, "batch")
+            print(f"{profile.name}: {sum(1 for r in results if r.found)}/{len(results)} likely listings (run #{run_id})")
+
+        tracer = Tracer("batch") if args.trace else None
+        sink = StreamSink()
+        journal = _open_journal(profiles, args.fresh)
+        try:
+            run_discovery_batch(profiles, on_client_done=client_done, max_workers=args.workers,
+                                batch_search=args.batch_search, monitors=monitors, tracer=tracer,
+                                sink=sink, keep_results=False, journal=journal)
+        finally:
+            sink.close()
+        if tracer is not None:
+            suffix = "_trace.chrome.json" if args.trace == "chrome" else "_trace.json"
+            print(f"Trace: {tracer.save(os.path.join(args.trace_dir, 'batch' + suffix), args.trace)}")
+        for profile, monitor in zip(profiles, monitors or []):
+            monitor.save()
+            print(f"\n{profile.name}: {format_changes(monitor.changes())}\n{monitor.summary()}")
+        _print_http_summary()
 
     elif args.cmd == "report":
-        cache_path = f".cache/{args.name.replace(' ', '_').lower()}_latest.json"
-        if not os.path.exists(cache_path):
-            raise SystemExit("Run 'discover' first.")
-        with open(cache_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        results = [BrokerResult(**r) for r in data]
-        csv_path, json_path, txt_path = save_results(args.name, results, args.out)
+        if not (args.name or args.run):
+            raise SystemExit("Give --name or --run.")
+        rs = store.get_store()
+        run = rs.run(args.run) if args.run else rs.latest_run(args.name)
+        if args.run and run is None:
+            raise SystemExit(f"No stored run #{args.run}")
+        name = run["name"] if run else args.name
+        stream = stream_path(name)
+        # A scan interrupted after the last stored run is reported from its partial stream
+        if not args.run and os.path.exists(stream) and (run is None or os.path.getmtime(stream) > run["finished_at"]):
+            run = None
+        if run is not None:
+            results = rs.results(run["id"])
+            csv_path, json_path, txt_path = rs.export(run["id"], args.out)
+        else:
+            results = load_latest(name)
+            if not results:
+                raise SystemExit("Run 'discover' first.")
+            csv_path, json_path, txt_path = save_results(name, results, args.out, timings=load_timings(name))
         print(f"Saved: {csv_path}\nSaved: {json_path}\nSaved: {txt_path}\n")
-        print(generate_todo(args.name, ClientProfile(name=args.name), results))
+        print(generate_todo(name, ClientProfile(name=name), results))
+
+    elif args.cmd == "runs":
+        from tabulate import tabulate
+        rows = [{"run": r["id"], "client": _client_label(r["name"], r["city"], r["state"]), "source": r["source"], "status": r["status"],
+                 "finished": _when(r["finished_at"]), "found": f"{r['found']}/{r['total']}"}
+                for r in store.get_store().runs(args.client, limit=args.limit)]
+        print(tabulate(rows, headers="keys", tablefmt="github") if rows else "No stored runs.")
+
+    elif args.cmd == "query":
+        since = None
+        if args.month:
+            since = time.mktime(time.localtime()[:2] + (1, 0, 0, 0, 0, 0, -1))
+        elif args.since:
+            try:
+                since = time.mktime(time.strptime(args.since, "%Y-%m-%d"))
+            except ValueError:
+                raise SystemExit(f"Bad --since date {args.since!r} (use YYYY-MM-DD)")
+        from tabulate import tabulate
+        rows = [{"client": _client_label(r["client"], r["city"], r["state"]), "broker": r["broker"], "last seen": _when(r["seen_at"]), "runs": r["runs"],
+                 "run": r["run_id"], "url": r["url"] or ""}
+                for r in store.get_store().listings(args.broker, args.client, since, latest_only=args.latest)]
+        print(tabulate(rows, headers="keys", tablefmt="github") if rows else "No listings found.")
+        if rows:
+            print(f"\n{len({r['client'] for r in rows})} clients")
+
+    elif args.cmd == "import-reports":
+        rs = store.get_store()
+        print(f"Imported {rs.import_reports(args.dir)} runs from {args.dir}")
+        print(rs.summary())
+
+    elif args.cmd == "submit":
+        queue = jobqueue.get_queue()
+        job_id = queue.submit(_profile_from(args), _job_options(args), priority=args.priority)
+        print(f"Queued job #{job_id}" + ("" if queue.workers_alive() else " (no worker running: start one with 'app.py worker')"))
+
+    elif args.cmd == "jobs":
+        queue = jobqueue.get_queue()
+        if args.schedules:
+            from tabulate import tabulate
+            rows = [{"id": s["id"], "client": s["client"]["name"], "every": f"{s['every'] / 3600:g}h",
+                     "next run": _when(s["next_run_at"]), "last job": s["last_job_id"] or ""}
+                    for s in queue.schedules()]
+            print(tabulate(rows, headers="keys", tablefmt="github") if rows else "No schedules.")
+        else:
+            _print_jobs(queue.list(args.status, args.limit))
+            print(f"\nWorkers running: {queue.workers_alive()}")
+
+    elif args.cmd == "cancel":
+        if not jobqueue.get_queue().cancel(args.id):
+            raise SystemExit(f"Job #{args.id} is not queued (already running, finished or unknown)")
+        print(f"Cancelled job #{args.id}")
+
+    elif args.cmd == "schedule":
+        queue = jobqueue.get_queue()
+        if args.action == "add":
+            try:
+                every = jobqueue.parse_interval(args.every)
+            except ValueError as e:
+                raise SystemExit(str(e))
+            sched_id = queue.schedule(_profile_from(args), every, _job_options(args))
+            print(f"Schedule #{sched_id}: {args.name} every {args.every} (first run now)")
+        elif not queue.unschedule(args.id):
+            raise SystemExit(f"No schedule #{args.id}")
+        else:
+            print(f"Removed schedule #{args.id}")
+
+    elif args.cmd == "worker":
+        from worker import Worker
+        Worker(concurrency=args.concurrency, poll=args.poll).run()
+
+    elif args.cmd == "node":
+        import cluster
+        server = cluster.serve_node(args.port, args.host, args.slots)
+        host, port = server.server_address[:2]
+        # start_local_nodes reads the URL from this first line
+        print(f"Node listening on http://{host}:{port} ({args.slots or _max_workers()} slots)", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+
+    elif args.cmd == "cluster":
+        import cluster
+        profiles = load_profiles(args.input)
+        if not profiles:
+            raise SystemExit(f"No client profiles found in {args.input}")
+        local = cluster.start_local_nodes(args.local) if args.local else []
+        try:
+            try:
+                coordinator = cluster.Coordinator([p.url for p in local] or args.nodes.split(","))
+            except RuntimeError as e:
+                raise SystemExit(str(e))
+
+            def client_done(profile, results, timings):
+                run_id = store.record(profile, results, "cluster", timings=timings)
+                print(f"{profile.name}: {sum(1 for r in results if r.found)}/{len(results)} likely listings (run #{run_id})")
+
+            sink = StreamSink()
+            journal = _open_journal(profiles, args.fresh)
+            try:
+                cluster.run_cluster(profiles, coordinator, on_client_done=client_done,
+                                    batch_search=args.batch_search, sink=sink, journal=journal)
+            finally:
+                sink.close()
+            print(coordinator.summary())
+        finally:
+            cluster.stop_local_nodes(local)
 
 if __name__ == "__main__":
     main()
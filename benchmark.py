@@ -0,0 +1,265 @@
+"""Benchmark suite: discovery against recorded broker pages on a local server.
+
+Serves the HTML fixtures in benchmarks/fixtures/ from a stand-in HTTP server
+(with configurable latency) and points every broker module at it, so runs are
+repeatable and never touch the live sites. Measures:
+
+- parse: per-broker parse time (median ms) and peak memory (KB) per page
+- single / single_async: end-to-end run_discovery wall time for one client
+- batch: run_discovery_batch wall time for BATCH_CLIENTS clients
+
+Results are compared with benchmarks/baseline.json; a metric more than
+--tolerance slower (and over its absolute noise floor), or a change in how
+many brokers report a listing, counts as a regression (exit status 1).
+Baselines are machine-specific: re-record one with --update-baseline.
+
+    python benchmark.py
+    python benchmark.py --latency 80 --repeat 5
+    python benchmark.py --only parse --update-baseline
+    python benchmark.py --only discovery --parse-procs 4
+"""
+import argparse, json, os, platform, random, statistics, sys, threading, time, tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+# The benchmark measures the engine, not the cache or learned host health
+os.environ["ARGUS_CACHE"] = "0"
+os.environ["ARGUS_POLICY"] = "0"
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(HERE, "benchmarks", "fixtures")
+BASELINE_PATH = os.path.join(HERE, "benchmarks", "baseline.json")
+
+# broker module -> (fixture, path prefix it is served under)
+FIXTURES = {
+    "generic": ("duckduckgo.html", "/ddg"),
+    "spokeo": ("spokeo.html", "/spokeo"),
+    "whitepages": ("whitepages.html", "/whitepages"),
+    "fastpeoplesearch": ("fastpeoplesearch.html", "/fastpeoplesearch"),
+    "truepeoplesearch": ("truepeoplesearch.html", "/truepeoplesearch"),
+}
+# Specialized modules without a fixture get an empty results page
+OTHER_MODULES = ("radaris", "usphonebook", "searchpeoplefree")
+EMPTY_PAGE = b"<!DOCTYPE html><html><head><title>No results</title></head><body><p>No records found.</p></body></html>"
+
+CLIENT = {"name": "Jane Doe", "city": "Austin", "state": "TX"}
+BATCH_CLIENTS = 5
+PARSE_RUNS = 20
+# Absolute noise floors: smaller differences never count as regressions
+FLOOR_MS = 5.0
+FLOOR_KB = 64.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    pages: Dict[str, bytes] = {}
+    latency = 0.0
+    jitter = 0.0
+
+    def do_GET(self):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        prefix = "/" + urlsplit(self.path).path.lstrip("/").split("/", 1)[0]
+        body = self.pages.get(prefix, EMPTY_PAGE)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _load_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def start_server(latency_ms: float = 50.0, jitter_ms: float = 20.0) -> ThreadingHTTPServer:
+    """Serve the fixtures on 127.0.0.1 (random port) from a daemon thread."""
+    handler = type("FixtureHandler", (_Handler,), {
+        "pages": {prefix: _load_fixture(fixture) for fixture, prefix in FIXTURES.values()},
+        "latency": latency_ms / 1000.0,
+        "jitter": jitter_ms / 1000.0,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="argus-bench-server", daemon=True).start()
+    return server
+
+
+def point_brokers_at(base: str):
+    """Rewrite the broker modules' base URLs to the local server and lift its rate limit."""
+    from brokers import load_module
+    from ratelimit import limiter
+    for module, (_, prefix) in FIXTURES.items():
+        if module == "generic":
+            load_module(module).DUCK_BASE = f"{base}{prefix}/html/"
+        else:
+            load_module(module).BASE = base + prefix
+    for module in OTHER_MODULES:
+        load_module(module).BASE = f"{base}/{module}"
+    limiter.configure(base, 10000.0, 10000)
+
+
+def _profiles(n: int):
+    from models import ClientProfile
+    others = [("John Smith", "Dallas", "TX"), ("Maria Garcia", "Houston", "TX"),
+              ("Robert Brown", "Denver", "CO"), ("Linda Wilson", "Seattle", "WA")]
+    rows = [(CLIENT["name"], CLIENT["city"], CLIENT["state"])] + others
+    return [ClientProfile(name=name, city=city, state=state) for name, city, state in (rows * n)[:n]]
+
+
+def bench_parse(runs: int = PARSE_RUNS) -> Dict[str, Dict]:
+    """Median parse ms, peak KB and the found flag per fixture."""
+    from brokers import load_module
+    profile = _profiles(1)[0]
+    site = {"name": "Nuwber", "module": "generic", "domain": "nuwber.com"}
+    out = {}
+    for module, (fixture, _) in FIXTURES.items():
+        mod = load_module(module)
+        body = _load_fixture(fixture)
+        url = f"http://127.0.0.1/{module}"
+        if module == "generic":
+            parse = lambda: mod.parse(profile, site, body, url, "utf-8")
+        else:
+            parse = lambda: mod.parse(profile, body, url, "utf-8")
+        result = parse()  # warm up (matcher compile, lxml import)
+        times = []
+        for _ in range(runs):
+            t = time.perf_counter()
+            parse()
+            times.append((time.perf_counter() - t) * 1000)
+        tracemalloc.start()
+        parse()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        out[module] = {"ms": round(statistics.median(times), 3), "peak_kb": round(peak / 1024, 1),
+                       "found": int(result.found), "bytes": len(body)}
+    return out
+
+
+def _timed(fn, repeat: int):
+    times, found = [], None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        results = fn()
+        times.append((time.perf_counter() - t) * 1000)
+        found = sum(1 for r in results if r.found)
+    return {"ms": round(statistics.median(times), 1), "found": found}
+
+
+def bench_discovery(repeat: int = 3, batch_search: bool = True) -> Dict[str, Dict]:
+    import asyncio
+    from app import run_discovery, run_discovery_async, run_discovery_batch
+    profile = _profiles(1)[0]
+    clients = _profiles(BATCH_CLIENTS)
+
+    def batch():
+        out = []
+        run_discovery_batch(clients, on_client_done=lambda p, rs: out.extend(rs), batch_search=batch_search)
+        return out
+
+    return {
+        "single": _timed(lambda: run_discovery(profile, batch_search=batch_search), repeat),
+        "single_async": _timed(lambda: asyncio.run(run_discovery_async(profile, batch_search=batch_search)), repeat),
+        "batch": _timed(batch, repeat),
+    }
+
+
+def _flatten(results: Dict) -> Dict[str, float]:
+    """{"parse.spokeo.ms": 1.2, "single.found": 14, ...}"""
+    flat = {}
+    for group, rows in results.items():
+        if group == "parse":
+            for module, row in rows.items():
+                for k in ("ms", "peak_kb", "found"):
+                    flat[f"parse.{module}.{k}"] = row[k]
+        else:
+            for k, v in rows.items():
+                flat[f"{group}.{k}"] = v
+    return flat
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regression messages for metrics in both runs (an empty list means no regression)."""
+    cur, base = _flatten(current), _flatten(baseline)
+    problems = []
+    for key in sorted(set(cur) & set(base)):
+        new, old = cur[key], base[key]
+        if key.endswith(".found"):
+            if new != old:
+                problems.append(f"{key}: {old} -> {new} listings")
+            continue
+        floor = FLOOR_KB if key.endswith("_kb") else FLOOR_MS
+        if new > old * (1 + tolerance) and new - old > floor:
+            problems.append(f"{key}: {old:g} -> {new:g} (+{100 * (new - old) / max(old, 1e-9):.0f}%)")
+    return problems
+
+
+def _print_results(results: Dict, baseline: Optional[Dict]):
+    base = _flatten(baseline) if baseline else {}
+    for key, v in _flatten(results).items():
+        old = base.get(key)
+        delta = f"  (baseline {old:g})" if old is not None else ""
+        print(f"{key:<32} {v:>10g}{delta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark discovery against recorded broker pages")
+    parser.add_argument("--latency", type=float, default=50.0, help="Server latency per request (ms)")
+    parser.add_argument("--jitter", type=float, default=20.0, help="Extra random latency up to this many ms")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per discovery scenario (median is kept)")
+    parser.add_argument("--only", choices=["parse", "discovery"], help="Run one group of benchmarks")
+    parser.add_argument("--no-batch-search", action="store_true", help="Query generic brokers one by one")
+    parser.add_argument("--parse-procs", type=int, default=0, help="Run discovery parses on a process pool of this size")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    server = start_server(args.latency, args.jitter)
+    point_brokers_at(f"http://127.0.0.1:{server.server_address[1]}")
+    if args.parse_procs:
+        import parsepool
+        parsepool.configure(args.parse_procs)
+    results = {}
+    try:
+        if args.only != "discovery":
+            results["parse"] = bench_parse()
+        if args.only != "parse":
+            results.update(bench_discovery(args.repeat, batch_search=not args.no_batch_search))
+    finally:
+        server.shutdown()
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    _print_results(results, (baseline or {}).get("results"))
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "machine": platform.platform(),
+                       "python": platform.python_version(), "latency_ms": args.latency,
+                       "jitter_ms": args.jitter, "results": results}, f, indent=2)
+        print(f"\nBaseline saved: {args.baseline}")
+        return
+    if baseline is None:
+        print("\nNo baseline yet; record one with --update-baseline.")
+        return
+    if (baseline.get("latency_ms"), baseline.get("jitter_ms")) != (args.latency, args.jitter):
+        print("\nNote: baseline was recorded with different --latency/--jitter.")
+    problems = compare(results, baseline.get("results", {}), args.tolerance)
+    if problems:
+        print("\nRegressions:\n" + "\n".join(f"- {p}" for p in problems))
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
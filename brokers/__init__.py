@@ -1,6 +1,19 @@
+import asyncio
+import contextvars
+import functools
+import importlib
+import importlib.util
 import json
 import os
-from typing import List, Dict, Callable, Optional
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, List, Dict, Callable, Optional
+
+# Third-party brokers register a module under this entry-point group, e.g.
+#   [project.entry-points."argus.brokers"]
+#   acme = "acme_argus.broker"
+# and are then usable as "module": "acme" in sites.json.
+ENTRY_POINT_GROUP = "argus.brokers"
 
 
 def _slug(name: str) -> str:
@@ -31,82 +44,198 @@ def _to_domain(display: str) -> str:
     return s
 
 
-def get_brokers(sites_path: str = None) -> List[Dict[str, str]]:
-    """Load broker sites from sites.json and normalize into dicts.
-
-    Returns list of { key, display } items.
-    """
+def _default_sites_path() -> str:
     # Default path: sibling to this package's parent, named sites.json
-    if sites_path is None:
-        base = os.path.dirname(os.path.dirname(__file__))
-        sites_path = os.path.join(base, "sites.json")
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), "sites.json")
 
-    sites: List[str] = []
-    try:
-        with open(sites_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                # Accept list of strings or objects with 'name'/'display'
-                for item in data:
-                    if isinstance(item, str):
-                        sites.append(item)
-                    elif isinstance(item, dict):
-                        name = item.get("name") or item.get("display") or ""
-                        if name:
-                            sites.append(str(name))
-    except Exception:
-        # If file missing or invalid, fall back to a minimal set
-        sites = ["Spokeo.com", "WhitePages.com", "TruthFinder.com"]
 
-    brokers: List[Dict[str, str]] = []
-    for site in sites:
-        display = str(site).strip()
-        key = _slug(display)
-        domain = _to_domain(display)
-        brokers.append({"key": key, "display": display, "domain": domain})
-    return brokers
+def load_registry(sites_path: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> "BrokerRegistry":
+    """The broker registry for sites.json (or an already loaded config dict)."""
+    if config is None:
+        with open(sites_path or _default_sites_path(), "r", encoding="utf-8") as f:
+            config = json.load(f)
+    if isinstance(config, list):
+        # Older flat layout: a list of site entries
+        config = {"brokers": config}
+    return BrokerRegistry.from_config(config)
 
 
-# --- Specialized broker registry ---
-_SPECIALIZATIONS: Dict[str, Callable[..., List[str]]] = {}
+def get_brokers(sites_path: str = None, include_disabled: bool = True) -> List[Dict[str, str]]:
+    """Brokers from the registry as { key, display, domain, module } dicts, in sites.json order."""
+    return [{"key": p.key, "display": p.name, "domain": p.domain, "module": p.module}
+            for p in load_registry(sites_path).enabled(include_disabled)]
 
-def _register_specializations():
-    global _SPECIALIZATIONS
-    try:
-        from . import spokeo  # type: ignore
-        _SPECIALIZATIONS["spokeo.com"] = spokeo.search  # type: ignore[attr-defined]
-    except Exception:
-        pass
-    try:
-        from . import whitepages  # type: ignore
-        _SPECIALIZATIONS["whitepages.com"] = whitepages.search  # type: ignore[attr-defined]
-    except Exception:
-        pass
+
+# --- Lazy plugin registry ---
+_MODULES: Dict[str, Any] = {}
+_modules_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _entry_points() -> Dict[str, Any]:
     try:
-        from . import truepeoplesearch  # type: ignore
-        _SPECIALIZATIONS["truepeoplesearch.com"] = truepeoplesearch.search  # type: ignore[attr-defined]
+        from importlib.metadata import entry_points
+        return {ep.name: ep for ep in entry_points(group=ENTRY_POINT_GROUP)}
     except Exception:
-        pass
+        return {}
+
+
+def _is_builtin(name: str) -> bool:
+    return importlib.util.find_spec(f"{__name__}.{name}") is not None
+
+
+def load_module(name: str):
+    """Broker module for a sites.json "module" value, imported on first use and cached.
+
+    Built-in brokers live in this package; anything else is looked up in the
+    ENTRY_POINT_GROUP entry points.
+    """
+    mod = _MODULES.get(name)
+    if mod is not None:
+        return mod
+    with _modules_lock:
+        mod = _MODULES.get(name)
+        if mod is None:
+            if _is_builtin(name):
+                mod = importlib.import_module(f"{__name__}.{name}")
+            elif name in _entry_points():
+                mod = _entry_points()[name].load()
+            else:
+                raise ImportError(f"No broker module {name!r} (built-in or {ENTRY_POINT_GROUP} entry point)")
+            _MODULES[name] = mod
+    return mod
+
+
+@dataclass
+class BrokerPlugin:
+    """One configured broker: its sites.json entry and where its code lives.
+
+    Nothing is imported until search()/async_search()/module is first used.
+    """
+    name: str
+    module: str
+    domain: str
+    site: Dict[str, Any] = field(repr=False)
+
+    @property
+    def key(self) -> str:
+        return _slug(self.name)
+
+    @property
+    def disabled(self) -> bool:
+        return bool(self.site.get("disabled"))
+
+    @property
+    def generic(self) -> bool:
+        return self.module == "generic"
+
+    @property
+    def loaded(self) -> bool:
+        return self.module in _MODULES
+
+    @property
+    def code(self):
+        return load_module(self.module)
+
+    def search(self, profile):
+        # Generic broker requires site metadata (domain, etc.)
+        if self.generic:
+            return self.code.search(profile, self.site)
+        return self.code.search(profile)
+
+    async def async_search(self, profile):
+        search = get_async_search(self.code)
+        if self.generic:
+            return await search(profile, self.site)
+        return await search(profile)
+
+
+class BrokerRegistry:
+    """Declarative list of brokers built from sites.json plus installed entry points.
+
+    An entry point whose name no sites.json entry uses as "module" is added as
+    its own broker, named after the entry point.
+    """
+
+    def __init__(self, plugins: List[BrokerPlugin]):
+        self.plugins = plugins
+        self._by_name = {p.name.lower(): p for p in plugins}
+        self._by_domain: Dict[str, BrokerPlugin] = {}
+        for p in plugins:
+            if p.domain:
+                self._by_domain.setdefault(p.domain, p)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], entry_points: bool = True) -> "BrokerRegistry":
+        sites = [dict(s) for s in config.get("brokers", []) if isinstance(s, dict) and s.get("module")]
+        if entry_points:
+            used = {s["module"] for s in sites}
+            for name in sorted(_entry_points()):
+                if name not in used and not _is_builtin(name):
+                    sites.append({"name": name, "module": name})
+        return cls([cls._plugin(s) for s in sites])
+
+    @staticmethod
+    def _plugin(site: Dict[str, Any]) -> BrokerPlugin:
+        domain = _to_domain(site.get("domain") or (site.get("name") if site.get("module") == "generic" else "") or "")
+        return BrokerPlugin(name=site.get("name") or site["module"], module=site["module"], domain=domain, site=site)
+
+    def __iter__(self):
+        return iter(self.plugins)
+
+    def __len__(self):
+        return len(self.plugins)
+
+    def enabled(self, include_disabled: bool = False) -> List[BrokerPlugin]:
+        return [p for p in self.plugins if include_disabled or not p.disabled]
+
+    def get(self, name_or_domain: str) -> Optional[BrokerPlugin]:
+        key = (name_or_domain or "").strip().lower()
+        return self._by_name.get(key) or self._by_domain.get(_to_domain(key))
+
+
+# --- Domain lookups (legacy WebClear signature) ---
+def get_specialized(domain: str, sites_path: Optional[str] = None) -> Optional[Callable[..., List[str]]]:
+    """Search function for a domain with the signature
+    fn(full_name, city=None, state=None, timeout=..., limit=5) -> [urls].
+
+    Runs the domain's registered broker (specialized module or generic), so
+    it shares the rate limiter, cache and parsers with run_discovery. timeout
+    is accepted for compatibility; the per-host request policy decides it.
+    Returns None for domains that are not in the registry.
+    """
     try:
-        from . import fastpeoplesearch  # type: ignore
-        _SPECIALIZATIONS["fastpeoplesearch.com"] = fastpeoplesearch.search  # type: ignore[attr-defined]
-    except Exception:
-        pass
-
-
-def get_specialized(domain: str) -> Optional[Callable[..., List[str]]]:
-    # Ensure built-ins are registered
-    if not _SPECIALIZATIONS:
-        _register_specializations()
-
-    # If this domain not present yet, attach a generic scraper bound to the domain
-    if domain not in _SPECIALIZATIONS:
-        try:
-            from .generic import search_domain  # type: ignore
-            _SPECIALIZATIONS[domain] = lambda full_name, city=None, state=None, timeout=15.0, limit=5, _d=domain: (
-                search_domain(_d, full_name, city, state, timeout=timeout, limit=limit)
-            )
-        except Exception:
-            # Leave it missing if generic cannot be imported
-            return None
-    return _SPECIALIZATIONS.get(domain)
+        plugin = load_registry(sites_path).get(domain)
+    except (OSError, ValueError):
+        return None
+    if plugin is None:
+        return None
+
+    def _search(full_name, city=None, state=None, timeout=None, limit=5):
+        from models import ClientProfile
+        r = plugin.search(ClientProfile(name=full_name, city=city, state=state))
+        return [r.url][:limit] if r.found and r.url else []
+    return _search
+
+
+# --- Async adapter for legacy blocking brokers ---
+def async_adapter(fn: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    """Wrap a blocking search(...) so it can be awaited next to native async brokers.
+
+    The call runs on the running loop's default executor, in a copy of the
+    caller's context (so tracing spans still land on the right broker).
+    """
+    @functools.wraps(fn)
+    async def _run(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(None, functools.partial(ctx.run, fn, *args, **kwargs))
+    return _run
+
+
+def get_async_search(module) -> Callable[..., Awaitable[Any]]:
+    """Return a broker module's native async_search, or its search wrapped by async_adapter."""
+    fn = getattr(module, "async_search", None)
+    if fn is not None and asyncio.iscoroutinefunction(fn):
+        return fn
+    return async_adapter(module.search)
@@ -1,12 +1,29 @@
-from bs4 import BeautifulSoup
-from urllib.parse import quote_plus
-from typing import Dict, Optional
+from urllib.parse import quote_plus, urlsplit, parse_qs
+from typing import Dict, List, Optional, Tuple
 from models import ClientProfile, BrokerResult
-from utils import polite_get, jitter_sleep
+from utils import polite_get, async_polite_get
+from htmlscan import collect, response_bytes, scan
+from ratelimit import limiter
+from policy import get_policy, set_shared
+import cache
 
 DUCK_BASE = "https://duckduckgo.com/html/"
+# polite_get options for result pages ("cache_ttl" comes from the site entry)
+FETCH_OPTS = {"timeout": 10.0, "attempts": 2, "allow_fail": True}
+# Every generic broker queries this one endpoint, so it gets a dedicated budget
+# (sites.json "hosts" -> "duckduckgo.com" takes precedence when present).
+DUCK_RATE_PER_SEC = 1.0
+DUCK_BURST = 3
+limiter.configure(DUCK_BASE, DUCK_RATE_PER_SEC, DUCK_BURST, replace=False)
+# ...and one circuit breaker: if DuckDuckGo blocks us, every generic broker is
+# down, so they fail fast together and the run summary says so once.
+set_shared(DUCK_BASE, "DuckDuckGo")
 
-def _build_query(domain: str, profile: ClientProfile) -> str:
+# Batched mode: one OR-combined site: query covers this many generic domains
+BATCH_SIZE = 8
+BATCH_MAX_PAGES = 3
+
+def _profile_terms(profile: ClientProfile) -> List[str]:
     parts = []
     name = (profile.name or "").strip()
     if name:
@@ -15,44 +32,72 @@ def _build_query(domain: str, profile: ClientProfile) -> str:
         parts.append(f'"{profile.city}"')
     if profile.state:
         parts.append(f'"{profile.state}"')
+    return parts
+
+def _build_query(domain: str, profile: ClientProfile) -> str:
+    parts = _profile_terms(profile)
     # constrain by site
     parts.append(f"site:{domain}")
     return " ".join(parts).strip()
 
-def search(profile: ClientProfile, site: Dict) -> BrokerResult:
-    """Generic search via DuckDuckGo HTML for a given domain.
+def _build_batch_query(domains: List[str], profile: ClientProfile) -> str:
+    parts = _profile_terms(profile)
+    parts.append("(" + " OR ".join(f"site:{d}" for d in domains) + ")")
+    return " ".join(parts).strip()
 
-    Expects site dict with at least { 'name': str, 'domain': str }.
-    """
+def _site_domain(site: Dict) -> str:
     domain = (site.get("domain") or site.get("name") or "").strip()
     if domain.startswith("http://") or domain.startswith("https://"):
         # strip scheme if included
         domain = domain.split("://", 1)[1]
-    domain = domain.strip("/")
+    return domain.strip("/")
 
-    q = _build_query(domain, profile)
-    url = f"{DUCK_BASE}?q={quote_plus(q)}&kp=-2"
+def build_url(profile: ClientProfile, site: Dict) -> str:
+    q = _build_query(_site_domain(site), profile)
+    return f"{DUCK_BASE}?q={quote_plus(q)}&kp=-2"
 
-    # Perform the search quickly; allow failure without blocking
-    r = polite_get(url, timeout=10.0, attempts=2, allow_fail=True)
-    html = getattr(r, "text", "") or ""
-    soup = BeautifulSoup(html, "lxml") if html else None
+# Result link classes on the DuckDuckGo HTML page
+RESULT_CLASSES = ("result__a", "result__url", "result__snippet")
+# What monitor.py hashes to decide whether a results page changed
+FINGERPRINT_REGION = ("a", RESULT_CLASSES)
+# A 200 page with neither results nor the "No results" block is a captcha /
+# "unusual traffic" interstitial: reporting it as not found would be wrong, and
+# caching it would replay it for the whole cache TTL.
+RESULTS_MARKERS = (b"result__", b"no-results")
+BLOCKED_NOTE = "Error during search: DuckDuckGo returned a blocked/captcha page"
+
+def is_blocked(body: bytes) -> bool:
+    return bool(body) and not any(m in body for m in RESULTS_MARKERS)
+
+def failed_result(site: Dict, url: str) -> BrokerResult:
+    """Result for a search that got no response at all (circuit open or unreachable).
+
+    Also used by parsepool, which fetches without calling search().
+    """
+    why = "DuckDuckGo circuit open" if get_policy().is_open(DUCK_BASE) else "no response from DuckDuckGo"
+    return BrokerResult(broker=site.get("name") or _site_domain(site), found=False, url=url,
+                        notes=f"Error during search: {why}")
 
-    found = False
+def blocked_result(site: Dict, url: str) -> BrokerResult:
+    """Error result for a blocked page (see is_blocked); drops the page from the response cache."""
+    cache.forget(url)
+    return BrokerResult(broker=site.get("name") or _site_domain(site), found=False, url=url, notes=BLOCKED_NOTE)
+
+def parse(profile: ClientProfile, site: Dict, body: bytes, url: str, encoding: Optional[str] = None) -> BrokerResult:
+    if is_blocked(body):
+        return blocked_result(site, url)
+    domain = _site_domain(site)
+    key = domain.split("/", 1)[0].lower()
+    page = scan(body, match_tag="a", match_class=RESULT_CLASSES, encoding=encoding,
+                match=lambda text, attrib: key in ((attrib.get("href") or "") + " " + text).lower())
+
+    found = page.element_text is not None
     first_title: Optional[str] = None
     first_url: Optional[str] = None
+    if found:
+        first_title = page.element_text[:160] or None
+        first_url = (page.element_attrib or {}).get("href") or None
 
-    if soup is not None:
-        for a in soup.select("a.result__a, a.result__url, a.result__snippet, a.result__a\, .result__a"):
-            href = a.get("href") or ""
-            text = a.get_text(" ", strip=True) or ""
-            if domain.split("/", 1)[0].lower() in (href.lower() + " " + text.lower()):
-                first_title = text[:160] or first_title
-                first_url = href or first_url
-                found = True
-                break
-
-    jitter_sleep()
     return BrokerResult(
         broker=site.get("name") or domain,
         found=found,
@@ -61,3 +106,124 @@ def search(profile: ClientProfile, site: Dict) -> BrokerResult:
         notes=(site.get("optout_url") and f"Opt-out: {site['optout_url']}") or None,
     )
 
+def search(profile: ClientProfile, site: Dict) -> BrokerResult:
+    """Generic search via DuckDuckGo HTML for a given domain.
+
+    Expects site dict with at least { 'name': str, 'domain': str }.
+    """
+    url = build_url(profile, site)
+    # Perform the search quickly; allow failure without blocking
+    r = polite_get(url, cache_ttl=site.get("cache_ttl"), **FETCH_OPTS)
+    if getattr(r, "status_code", 0) == 0:
+        return failed_result(site, url)
+    body, encoding = response_bytes(r)
+    return parse(profile, site, body, url, encoding)
+
+async def async_search(profile: ClientProfile, site: Dict) -> BrokerResult:
+    url = build_url(profile, site)
+    r = await async_polite_get(url, cache_ttl=site.get("cache_ttl"), **FETCH_OPTS)
+    if getattr(r, "status_code", 0) == 0:
+        return failed_result(site, url)
+    body, encoding = response_bytes(r)
+    return parse(profile, site, body, url, encoding)
+
+def _unwrap(href: str) -> str:
+    """Target URL of a DuckDuckGo result link (unwrapping /l/?uddg= redirects)."""
+    parts = urlsplit(href)
+    if parts.path.startswith("/l/"):
+        target = parse_qs(parts.query).get("uddg")
+        if target:
+            return target[0]
+    return href
+
+def _result_host(href: str) -> str:
+    parts = urlsplit(href if "//" in href else f"//{href}")
+    host = (parts.hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def _attribute(host: str, domains: List[str]) -> Optional[str]:
+    for d in domains:
+        key = d.split("/", 1)[0].lower()
+        if host == key or host.endswith("." + key):
+            return d
+    return None
+
+def _batch_page(body: bytes, encoding: Optional[str] = None) -> Tuple[List[Tuple[str, str]], Optional[str]]:
+    """Result (href, title) pairs on one results page and the next-page offset, if any."""
+    links = []
+    next_offset = None
+    for tag, text, attrib in collect(body, ("a", "input"), encoding=encoding):
+        if tag == "a" and "result__a" in (attrib.get("class") or "").split():
+            links.append((attrib.get("href") or "", text))
+        elif tag == "input" and attrib.get("name") == "s":
+            next_offset = attrib.get("value") or None
+    return links, next_offset
+
+def search_batch(profile: ClientProfile, sites: List[Dict]) -> List[BrokerResult]:
+    """Search many generic sites with one OR-combined site: query per group.
+
+    Pages through up to BATCH_MAX_PAGES result pages and attributes each hit to
+    its broker by hostname. Only a group whose results were truncated (more
+    pages remained, or the search failed) falls back to per-domain queries for
+    its still-unmatched sites; a group that hit a captcha page gets error
+    results instead (more queries would only hit it again). Results are
+    returned in the order of `sites`.
+    """
+    results: List[Optional[BrokerResult]] = [None] * len(sites)
+    domains = [_site_domain(s) for s in sites]
+    unique = list(dict.fromkeys(domains))
+    for start in range(0, len(unique), BATCH_SIZE):
+        group = unique[start:start + BATCH_SIZE]
+        q = _build_batch_query(group, profile)
+        base_url = f"{DUCK_BASE}?q={quote_plus(q)}&kp=-2"
+        hits: Dict[str, Tuple[str, str]] = {}
+        truncated, blocked, offset = False, False, None
+        for page in range(BATCH_MAX_PAGES):
+            url = base_url if offset is None else f"{base_url}&s={offset}&dc={int(offset) + 1}"
+            r = polite_get(url, **FETCH_OPTS)
+            body, encoding = response_bytes(r)
+            if getattr(r, "status_code", 0) != 200 or not body:
+                truncated = True
+                break
+            if is_blocked(body):
+                cache.forget(url)
+                blocked = True
+                break
+            current = int(offset or 0)
+            links, offset = _batch_page(body, encoding)
+            if offset is not None and (not offset.isdigit() or int(offset) <= current):
+                offset = None  # only a "previous page" form is left
+            for href, text in links:
+                href = _unwrap(href)
+                d = _attribute(_result_host(href), group)
+                if d and d not in hits:
+                    hits[d] = (href, text)
+            if offset is None or len(hits) == len(group):
+                break
+        else:
+            truncated = offset is not None and len(hits) < len(group)
+
+        for i in (i for i, d in enumerate(domains) if d in group):
+            site, domain = sites[i], domains[i]
+            if domain in hits:
+                href, text = hits[domain]
+                results[i] = BrokerResult(
+                    broker=site.get("name") or domain,
+                    found=True,
+                    url=href or base_url,
+                    title=text[:160] or None,
+                    notes=(site.get("optout_url") and f"Opt-out: {site['optout_url']}") or None,
+                )
+            elif blocked:
+                results[i] = BrokerResult(broker=site.get("name") or domain, found=False, url=base_url,
+                                          notes=BLOCKED_NOTE)
+            elif truncated:
+                results[i] = search(profile, site)
+            else:
+                results[i] = BrokerResult(
+                    broker=site.get("name") or domain,
+                    found=False,
+                    url=base_url,
+                    notes=(site.get("optout_url") and f"Opt-out: {site['optout_url']}") or None,
+                )
+    return results  # type: ignore[return-value]
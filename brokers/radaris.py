@@ -1,35 +1,28 @@
-from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
+from typing import Optional
 from models import ClientProfile, BrokerResult
-from utils import polite_get, jitter_sleep
+from utils import polite_get, async_polite_get
+from htmlscan import is_found, response_bytes, scan_profile
 
 BASE = "https://radaris.com"
+# polite_get options for this site (the parse pool fetches with these too)
+FETCH_OPTS = {"timeout": 10.0, "attempts": 2, "allow_fail": True}
 
-def search(profile: ClientProfile) -> BrokerResult:
+def build_url(profile: ClientProfile) -> str:
     name_path = "-".join([p for p in profile.name.split() if p])
     q = profile.name
     if profile.city:
         q += f" {profile.city}"
     if profile.state:
         q += f" {profile.state}"
-    url = f"{BASE}/p/{quote_plus(name_path)}?search={quote_plus(q)}"
-    r = polite_get(url, timeout=10.0, attempts=2, allow_fail=True)
-    html = getattr(r, "text", "") or ""
+    return f"{BASE}/p/{quote_plus(name_path)}?search={quote_plus(q)}"
+
+def parse(profile: ClientProfile, body: bytes, url: str, encoding: Optional[str] = None) -> BrokerResult:
     found = False
     title = None
-    if html:
-        soup = BeautifulSoup(html, "lxml")
-        text = soup.get_text(" ", strip=True).lower()
-        parts = profile.name.split()
-        if parts and len(parts) >= 2:
-            first, last = parts[0].lower(), parts[-1].lower()
-            found = (first in text and last in text)
-        elif parts:
-            found = parts[0].lower() in text
-        h = soup.find(["h1","h2","title"]) or None
-        if h:
-            title = h.get_text(" ", strip=True)[:160]
-    jitter_sleep()
+    if body:
+        page = scan_profile(body, profile, encoding)
+        found, title = is_found(page), page.title
     return BrokerResult(
         broker="Radaris",
         found=found,
@@ -38,3 +31,14 @@ def search(profile: ClientProfile) -> BrokerResult:
         notes="Opt-out: https://radaris.com/page/how-to-remove"
     )
 
+def search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = polite_get(url, **FETCH_OPTS)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
+
+async def async_search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = await async_polite_get(url, **FETCH_OPTS)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
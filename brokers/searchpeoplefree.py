@@ -1,34 +1,32 @@
-from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
+from typing import Optional
 from models import ClientProfile, BrokerResult
-from utils import polite_get, jitter_sleep
+from utils import polite_get, async_polite_get
+from htmlscan import is_found, response_bytes, scan_profile
 
 BASE = "https://www.searchpeoplefree.com"
+# polite_get options for this site (the parse pool fetches with these too)
+FETCH_OPTS = {"timeout": 10.0, "attempts": 2, "allow_fail": True}
 
-def search(profile: ClientProfile) -> BrokerResult:
+def _first_last(profile: ClientProfile):
     parts = [p for p in profile.name.split() if p]
     first = parts[0] if parts else ""
     last = parts[-1] if len(parts) > 1 else ""
+    return first, last
+
+def build_url(profile: ClientProfile) -> str:
+    first, last = _first_last(profile)
     qs = f"firstname={quote_plus(first)}&lastname={quote_plus(last)}"
     if profile.state:
         qs += f"&state={quote_plus(profile.state)}"
-    url = f"{BASE}/find?{qs}"
+    return f"{BASE}/find?{qs}"
 
-    r = polite_get(url, timeout=10.0, attempts=2, allow_fail=True)
-    html = getattr(r, "text", "") or ""
+def parse(profile: ClientProfile, body: bytes, url: str, encoding: Optional[str] = None) -> BrokerResult:
     found = False
     title = None
-    if html:
-        soup = BeautifulSoup(html, "lxml")
-        text = soup.get_text(" ", strip=True).lower()
-        if first and last:
-            found = (first.lower() in text and last.lower() in text)
-        elif first:
-            found = first.lower() in text
-        h = soup.find(["h1","h2","title"]) or None
-        if h:
-            title = h.get_text(" ", strip=True)[:160]
-    jitter_sleep()
+    if body:
+        page = scan_profile(body, profile, encoding)
+        found, title = is_found(page), page.title
     return BrokerResult(
         broker="SearchPeopleFree",
         found=found,
@@ -37,3 +35,14 @@ def search(profile: ClientProfile) -> BrokerResult:
         notes="Opt-out: https://www.searchpeoplefree.com/opt-out"
     )
 
+def search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = polite_get(url, **FETCH_OPTS)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
+
+async def async_search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = await async_polite_get(url, **FETCH_OPTS)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
@@ -1,11 +1,13 @@
-from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
+from typing import Optional
 from models import ClientProfile, BrokerResult
-from utils import polite_get, jitter_sleep
+from utils import polite_get, async_polite_get
+from htmlscan import response_bytes, scan
+from matcher import FOUND_SCORE, matcher_for
 
 BASE = "https://www.spokeo.com"
 
-def search(profile: ClientProfile) -> BrokerResult:
+def build_url(profile: ClientProfile) -> str:
     q = quote_plus(profile.name)
     url = f"{BASE}/search?q={q}"
     # Append location hints if provided; city alone helps narrow results
@@ -13,18 +15,22 @@ def search(profile: ClientProfile) -> BrokerResult:
         url += quote_plus(f" {profile.city} {profile.state}")
     elif profile.city:
         url += quote_plus(f" {profile.city}")
-    r = polite_get(url)
-    soup = BeautifulSoup(r.text, "lxml")
+    return url
+
+def parse(profile: ClientProfile, body: bytes, url: str, encoding: Optional[str] = None) -> BrokerResult:
     found, snippet, title = False, None, None
-    first_last = profile.name.split()[0], profile.name.split()[-1]
-    for a in soup.select("a"):
-        text = (a.get_text(" ", strip=True) or "").lower()
-        if first_last[0].lower() in text and first_last[1].lower() in text:
-            found = True
-            title = a.get_text(" ", strip=True)[:120]
-            snippet = title
-            break
-    jitter_sleep()
+    names = matcher_for(profile)
+
+    def _names_client(text, _attrib):
+        best = names.best(text)
+        return best is not None and best.score >= FOUND_SCORE
+
+    # Stop at the first anchor that names the client
+    page = scan(body, match_tag="a", encoding=encoding, match=_names_client)
+    if page.element_text is not None:
+        found = True
+        title = page.element_text[:120]
+        snippet = title
     return BrokerResult(
         broker="Spokeo",
         found=found,
@@ -33,3 +39,15 @@ def search(profile: ClientProfile) -> BrokerResult:
         raw_snippet=snippet,
         notes="If found, submit opt-out: https://www.spokeo.com/opt_out"
     )
+
+def search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = polite_get(url)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
+
+async def async_search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = await async_polite_get(url)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
@@ -1,11 +1,14 @@
-from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
+from typing import Optional
 from models import ClientProfile, BrokerResult
-from utils import polite_get, jitter_sleep
+from utils import polite_get, async_polite_get
+from htmlscan import is_found, response_bytes, scan_profile
 
 BASE = "https://www.truepeoplesearch.com"
+# polite_get options for this site (the parse pool fetches with these too)
+FETCH_OPTS = {"timeout": 10.0, "attempts": 2, "allow_fail": True}
 
-def search(profile: ClientProfile) -> BrokerResult:
+def build_url(profile: ClientProfile) -> str:
     name_q = quote_plus(profile.name)
     loc = ""
     if profile.city and profile.state:
@@ -14,26 +17,14 @@ def search(profile: ClientProfile) -> BrokerResult:
         loc = f"&citystatezip={quote_plus(profile.city)}"
     elif profile.state:
         loc = f"&citystatezip={quote_plus(profile.state)}"
-    url = f"{BASE}/results?name={name_q}{loc}"
+    return f"{BASE}/results?name={name_q}{loc}"
 
-    r = polite_get(url, timeout=10.0, attempts=2, allow_fail=True)
-    html = getattr(r, "text", "") or ""
+def parse(profile: ClientProfile, body: bytes, url: str, encoding: Optional[str] = None) -> BrokerResult:
     found = False
     title = None
-    if html:
-        soup = BeautifulSoup(html, "lxml")
-        text = soup.get_text(" ", strip=True).lower()
-        parts = profile.name.split()
-        if parts and len(parts) >= 2:
-            first, last = parts[0].lower(), parts[-1].lower()
-            found = (first in text and last in text)
-        elif parts:
-            found = parts[0].lower() in text
-        h = soup.find(["h1","h2","title"]) or None
-        if h:
-            title = h.get_text(" ", strip=True)[:160]
-
-    jitter_sleep()
+    if body:
+        page = scan_profile(body, profile, encoding)
+        found, title = is_found(page), page.title
     return BrokerResult(
         broker="TruePeopleSearch",
         found=found,
@@ -42,3 +33,14 @@ def search(profile: ClientProfile) -> BrokerResult:
         notes="Opt-out: https://www.truepeoplesearch.com/removal"
     )
 
+def search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = polite_get(url, **FETCH_OPTS)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
+
+async def async_search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = await async_polite_get(url, **FETCH_OPTS)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
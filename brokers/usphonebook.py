@@ -1,35 +1,28 @@
-from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
+from typing import Optional
 from models import ClientProfile, BrokerResult
-from utils import polite_get, jitter_sleep
+from utils import polite_get, async_polite_get
+from htmlscan import is_found, response_bytes, scan_profile
 
 BASE = "https://www.usphonebook.com"
+# polite_get options for this site (the parse pool fetches with these too)
+FETCH_OPTS = {"timeout": 10.0, "attempts": 2, "allow_fail": True}
 
-def search(profile: ClientProfile) -> BrokerResult:
+def build_url(profile: ClientProfile) -> str:
     # Use a simple query endpoint that accepts generic term
     term = profile.name
     if profile.city:
         term += f" {profile.city}"
     if profile.state:
         term += f" {profile.state}"
-    url = f"{BASE}/search?term={quote_plus(term)}"
-    r = polite_get(url, timeout=10.0, attempts=2, allow_fail=True)
-    html = getattr(r, "text", "") or ""
+    return f"{BASE}/search?term={quote_plus(term)}"
+
+def parse(profile: ClientProfile, body: bytes, url: str, encoding: Optional[str] = None) -> BrokerResult:
     found = False
     title = None
-    if html:
-        soup = BeautifulSoup(html, "lxml")
-        text = soup.get_text(" ", strip=True).lower()
-        parts = profile.name.split()
-        if parts and len(parts) >= 2:
-            first, last = parts[0].lower(), parts[-1].lower()
-            found = (first in text and last in text)
-        elif parts:
-            found = parts[0].lower() in text
-        h = soup.find(["h1","h2","title"]) or None
-        if h:
-            title = h.get_text(" ", strip=True)[:160]
-    jitter_sleep()
+    if body:
+        page = scan_profile(body, profile, encoding)
+        found, title = is_found(page), page.title
     return BrokerResult(
         broker="USPhoneBook",
         found=found,
@@ -38,3 +31,14 @@ def search(profile: ClientProfile) -> BrokerResult:
         notes="Opt-out: https://www.usphonebook.com/opt-out"
     )
 
+def search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = polite_get(url, **FETCH_OPTS)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
+
+async def async_search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = await async_polite_get(url, **FETCH_OPTS)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
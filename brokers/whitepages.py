@@ -1,23 +1,35 @@
-from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
+from typing import Optional
 from models import ClientProfile, BrokerResult
-from utils import polite_get, jitter_sleep
+from utils import polite_get, async_polite_get
+from htmlscan import is_found, response_bytes, scan_profile
 
 BASE = "https://www.whitepages.com"
 
-def search(profile: ClientProfile) -> BrokerResult:
+def build_url(profile: ClientProfile) -> str:
     q = quote_plus(profile.name)
     url = f"{BASE}/name/{q}"
     if profile.city and profile.state:
         url += f"/{quote_plus(profile.city)}/{quote_plus(profile.state)}"
-    r = polite_get(url)
-    soup = BeautifulSoup(r.text, "lxml")
-    text = soup.get_text(" ", strip=True).lower()
-    found = (profile.name.split()[-1].lower() in text)
-    jitter_sleep()
+    return url
+
+def parse(profile: ClientProfile, body: bytes, url: str, encoding: Optional[str] = None) -> BrokerResult:
+    found = is_found(scan_profile(body, profile, encoding))
     return BrokerResult(
         broker="Whitepages",
         found=found,
         url=url,
         notes="Opt-out: https://www.whitepages.com/suppression_requests"
-    )
\ No newline at end of file
+    )
+
+def search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = polite_get(url)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
+
+async def async_search(profile: ClientProfile) -> BrokerResult:
+    url = build_url(profile)
+    r = await async_polite_get(url)
+    body, encoding = response_bytes(r)
+    return parse(profile, body, url, encoding)
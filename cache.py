@@ -0,0 +1,248 @@
+"""Persistent HTTP response cache under utils.polite_get.
+
+Responses (200/404) are stored in a SQLite file keyed on the normalized URL.
+Within its TTL an entry is served without touching the network; once stale,
+a stored ETag/Last-Modified turns the next fetch into a conditional request
+and a 304 refreshes the entry. The file is kept under a size cap by evicting
+least-recently-used entries.
+
+Settings:
+- ARGUS_CACHE=0 disables the cache
+- ARGUS_CACHE_PATH (default .cache/http_cache.sqlite3)
+- ARGUS_CACHE_TTL seconds (default DEFAULT_TTL), ARGUS_CACHE_MAX_MB (default DEFAULT_MAX_MB)
+- sites.json "cache_ttl" (seconds) per site or under "hosts"; 0 disables caching there
+"""
+import os, sqlite3, threading, time
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from ratelimit import host_key
+
+DEFAULT_TTL = 12 * 3600
+DEFAULT_MAX_MB = 256
+CACHEABLE_STATUS = (200, 404)
+
+
+def normalize_url(url: str) -> str:
+    """Canonical cache key: lowercase scheme/host, no default port or fragment, sorted query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response served from the cache."""
+    from_cache = True
+
+    def __init__(self, url, status_code, content, encoding, etag=None, last_modified=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content or b""
+        self.encoding = encoding or "utf-8"
+        self.headers = {}
+        if etag:
+            self.headers["ETag"] = etag
+        if last_modified:
+            self.headers["Last-Modified"] = last_modified
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def raise_for_status(self):
+        pass
+
+
+class ResponseCache:
+    def __init__(self, path: str, default_ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self._host_ttl: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._size: Optional[int] = None
+        self.hits = self.misses = self.revalidated = self.stores = self.evictions = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, status INTEGER, body BLOB, encoding TEXT,"
+                " etag TEXT, last_modified TEXT, size INTEGER,"
+                " fetched_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(accessed_at)")
+            self._size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def set_ttl(self, host: str, ttl: float):
+        self._host_ttl[host_key(host)] = float(ttl)
+
+    def ttl_for(self, url: str, ttl: Optional[float] = None) -> float:
+        if ttl is not None:
+            return float(ttl)
+        return self._host_ttl.get(host_key(url), self.default_ttl)
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Return the stored entry for url (fresh or stale), or None."""
+        key = normalize_url(url)
+        with self._lock:
+            row = self._db().execute(
+                "SELECT status, body, encoding, etag, last_modified, fetched_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, body, encoding, etag, last_modified, fetched_at = row
+        return {"key": key, "url": url, "status": status, "body": body, "encoding": encoding,
+                "etag": etag, "last_modified": last_modified, "fetched_at": fetched_at}
+
+    def is_fresh(self, entry: Dict, ttl: float) -> bool:
+        return ttl > 0 and (time.time() - entry["fetched_at"]) < ttl
+
+    def hit(self, entry: Dict) -> CachedResponse:
+        with self._lock:
+            self.hits += 1
+            self._db().execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), entry["key"]))
+        return self._response(entry)
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def revalidated_response(self, entry: Dict) -> CachedResponse:
+        """A 304 came back: bump the entry's freshness and serve the stored body."""
+        now = time.time()
+        with self._lock:
+            self.revalidated += 1
+            self._db().execute("UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                               (now, now, entry["key"]))
+        return self._response(entry)
+
+    def store(self, url: str, r):
+        if getattr(r, "status_code", 0) not in CACHEABLE_STATUS:
+            return
+        body = r.content or b""
+        headers = getattr(r, "headers", {}) or {}
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            key = normalize_url(url)
+            old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, r.status_code, body, getattr(r, "encoding", None), headers.get("ETag"),
+                 headers.get("Last-Modified"), len(body), now, now),
+            )
+            self._size += len(body) - (old[0] if old else 0)
+            self.stores += 1
+            if self._size > self.max_bytes:
+                self._evict(db)
+
+    def forget(self, url: str):
+        """Drop a stored response (e.g. a 200 page that turned out to be a block page)."""
+        with self._lock:
+            db = self._db()
+            key = normalize_url(url)
+            old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= old[0]
+
+    def _evict(self, db: sqlite3.Connection):
+        # Drop least-recently-used entries until we are 10% under the cap
+        target = int(self.max_bytes * 0.9)
+        rows = db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            doomed.append((key,))
+            self._size -= size
+        db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def _response(self, entry: Dict) -> CachedResponse:
+        return CachedResponse(entry["url"], entry["status"], entry["body"], entry["encoding"],
+                              entry.get("etag"), entry.get("last_modified"))
+
+    def stats(self) -> Dict[str, int]:
+        lookups = self.hits + self.misses + self.revalidated
+        return {
+            "hits": self.hits, "misses": self.misses, "revalidated": self.revalidated,
+            "stores": self.stores, "evictions": self.evictions,
+            "hit_rate_pct": int(100 * (self.hits + self.revalidated) / lookups) if lookups else 0,
+            "bytes": self._size or 0,
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (f"Cache: {s['hits']} hits, {s['revalidated']} revalidated, {s['misses']} misses "
+                f"({s['hit_rate_pct']}% served from cache), {s['bytes'] // 1024} KiB stored")
+
+
+def _build() -> Optional[ResponseCache]:
+    if (os.getenv("ARGUS_CACHE") or "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    try:
+        ttl = float(os.getenv("ARGUS_CACHE_TTL") or DEFAULT_TTL)
+        max_mb = float(os.getenv("ARGUS_CACHE_MAX_MB") or DEFAULT_MAX_MB)
+    except ValueError:
+        ttl, max_mb = DEFAULT_TTL, DEFAULT_MAX_MB
+    path = os.getenv("ARGUS_CACHE_PATH") or os.path.join(".cache", "http_cache.sqlite3")
+    return ResponseCache(path, default_ttl=ttl, max_bytes=int(max_mb * 1024 * 1024))
+
+
+_cache: Optional[ResponseCache] = None
+_cache_built = False
+_build_lock = threading.Lock()
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """The shared response cache, or None when disabled via ARGUS_CACHE=0."""
+    global _cache, _cache_built
+    if not _cache_built:
+        with _build_lock:
+            if not _cache_built:
+                _cache = _build()
+                _cache_built = True
+    return _cache
+
+
+def configure_from_sites(sites: Iterable[Dict], hosts: Optional[Dict[str, Dict]] = None):
+    """Apply "cache_ttl" settings from sites.json entries and its "hosts" section."""
+    c = get_cache()
+    if c is None:
+        return
+    for host, cfg in (hosts or {}).items():
+        if cfg.get("cache_ttl") is not None:
+            c.set_ttl(host, cfg["cache_ttl"])
+    for site in sites:
+        if site.get("cache_ttl") is not None:
+            c.set_ttl(site.get("domain") or site.get("name") or "", site["cache_ttl"])
+
+
+def forget(url: str):
+    """Drop url from the shared cache, if caching is on."""
+    c = get_cache()
+    if c is not None:
+        c.forget(url)
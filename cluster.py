@@ -0,0 +1,334 @@
+"""Sharded discovery across several nodes (coordinator + HTTP worker nodes).
+
+One host (one outbound IP) can only go so fast before the brokers throttle
+it. A node is an ARGUS process serving broker tasks over local HTTP:
+
+    python app.py node --port 8701            # on each machine
+    python app.py cluster --input clients.csv --nodes http://hostA:8701,http://hostB:8701
+    python app.py cluster --input clients.csv --local 3     # 3 nodes on this machine
+
+The coordinator plans the (client x broker) tasks as discover-batch does
+(generic brokers batched) and hands each one to a node. Every node keeps its
+own per-host rate limits (from its sites.json) and reports them in /info. The
+coordinator mirrors each node's buckets and places a task on the node whose
+bucket for the task's host frees up soonest (a batched DuckDuckGo group
+counts as BATCH_MAX_PAGES requests), so the load for one broker is spread
+over all nodes instead of piling onto one. A node that stops
+answering is dropped and its in-flight tasks go to the others.
+
+Results come back to the coordinator, which streams them to the sinks and
+journal and records each client's run in the results store (store.py).
+
+Node protocol (JSON over HTTP):
+- GET /info -> {"slots", "default": [rate, burst], "limits": {host: [rate, burst]}}
+- POST /task {"client": {...}, "sites": [...], "batched": bool}
+  -> {"results": [BrokerResult dicts], "timings": {broker: {stage: seconds}}}
+"""
+import json, os, queue, subprocess, sys, threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+import requests
+from models import BrokerResult, ClientProfile
+from brokers import load_module
+from ratelimit import TokenBucket, host_key, limiter
+from tracing import Tracer
+import app
+
+DEFAULT_PORT = 8701
+TASK_TIMEOUT = 600.0  # a node may sit on a task while its rate limits hold it back
+
+
+class NoNodesError(RuntimeError):
+    """Every cluster node has failed."""
+
+
+def task_host(site: Dict) -> str:
+    """The host a site's search request goes to (the rate-limited resource)."""
+    mod = load_module(site["module"])
+    if site.get("module") == "generic":
+        return host_key(mod.DUCK_BASE)
+    return host_key(getattr(mod, "BASE", None) or site.get("domain") or site.get("name") or "")
+
+
+def task_cost(site: Dict, batched: bool) -> int:
+    """Requests a task may send to its host: a batched group pages through up to BATCH_MAX_PAGES."""
+    return load_module(site["module"]).BATCH_MAX_PAGES if batched else 1
+
+
+# --- Node ---
+
+def serve_node(port: int = DEFAULT_PORT, host: str = "127.0.0.1", slots: Optional[int] = None) -> ThreadingHTTPServer:
+    """Serve broker tasks on a daemon thread; returns the server (call .shutdown() to stop)."""
+    app.apply_site_config(app.load_config())  # this node's rate limits
+    slots = app._max_workers(slots)
+    gate = threading.BoundedSemaphore(slots)
+
+    class _Handler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, payload: Dict):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/info":
+                return self._reply(404, {"error": "not found"})
+            self._reply(200, {"slots": slots, "default": list(limiter.default),
+                              "limits": {h: list(v) for h, v in limiter.limits().items()}})
+
+        def do_POST(self):
+            if self.path != "/task":
+                return self._reply(404, {"error": "not found"})
+            try:
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+                profile = ClientProfile(**req["client"])
+                sites = req["sites"]
+                tracer = Tracer(profile.name)
+                with gate:
+                    rs = app._run_task(profile, sites, (list(range(len(sites))), bool(req.get("batched"))),
+                                       tracer=tracer)
+            except Exception as e:
+                return self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+            self._reply(200, {"results": [r.to_dict() for r in rs], "timings": tracer.broker_times()})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="argus-node", daemon=True).start()
+    return server
+
+
+def start_local_nodes(n: int, slots: Optional[int] = None) -> List[subprocess.Popen]:
+    """Start n node processes on this machine (random ports); their URLs are in proc.url."""
+    procs = []
+    cmd = [sys.executable, os.path.abspath(app.__file__), "node", "--port", "0"]
+    if slots:
+        cmd += ["--slots", str(slots)]
+    for _ in range(n):
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+        line = proc.stdout.readline()  # "Node listening on http://127.0.0.1:<port> ..."
+        if "http://" not in line:
+            stop_local_nodes(procs + [proc])
+            raise RuntimeError(f"Local node failed to start: {line.strip() or 'no output'}")
+        proc.url = "http://" + line.split("http://", 1)[1].split()[0]
+        procs.append(proc)
+    return procs
+
+
+def stop_local_nodes(procs: List[subprocess.Popen]):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# --- Coordinator ---
+
+class Node:
+    """Coordinator-side view of a node: free slots and a mirror of its per-host buckets."""
+
+    def __init__(self, url: str, http: requests.Session):
+        self.url = url.rstrip("/")
+        self.http = http
+        info = http.get(self.url + "/info", timeout=10).json()
+        self.slots = int(info["slots"])
+        self.default = tuple(info["default"])
+        self.limits = {h: tuple(v) for h, v in info["limits"].items()}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.inflight = 0
+        self.alive = True
+        self.done = 0
+
+    def bucket(self, host: str) -> TokenBucket:
+        b = self.buckets.get(host)
+        if b is None:
+            b = self.buckets[host] = TokenBucket(*self.limits.get(host, self.default))
+        return b
+
+    def run(self, profile: ClientProfile, sites: List[Dict], batched: bool) -> Dict:
+        r = self.http.post(self.url + "/task", json={"client": asdict(profile), "sites": sites, "batched": batched},
+                           timeout=TASK_TIMEOUT)
+        if r.status_code != 200:
+            try:
+                error = r.json().get("error")
+            except ValueError:
+                error = None
+            raise RuntimeError(error or f"HTTP {r.status_code}")
+        return r.json()
+
+
+class Coordinator:
+    def __init__(self, urls: List[str]):
+        self.http = requests.Session()
+        self.nodes: List[Node] = []
+        for url in urls:
+            try:
+                self.nodes.append(Node(url, self.http))
+            except (requests.RequestException, ValueError, KeyError) as e:
+                print(f"Skipping node {url}: {e}")
+        if not self.nodes:
+            raise RuntimeError("No cluster nodes reachable")
+        self._cond = threading.Condition()
+
+    @property
+    def slots(self) -> int:
+        return sum(n.slots for n in self.nodes)
+
+    def _place(self, host: str, cost: int = 1) -> Node:
+        """The live node with a free slot whose bucket for host frees up soonest (blocks while all are busy).
+
+        cost tokens are taken from that node's mirrored bucket.
+        """
+        with self._cond:
+            while True:
+                live = [n for n in self.nodes if n.alive]
+                if not live:
+                    raise NoNodesError("All cluster nodes failed")
+                free = [n for n in live if n.inflight < n.slots]
+                if free:
+                    node = min(free, key=lambda n: (n.bucket(host).wait_time(), n.inflight / n.slots))
+                    node.bucket(host).reserve(cost)
+                    node.inflight += 1
+                    return node
+                self._cond.wait()
+
+    def _release(self, node: Node, error: Optional[Exception] = None):
+        with self._cond:
+            node.inflight -= 1
+            if error is None:
+                node.done += 1
+            elif node.alive:
+                node.alive = False
+                print(f"Node {node.url} failed ({error}); moving its tasks to the other nodes")
+            self._cond.notify_all()
+
+    def run(self, profiles: List[ClientProfile], sites: List[Dict], plans: List[List], deliver):
+        """Run every task in plans (one task list per profile) on the nodes.
+
+        deliver(c, idx, result, timings) is called from this thread as results arrive.
+        """
+        todo: "queue.Queue" = queue.Queue()
+        for c, plan in enumerate(plans):
+            for task in plan:
+                todo.put((c, task))
+        n_tasks = todo.qsize()
+        done: "queue.Queue" = queue.Queue()
+
+        def errors(idxs, e: Exception) -> Dict:
+            return {"results": [app._error_result(sites[i], e).to_dict() for i in idxs], "timings": {}}
+
+        def run_task(c: int, task) -> Dict:
+            """The task's node output; error results if it cannot run (a dead node's tasks move on)."""
+            idxs, batched = task
+            while True:
+                try:
+                    site = sites[idxs[0]]
+                    node = self._place(task_host(site), task_cost(site, batched))
+                except NoNodesError:
+                    raise
+                except Exception as e:
+                    return errors(idxs, e)
+                try:
+                    out = node.run(profiles[c], [sites[i] for i in idxs], batched)
+                except requests.RequestException as e:
+                    self._release(node, e)
+                    continue
+                except Exception as e:
+                    self._release(node)
+                    return errors(idxs, e)
+                self._release(node)
+                return out
+
+        def dispatch():
+            while True:
+                try:
+                    c, task = todo.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    done.put((c, task, run_task(c, task)))
+                except Exception as e:
+                    # No node left (or a bug): stop the run instead of leaving it waiting on this task
+                    done.put(e)
+                    return
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.slots, n_tasks)), thread_name_prefix="dispatch") as pool:
+            for _ in range(max(1, min(self.slots, n_tasks))):
+                pool.submit(dispatch)
+            for _ in range(n_tasks):
+                item = done.get()
+                if isinstance(item, Exception):
+                    raise item
+                c, (idxs, _), out = item
+                for idx, r in zip(idxs, out["results"]):
+                    deliver(c, idx, BrokerResult(**r), out["timings"])
+
+    def summary(self) -> str:
+        parts = [f"{n.url} {n.done} tasks" + ("" if n.alive else " (failed)") for n in self.nodes]
+        return f"Cluster: {len(self.nodes)} nodes, {self.slots} slots: " + ", ".join(parts)
+
+
+def run_cluster(profiles: List[ClientProfile], coordinator: Coordinator, on_client_done=None, progress_cb=None,
+                include_disabled: bool = False, batch_search: Optional[bool] = None, sink=None, journal=None):
+    """run_discovery_batch with the tasks executed on cluster nodes.
+
+    on_client_done(profile, results, timings) is called once a client's last
+    broker finishes (timings as Tracer.broker_times(), merged from the nodes).
+    Sink and journal work as in run_discovery_batch. Returns one result list
+    per profile, in input order.
+    """
+    sites = app._selected_sites(include_disabled)
+    results: List[List[Optional[BrokerResult]]] = [[None] * len(sites) for _ in profiles]
+    timings: List[Dict] = [{} for _ in profiles]
+    remaining = [len(sites) for _ in profiles]
+    total = max(1, len(sites) * len(profiles))
+    batch = app._batch_enabled(batch_search)
+    done = 0
+
+    def deliver(c: int, idx: int, r: BrokerResult, task_timings: Optional[Dict] = None, resumed: bool = False):
+        nonlocal done
+        results[c][idx] = r
+        timings[c].update(task_timings or {})
+        if sink is not None:
+            sink.write(profiles[c], idx, r)
+        if journal is not None and not resumed:
+            journal.finished(profiles[c], sites[idx], r)
+        remaining[c] -= 1
+        done += 1
+        if progress_cb:
+            progress_cb(int((done / total) * 100), f"{r.broker} for {profiles[c].name}")
+        if remaining[c] == 0:
+            if sink is not None:
+                sink.finish(profiles[c])
+            if on_client_done:
+                on_client_done(profiles[c], results[c], timings[c])
+
+    if progress_cb:
+        progress_cb(0, f"Starting discovery for {len(profiles)} clients on {len(coordinator.nodes)} nodes")
+    plans = []
+    for c, profile in enumerate(profiles):
+        resumed = app._resumed(profile, sites, journal)
+        plans.append(app._plan_tasks(sites, batch, resumed))
+        if journal is not None:
+            for idx in range(len(sites)):
+                if idx not in resumed:
+                    journal.started(profile, sites[idx])
+        for idx, r in resumed.items():
+            deliver(c, idx, r, resumed=True)
+        if not sites and on_client_done:
+            on_client_done(profile, results[c], timings[c])
+    coordinator.run(profiles, sites, plans, deliver)
+    if journal is not None:
+        journal.complete()
+    if progress_cb:
+        progress_cb(100, "Discovery complete")
+    return results
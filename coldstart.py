@@ -0,0 +1,57 @@
+"""Cold-start budget for the CLI and the dashboard.
+
+Times `import app` and `import Dashboard` in fresh interpreters (median of
+several runs) and checks that no heavy dependency is imported at startup;
+broker modules, lxml and requests should only load once a search runs.
+
+    python coldstart.py            # exits 1 if over budget
+    python coldstart.py --runs 9
+"""
+import argparse, json, statistics, subprocess, sys
+
+BUDGET_MS = {"app": 150, "Dashboard": 200}
+# Must not be imported just by starting the CLI or the dashboard
+DEFERRED = ("pandas", "numpy", "bs4", "lxml", "requests", "PIL", "brokers.spokeo", "brokers.generic")
+
+_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - t) * 1000
+print(json.dumps({{"ms": ms, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, runs: int = 5):
+    """(median import ms, heavy modules loaded) for `module` in fresh interpreters."""
+    times, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module, deferred=DEFERRED)],
+                             capture_output=True, text=True, check=True).stdout
+        data = json.loads(out.strip().splitlines()[-1])
+        times.append(data["ms"])
+        loaded.update(data["loaded"])
+    return statistics.median(times), sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check CLI/dashboard import time against the cold-start budget")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    ok = True
+    for module, budget in BUDGET_MS.items():
+        try:
+            ms, loaded = measure(module, args.runs)
+        except subprocess.CalledProcessError as e:
+            print(f"{module}: import failed\n{e.stderr.strip()}")
+            ok = False
+            continue
+        over = ms > budget or loaded
+        ok = ok and not over
+        extra = f", loaded {', '.join(loaded)}" if loaded else ""
+        print(f"{module}: {ms:.0f} ms (budget {budget} ms){extra} -> {'OVER' if over else 'ok'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Streaming HTML match engine shared by the broker modules.
+
+Pages are fed as raw bytes, in chunks, to an lxml HTML parser with a SAX-style
+target: no tree is built, text inside script/style/noscript/template is never
+looked at, and feeding stops as soon as everything asked for has been found.
+lxml decodes the bytes itself (from the charset header passed in, or the
+page's meta/BOM), so a page is never decoded twice.
+"""
+import hashlib, re, time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from lxml import etree
+from matcher import FOUND_SCORE, Match, MatchStream, matcher_for
+from tracing import stage
+import metrics
+
+CHUNK_SIZE = 16 * 1024
+SKIP_TAGS = frozenset(("script", "style", "noscript", "template"))
+TITLE_TAGS = ("h1", "h2", "title")
+
+
+@dataclass
+class ScanResult:
+    terms_found: bool = False
+    title: Optional[str] = None
+    element_text: Optional[str] = None
+    element_attrib: Optional[Dict[str, str]] = None
+    bytes_read: int = 0
+    complete: bool = False  # True if the whole page had to be read
+    matches: List[Match] = field(default_factory=list)
+
+    @property
+    def score(self) -> float:
+        return self.matches[0].score if self.matches else 0.0
+
+
+class _Target:
+    def __init__(self, terms, title_tags, match_tag, match_class, match, stream=None):
+        self.stream = stream
+        self.pending = {t.lower() for t in terms if t}
+        self.title_tags = frozenset(title_tags)
+        self.match_tag = match_tag
+        self.match_class = frozenset(match_class) if match_class else None
+        self.match = match
+        self.skip = 0
+        self.tail = ""  # end of the previous text run, so terms split across runs still match
+        self.title_parts = None
+        self.title_tag = None
+        self.title_depth = 0
+        self.title: Optional[str] = None
+        self.el_parts = None
+        self.el_attrib = None
+        self.el_depth = 0
+        self.element: Optional[Tuple[str, Dict[str, str]]] = None
+
+    @property
+    def done(self) -> bool:
+        return (not self.pending
+                and (self.stream is None or self.stream.done)
+                and (self.title is not None or not self.title_tags)
+                and (self.element is not None or self.match_tag is None))
+
+    def start(self, tag, attrib):
+        if tag in SKIP_TAGS:
+            self.skip += 1
+            return
+        if self.title is None and self.title_parts is None and tag in self.title_tags:
+            self.title_parts, self.title_tag, self.title_depth = [], tag, 0
+        if self.title_parts is not None and tag == self.title_tag:
+            self.title_depth += 1
+        if self.match_tag is not None and self.element is None and tag == self.match_tag:
+            if self.el_parts is None:
+                classes = (attrib.get("class") or "").split()
+                if self.match_class is None or self.match_class.intersection(classes):
+                    self.el_parts, self.el_attrib, self.el_depth = [], dict(attrib), 0
+            if self.el_parts is not None:
+                self.el_depth += 1
+
+    def end(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip = max(0, self.skip - 1)
+            return
+        if self.title_parts is not None and tag == self.title_tag:
+            self.title_depth -= 1
+            if self.title_depth <= 0:
+                self.title = " ".join(self.title_parts)
+                self.title_parts = None
+        if self.el_parts is not None and tag == self.match_tag:
+            self.el_depth -= 1
+            if self.el_depth <= 0:
+                text = " ".join(self.el_parts)
+                if self.match is None or self.match(text, self.el_attrib):
+                    self.element = (text, self.el_attrib)
+                self.el_parts = None
+
+    def data(self, data):
+        if self.skip:
+            return
+        piece = data.strip()
+        if not piece:
+            return
+        if self.title_parts is not None:
+            self.title_parts.append(piece)
+        if self.el_parts is not None:
+            self.el_parts.append(piece)
+        if self.stream is not None:
+            self.stream.feed(piece)
+        if self.pending:
+            window = self.tail + data.lower()
+            self.pending = {t for t in self.pending if t not in window}
+            self.tail = window[-64:]
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return None
+
+
+def scan(content: bytes, *, terms: Iterable[str] = (), title_tags: Iterable[str] = (),
+         match_tag: Optional[str] = None, match_class: Optional[Iterable[str]] = None,
+         match: Optional[Callable[[str, Dict[str, str]], bool]] = None,
+         stream: Optional[MatchStream] = None, encoding: Optional[str] = None,
+         chunk_size: int = CHUNK_SIZE) -> ScanResult:
+    """Stream `content` once and stop early when every requested item is found.
+
+    - terms: lowercase substrings that must all occur in the visible text
+    - title_tags: capture the text of the first element with one of these tags
+    - match_tag/match_class/match: the first element with that tag (and any of
+      those classes) whose text satisfies match(text, attrib)
+    - stream: a matcher.MatchStream fed every visible text run; scanning stops
+      early once it reports a confident match
+    """
+    started = time.perf_counter()
+    with stage("parse") as span:
+        result = _scan(content, _Target(tuple(terms), tuple(title_tags), match_tag, match_class, match, stream),
+                       encoding, chunk_size)
+        span["bytes_read"] = result.bytes_read
+    metrics.observe("argus_parse_seconds", time.perf_counter() - started)
+    return result
+
+
+def _scan(content, target: _Target, encoding, chunk_size) -> ScanResult:
+    stream = target.stream
+    result = ScanResult()
+    if content:
+        if isinstance(content, str):
+            content, encoding = content.encode("utf-8"), "utf-8"
+        parser = etree.HTMLParser(target=target, encoding=encoding or None, recover=True,
+                                  remove_comments=True, no_network=True)
+        pos = 0
+        try:
+            while pos < len(content) and not target.done:
+                parser.feed(content[pos:pos + chunk_size])
+                pos += chunk_size
+            if not target.done:
+                parser.close()
+                result.complete = True
+        except etree.LxmlError:
+            pass
+        result.bytes_read = min(pos, len(content))
+    result.terms_found = not target.pending
+    result.title = target.title[:160] if target.title else None
+    if target.element is not None:
+        result.element_text, result.element_attrib = target.element
+    if stream is not None:
+        result.matches = stream.matches
+    return result
+
+
+class _Collector:
+    def __init__(self, tags):
+        self.tags = frozenset(tags)
+        self.skip = 0
+        self.open: List[Tuple[str, List[str], Dict[str, str], int]] = []
+        self.items: List[Tuple[str, str, Dict[str, str]]] = []
+
+    def start(self, tag, attrib):
+        if tag in SKIP_TAGS:
+            self.skip += 1
+        elif tag in self.tags:
+            self.open.append((tag, [], dict(attrib), len(self.items)))
+            self.items.append((tag, "", {}))  # placeholder keeps document order
+
+    def end(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip = max(0, self.skip - 1)
+        elif self.open and self.open[-1][0] == tag:
+            tag, parts, attrib, slot = self.open.pop()
+            self.items[slot] = (tag, " ".join(parts), attrib)
+            if self.open:
+                self.open[-1][1].extend(parts)
+
+    def data(self, data):
+        if not self.skip and self.open:
+            piece = data.strip()
+            if piece:
+                self.open[-1][1].append(piece)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return None
+
+
+def collect(content: bytes, tags: Iterable[str], encoding: Optional[str] = None) -> List[Tuple[str, str, Dict[str, str]]]:
+    """Every element with one of `tags` as (tag, text, attrib), in document order, in one streaming pass."""
+    if not content:
+        return []
+    if isinstance(content, str):
+        content, encoding = content.encode("utf-8"), "utf-8"
+    target = _Collector(tags)
+    parser = etree.HTMLParser(target=target, encoding=encoding or None, recover=True,
+                              remove_comments=True, no_network=True)
+    started = time.perf_counter()
+    with stage("parse", bytes_read=len(content)):
+        try:
+            for pos in range(0, len(content), CHUNK_SIZE):
+                parser.feed(content[pos:pos + CHUNK_SIZE])
+            parser.close()
+        except etree.LxmlError:
+            pass
+    metrics.observe("argus_parse_seconds", time.perf_counter() - started)
+    return [item for item in target.items if item[2] or item[1]]
+
+
+def fingerprint(content: bytes, encoding: Optional[str] = None, tag: Optional[str] = None,
+                classes: Optional[Iterable[str]] = None) -> str:
+    """Hash of a page's normalized visible text, or of just its result region
+    (elements with `tag` and any of `classes`), so ads, timestamps and tokens
+    elsewhere on the page don't count as a change."""
+    if tag is None:
+        parts = [text for _, text, _ in collect(content, ("body",), encoding=encoding)]
+    else:
+        wanted = frozenset(classes or ())
+        parts = [f"{text} {attrib.get('href') or ''}" for _, text, attrib in collect(content, (tag,), encoding=encoding)
+                 if not wanted or wanted.intersection((attrib.get("class") or "").split())]
+    norm = re.sub(r"\s+", " ", " ".join(parts)).strip().lower()
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+
+def response_bytes(r) -> Tuple[bytes, Optional[str]]:
+    """Raw body and declared charset of a polite_get response, without decoding it."""
+    content = getattr(r, "content", b"") or b""
+    headers = getattr(r, "headers", None) or {}
+    ctype = headers.get("Content-Type") or headers.get("content-type") or ""
+    encoding = None
+    if "charset=" in ctype.lower():
+        encoding = ctype.lower().split("charset=", 1)[1].split(";", 1)[0].strip().strip('"') or None
+    if encoding is None and getattr(r, "from_cache", False):
+        encoding = getattr(r, "encoding", None)
+    return content, encoding
+
+
+def scan_profile(content: bytes, profile, encoding: Optional[str] = None) -> ScanResult:
+    """The brokers' page check: scored name matches for the profile over the
+    visible text, plus the first h1/h2/title. See is_found()."""
+    return scan(content, title_tags=TITLE_TAGS, stream=matcher_for(profile).stream(), encoding=encoding)
+
+
+def is_found(result: ScanResult) -> bool:
+    return result.score >= FOUND_SCORE
@@ -0,0 +1,246 @@
+"""Durable local job queue for discovery scans (SQLite).
+
+Jobs are discovery runs for one client. The CLI and GUIs submit them and
+poll their status, and a worker daemon (worker.py, `app.py worker`) runs them.
+Recurring schedules, such as a weekly re-check of a client, add a job each
+time they come due.
+
+Several workers (processes) can share one queue file: a job is claimed
+inside an IMMEDIATE transaction, so exactly one worker gets it. Workers send
+a heartbeat, and a running job whose worker has gone silent for
+STALE_AFTER seconds goes back to the queue. Its run journal lets the retry
+skip brokers that already finished. A job that fails is retried after
+RETRY_BACKOFF seconds (doubling per attempt); after MAX_ATTEMPTS tries,
+failed or abandoned, it is marked failed.
+
+Settings: ARGUS_QUEUE_PATH (default .cache/jobs.sqlite3)
+"""
+import json, os, re, sqlite3, threading, time
+from dataclasses import asdict
+from typing import Dict, List, Optional
+from models import ClientProfile
+
+DEFAULT_PATH = os.path.join(".cache", "jobs.sqlite3")
+HEARTBEAT_EVERY = 5.0
+STALE_AFTER = 60.0
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 30.0  # seconds before the first retry, doubled for each later one
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_interval(text: str) -> float:
+    """"90", "30m", "12h", "7d", "2w" -> seconds."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*", text or "")
+    if not m:
+        raise ValueError(f"bad interval {text!r} (use e.g. 30m, 12h, 7d)")
+    return float(m.group(1)) * _UNITS[m.group(2) or "s"]
+
+
+class JobQueue:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One connection per thread: GUI pollers and worker threads share the object
+        self._local = threading.local()
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, client TEXT, options TEXT, status TEXT,"
+                " priority INTEGER DEFAULT 0, run_at REAL, created_at REAL, started_at REAL, finished_at REAL,"
+                " attempts INTEGER DEFAULT 0, worker TEXT, progress INTEGER DEFAULT 0, message TEXT,"
+                " found INTEGER, total INTEGER, error TEXT, run_id INTEGER, schedule_id INTEGER, stored_id INTEGER)"
+            )
+            if "stored_id" not in {r[1] for r in db.execute("PRAGMA table_info(jobs)")}:
+                db.execute("ALTER TABLE jobs ADD COLUMN stored_id INTEGER")  # queues from before store.py
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, priority, run_at)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS schedules ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, client TEXT, options TEXT, every REAL,"
+                " next_run_at REAL, enabled INTEGER DEFAULT 1, last_job_id INTEGER)"
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, pid INTEGER, heartbeat_at REAL)")
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Jobs ---
+    def submit(self, profile: ClientProfile, options: Optional[Dict] = None, priority: int = 0,
+               run_at: Optional[float] = None, schedule_id: Optional[int] = None) -> int:
+        now = time.time()
+        with self._db() as db:
+            cur = db.execute(
+                "INSERT INTO jobs (client, options, status, priority, run_at, created_at, schedule_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (json.dumps(asdict(profile)), json.dumps(options or {}), QUEUED, priority,
+                 run_at or now, now, schedule_id))
+        return cur.lastrowid
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Atomically take the next due job (highest priority first), or None.
+
+        Jobs for a client that already has a running job wait their turn: both
+        would write the same result stream and journal run.
+        """
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT id FROM jobs WHERE status = ? AND run_at <= ?"
+                             " AND client NOT IN (SELECT client FROM jobs WHERE status = ?)"
+                             " ORDER BY priority DESC, id LIMIT 1", (QUEUED, time.time(), RUNNING)).fetchone()
+            if row is not None:
+                db.execute("UPDATE jobs SET status = ?, worker = ?, started_at = ?, attempts = attempts + 1,"
+                           " progress = 0, message = NULL, error = NULL WHERE id = ?",
+                           (RUNNING, worker, time.time(), row["id"]))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return self.get(row["id"]) if row is not None else None
+
+    def progress(self, job_id: int, percent: int, message: str = ""):
+        with self._db() as db:
+            db.execute("UPDATE jobs SET progress = ?, message = ? WHERE id = ?", (int(percent), message, job_id))
+
+    def finish(self, job_id: int, found: int, total: int, run_id: Optional[int] = None,
+               stored_id: Optional[int] = None):
+        """Mark the job done; run_id is its journal run (per-broker timings), stored_id its results-store run."""
+        with self._db() as db:
+            db.execute("UPDATE jobs SET status = ?, finished_at = ?, progress = 100, message = ?,"
+                       " found = ?, total = ?, run_id = ?, stored_id = ? WHERE id = ?",
+                       (DONE, time.time(), "Discovery complete", found, total, run_id, stored_id, job_id))
+
+    def fail(self, job_id: int, error: str):
+        """Requeue the job with backoff, or mark it failed once it has had MAX_ATTEMPTS tries."""
+        now = time.time()
+        with self._db() as db:
+            db.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL,"
+                       " run_at = ? + ? * (1 << MAX(attempts - 1, 0)), finished_at = ?, error = ? WHERE id = ?",
+                       (MAX_ATTEMPTS, FAILED, QUEUED, now, RETRY_BACKOFF, now, error[:2000], job_id))
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that has not started yet."""
+        with self._db() as db:
+            cur = db.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                             (CANCELLED, time.time(), job_id, QUEUED))
+        return cur.rowcount > 0
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row is not None else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        if status:
+            rows = self._db().execute("SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit))
+        else:
+            rows = self._db().execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [_job(r) for r in rows]
+
+    # --- Schedules ---
+    def schedule(self, profile: ClientProfile, every: float, options: Optional[Dict] = None,
+                 start_at: Optional[float] = None) -> int:
+        with self._db() as db:
+            cur = db.execute("INSERT INTO schedules (client, options, every, next_run_at) VALUES (?, ?, ?, ?)",
+                             (json.dumps(asdict(profile)), json.dumps(options or {}), every, start_at or time.time()))
+        return cur.lastrowid
+
+    def unschedule(self, schedule_id: int) -> bool:
+        with self._db() as db:
+            cur = db.execute("UPDATE schedules SET enabled = 0 WHERE id = ?", (schedule_id,))
+        return cur.rowcount > 0
+
+    def schedules(self) -> List[Dict]:
+        rows = self._db().execute("SELECT * FROM schedules WHERE enabled = 1 ORDER BY next_run_at")
+        return [{**dict(r), "client": json.loads(r["client"]), "options": json.loads(r["options"])} for r in rows]
+
+    def enqueue_due(self) -> List[int]:
+        """Submit a job for every schedule that came due; returns the new job ids.
+
+        A schedule whose previous job is still queued or running is pushed back
+        rather than stacking up duplicate jobs.
+        """
+        now = time.time()
+        new = []
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for s in db.execute("SELECT * FROM schedules WHERE enabled = 1 AND next_run_at <= ?", (now,)).fetchall():
+                last = db.execute("SELECT status FROM jobs WHERE id = ?", (s["last_job_id"],)).fetchone()
+                if last is None or last["status"] in FINISHED:
+                    cur = db.execute(
+                        "INSERT INTO jobs (client, options, status, priority, run_at, created_at, schedule_id)"
+                        " VALUES (?, ?, ?, 0, ?, ?, ?)", (s["client"], s["options"], QUEUED, now, now, s["id"]))
+                    new.append(cur.lastrowid)
+                    db.execute("UPDATE schedules SET last_job_id = ? WHERE id = ?", (cur.lastrowid, s["id"]))
+                # Next slot on the schedule's own grid, skipping any missed while no worker ran
+                missed = int((now - s["next_run_at"]) // s["every"]) + 1
+                db.execute("UPDATE schedules SET next_run_at = ? WHERE id = ?",
+                           (s["next_run_at"] + missed * s["every"], s["id"]))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return new
+
+    # --- Workers ---
+    def heartbeat(self, worker: str):
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO workers VALUES (?, ?, ?)", (worker, os.getpid(), time.time()))
+
+    def unregister(self, worker: str):
+        with self._db() as db:
+            db.execute("DELETE FROM workers WHERE id = ?", (worker,))
+
+    def workers_alive(self) -> int:
+        row = self._db().execute("SELECT COUNT(*) FROM workers WHERE heartbeat_at >= ?",
+                                 (time.time() - STALE_AFTER,)).fetchone()
+        return row[0]
+
+    def requeue_stale(self) -> int:
+        """Put back running jobs whose worker stopped sending heartbeats; returns how many.
+
+        A job that has already had MAX_ATTEMPTS tries is marked failed instead
+        (it may be what keeps killing its workers).
+        """
+        now = time.time()
+        with self._db() as db:
+            cur = db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL,"
+                " finished_at = CASE WHEN attempts >= ? THEN ? END,"
+                " error = CASE WHEN attempts >= ? THEN 'worker stopped while running the job' ELSE error END"
+                " WHERE status = ? AND"
+                " (worker IS NULL OR worker NOT IN (SELECT id FROM workers WHERE heartbeat_at >= ?))",
+                (MAX_ATTEMPTS, FAILED, QUEUED, MAX_ATTEMPTS, now, MAX_ATTEMPTS, RUNNING, now - STALE_AFTER))
+        return cur.rowcount
+
+
+def _job(row: sqlite3.Row) -> Dict:
+    job = dict(row)
+    job["client"] = json.loads(job["client"])
+    job["options"] = json.loads(job["options"] or "{}")
+    return job
+
+
+def profile_of(job: Dict) -> ClientProfile:
+    return ClientProfile(**job["client"])
+
+
+_queue: Optional[JobQueue] = None
+_lock = threading.Lock()
+
+
+def get_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = JobQueue(os.getenv("ARGUS_QUEUE_PATH") or DEFAULT_PATH)
+    return _queue
@@ -0,0 +1,151 @@
+"""Durable run journal: checkpointed, resumable discovery runs.
+
+Every (client, broker) task is written to the journal when it starts and
+again, with its result, when it finishes. If a run dies part-way (a GUI
+closed mid-scan, a killed batch job), the next run for the same client or
+batch picks the unfinished run back up: finished brokers are taken from the
+journal and only the rest are searched again. Brokers that ended in an error
+are retried.
+
+A run is matched by key (the client's details, or the whole client list of a
+batch) and is only resumed within RESUME_MAX_AGE; completed runs are pruned
+after KEEP_DAYS.
+
+Settings:
+- ARGUS_JOURNAL=0 disables the journal
+- ARGUS_JOURNAL_PATH (default .cache/journal.sqlite3)
+"""
+import hashlib, json, os, sqlite3, threading, time
+from typing import Dict, List, Optional
+from models import BrokerResult, ClientProfile
+from monitor import site_key
+
+RESUME_MAX_AGE = 24 * 3600
+KEEP_DAYS = 7
+DEFAULT_PATH = os.path.join(".cache", "journal.sqlite3")
+RUNNING, DONE, FAILED = "running", "done", "failed"
+
+
+def client_key(profile: ClientProfile) -> str:
+    return "|".join((getattr(profile, f) or "").strip().lower() for f in ("name", "city", "state", "phone", "address"))
+
+
+def run_key(profiles: List[ClientProfile]) -> str:
+    """Journal key for a run over these clients (order-independent)."""
+    keys = sorted(client_key(p) for p in profiles)
+    if len(keys) == 1:
+        return "client:" + keys[0]
+    return "batch:" + hashlib.sha1("\n".join(keys).encode("utf-8")).hexdigest()
+
+
+def _is_error(result: BrokerResult) -> bool:
+    return (result.notes or "").startswith("Error during search")
+
+
+class Journal:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, created_at REAL, finished_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " run_id INTEGER, client TEXT, site TEXT, broker TEXT, status TEXT,"
+            " started_at REAL, finished_at REAL, result TEXT, PRIMARY KEY (run_id, client, site))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_key ON runs(key, finished_at)")
+        self.prune()
+
+    def _exec(self, sql: str, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def open_run(self, profiles: List[ClientProfile], resume: bool = True) -> "Run":
+        """The latest unfinished run for these clients (if resume and recent enough), else a new one."""
+        key = run_key(profiles)
+        if resume:
+            rows = self._exec("SELECT id FROM runs WHERE key = ? AND finished_at IS NULL AND created_at >= ?"
+                              " ORDER BY id DESC LIMIT 1", (key, time.time() - RESUME_MAX_AGE))
+            if rows:
+                return Run(self, rows[0][0], resumed=True)
+        with self._lock:
+            cur = self._conn.execute("INSERT INTO runs (key, created_at) VALUES (?, ?)", (key, time.time()))
+        return Run(self, cur.lastrowid, resumed=False)
+
+    def prune(self, keep_days: float = KEEP_DAYS):
+        cutoff = time.time() - keep_days * 86400
+        with self._lock:
+            old = [r[0] for r in self._conn.execute(
+                "SELECT id FROM runs WHERE COALESCE(finished_at, created_at) < ?", (cutoff,))]
+            for run_id in old:
+                self._conn.execute("DELETE FROM tasks WHERE run_id = ?", (run_id,))
+                self._conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Run:
+    """One discovery run in the journal; engines call started()/finished() per broker."""
+
+    def __init__(self, journal: Journal, run_id: int, resumed: bool):
+        self.journal = journal
+        self.id = run_id
+        self.resumed = resumed
+
+    def completed(self, profile: ClientProfile) -> Dict[str, BrokerResult]:
+        """Results of brokers that already finished for this client, by monitor.site_key."""
+        rows = self.journal._exec("SELECT site, result FROM tasks WHERE run_id = ? AND client = ? AND status = ?",
+                                  (self.id, client_key(profile), DONE))
+        return {site: BrokerResult(**json.loads(result)) for site, result in rows}
+
+    def started(self, profile: ClientProfile, site: Dict):
+        self.journal._exec(
+            "INSERT OR REPLACE INTO tasks (run_id, client, site, broker, status, started_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.id, client_key(profile), site_key(site), site.get("name") or site.get("domain"), RUNNING, time.time()))
+
+    def finished(self, profile: ClientProfile, site: Dict, result: BrokerResult):
+        self.journal._exec(
+            "UPDATE tasks SET status = ?, finished_at = ?, result = ? WHERE run_id = ? AND client = ? AND site = ?",
+            (FAILED if _is_error(result) else DONE, time.time(), json.dumps(result.to_dict(), ensure_ascii=False),
+             self.id, client_key(profile), site_key(site)))
+
+    def tasks(self, profile: ClientProfile) -> Dict[str, Dict]:
+        """status/started_at/finished_at (epoch seconds) per broker name for this client."""
+        rows = self.journal._exec("SELECT broker, status, started_at, finished_at FROM tasks"
+                                  " WHERE run_id = ? AND client = ?", (self.id, client_key(profile)))
+        return {broker: {"status": status, "started_at": started, "finished_at": finished}
+                for broker, status, started, finished in rows}
+
+    def complete(self):
+        self.journal._exec("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), self.id))
+
+
+_journal: Optional[Journal] = None
+_journal_built = False
+_lock = threading.Lock()
+
+
+def get_journal() -> Optional[Journal]:
+    """The shared journal, or None when disabled via ARGUS_JOURNAL=0."""
+    global _journal, _journal_built
+    if not _journal_built:
+        with _lock:
+            if not _journal_built:
+                if (os.getenv("ARGUS_JOURNAL") or "1").strip().lower() not in ("0", "false", "no", "off"):
+                    _journal = Journal(os.getenv("ARGUS_JOURNAL_PATH") or DEFAULT_PATH)
+                _journal_built = True
+    return _journal
+
+
+def open_run(profiles: List[ClientProfile], resume: bool = True) -> Optional[Run]:
+    """open_run on the shared journal (None when the journal is disabled)."""
+    j = get_journal()
+    return j.open_run(profiles, resume) if j is not None else None
@@ -0,0 +1,245 @@
+"""Compiled name matcher shared by all brokers.
+
+A profile's name variants (full name, middle names/initials, "Last, First",
+first-initial forms and common nicknames) plus its city and state are
+compiled once into a single alternation regex. One pass over the text yields
+every match span; spans are then scored, with a bonus for a name that has the
+client's city or state nearby.
+
+Usage:
+    m = matcher_for(profile)
+    best = m.best(text)          # highest-scoring Match or None
+    stream = m.stream()          # incremental matching for htmlscan
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from models import ClientProfile
+
+# Score of each span kind before the location bonus
+KIND_SCORES = {
+    "full": 1.0,      # First [Middle|M.] Last
+    "reversed": 0.9,  # Last, First
+    "nickname": 0.8,  # Bob Smith for Robert Smith
+    "initial": 0.6,   # R. Smith / R Smith
+    "first": 0.0,
+    "last": 0.0,
+}
+SEPARATE_SCORE = 0.5    # first and last both present, but not adjacent
+LOCATION_BONUS = 0.2
+PROXIMITY_CHARS = 200   # how close city/state must be to a name span
+FOUND_SCORE = 0.5       # brokers report found at or above this score
+OVERLAP_CHARS = 256     # stream tail kept so variants split across text runs still match
+
+_NICKNAME_GROUPS = [
+    ("robert", "bob", "bobby", "rob", "robbie", "bert"),
+    ("william", "bill", "billy", "will", "willie", "liam"),
+    ("richard", "rick", "ricky", "rich", "dick"),
+    ("james", "jim", "jimmy", "jamie"),
+    ("john", "jack", "johnny", "jon"),
+    ("joseph", "joe", "joey"),
+    ("michael", "mike", "mikey", "mick"),
+    ("thomas", "tom", "tommy"),
+    ("charles", "charlie", "chuck", "chas"),
+    ("christopher", "chris", "topher"),
+    ("daniel", "dan", "danny"),
+    ("david", "dave", "davey"),
+    ("edward", "ed", "eddie", "ted", "ned"),
+    ("anthony", "tony"),
+    ("andrew", "andy", "drew"),
+    ("steven", "steve", "stevie"),
+    ("stephen", "steve", "stevie"),
+    ("peter", "pete"),
+    ("matthew", "matt"),
+    ("nicholas", "nick", "nicky"),
+    ("benjamin", "ben", "benny"),
+    ("samuel", "sam", "sammy"),
+    ("alexander", "alex", "al", "xander"),
+    ("jonathan", "jon", "jonny"),
+    ("timothy", "tim", "timmy"),
+    ("gregory", "greg"),
+    ("kenneth", "ken", "kenny"),
+    ("ronald", "ron", "ronnie"),
+    ("donald", "don", "donnie"),
+    ("lawrence", "larry"),
+    ("gerald", "jerry"),
+    ("patrick", "pat", "paddy"),
+    ("elizabeth", "liz", "beth", "betty", "eliza", "lizzie"),
+    ("margaret", "maggie", "meg", "peggy", "marge"),
+    ("katherine", "kate", "katie", "kathy", "kat"),
+    ("catherine", "cathy", "cat", "kate"),
+    ("jennifer", "jen", "jenny"),
+    ("rebecca", "becky", "becca"),
+    ("susan", "sue", "suzy"),
+    ("patricia", "pat", "patty", "trish"),
+    ("deborah", "deb", "debbie"),
+    ("barbara", "barb", "barbie"),
+    ("victoria", "vicky", "tori"),
+    ("christine", "chris", "chrissy", "tina"),
+    ("jessica", "jess", "jessie"),
+    ("samantha", "sam", "sammy"),
+    ("alexandra", "alex", "sandra", "lexi"),
+    ("abigail", "abby"),
+    ("theodore", "ted", "teddy", "theo"),
+    ("konstantinos", "kostas", "gus", "dean"),
+]
+
+
+def _nickname_index() -> Dict[str, Tuple[str, ...]]:
+    index: Dict[str, set] = {}
+    for group in _NICKNAME_GROUPS:
+        for name in group:
+            index.setdefault(name, set()).update(n for n in group if n != name)
+    return {k: tuple(sorted(v)) for k, v in index.items()}
+
+
+NICKNAMES = _nickname_index()
+
+
+@dataclass
+class Match:
+    start: int
+    end: int
+    kind: str
+    text: str
+    score: float = 0.0
+    near_location: bool = False
+
+
+def _word(s: str) -> str:
+    return re.escape(s).replace(r"\ ", r"\s+")
+
+
+class NameMatcher:
+    def __init__(self, first: Optional[str], middle: List[str], last: Optional[str],
+                 city: Optional[str] = None, state: Optional[str] = None):
+        self.first = (first or "").lower()
+        self.last = (last or "").lower() if last and last.lower() != (first or "").lower() else ""
+        self.middle = [m.lower().rstrip(".") for m in middle if m]
+        self.city = (city or "").lower().strip()
+        self.state = (state or "").lower().strip()
+        self.nicknames = NICKNAMES.get(self.first, ())
+        self.pattern = self._compile()
+
+    @classmethod
+    def from_profile(cls, profile: ClientProfile) -> "NameMatcher":
+        keys = profile.query_keys()
+        return cls(keys.get("first"), keys.get("middle_names") or [], keys.get("last"),
+                   keys.get("city"), keys.get("state"))
+
+    def _compile(self) -> Optional["re.Pattern"]:
+        alts = []
+        f, l = self.first, self.last
+        if f and l:
+            mids = [_word(m) for m in self.middle] + [re.escape(m[0]) + r"\.?" for m in self.middle]
+            mid = rf"(?:\s+(?:{'|'.join(mids)}|[a-z]\.?))*" if mids else r"(?:\s+[a-z]\.?)?"
+            alts.append(rf"(?P<full>{_word(f)}{mid}\s+{_word(l)})")
+            alts.append(rf"(?P<reversed>{_word(l)}\s*,\s*{_word(f)})")
+            if self.nicknames:
+                nick = "|".join(_word(n) for n in self.nicknames)
+                alts.append(rf"(?P<nickname>(?:{nick}){mid}\s+{_word(l)})")
+            alts.append(rf"(?P<initial>{re.escape(f[0])}\.?{mid}\s+{_word(l)})")
+            alts.append(rf"(?P<last>{_word(l)})")
+        if f:
+            alts.append(rf"(?P<first>{_word(f)})")
+        if self.city:
+            alts.append(rf"(?P<city>{_word(self.city)})")
+        if self.state:
+            alts.append(rf"(?P<state>{_word(self.state)})")
+        if not alts:
+            return None
+        return re.compile(r"\b(?:" + "|".join(alts) + r")\b", re.IGNORECASE)
+
+    def spans(self, text: str, offset: int = 0) -> List[Match]:
+        """Raw spans (names, city, state) found in one left-to-right pass."""
+        if self.pattern is None or not text:
+            return []
+        return [Match(m.start() + offset, m.end() + offset, m.lastgroup or "", m.group(0))
+                for m in self.pattern.finditer(text)]
+
+    def score(self, spans: Iterable[Match]) -> List[Match]:
+        """Score name spans; returns them best first."""
+        spans = list(spans)
+        places = [s for s in spans if s.kind in ("city", "state")]
+        names = [s for s in spans if s.kind in KIND_SCORES and KIND_SCORES[s.kind] > 0]
+        kinds = {s.kind for s in spans}
+        if not names and self.last and "first" in kinds and "last" in kinds:
+            # Both names appear, just not next to each other
+            first = next(s for s in spans if s.kind == "first")
+            names = [Match(first.start, first.end, "separate", first.text)]
+        if not names and not self.last and "first" in kinds:
+            # Single-word name: the word itself is the match
+            names = [s for s in spans if s.kind == "first"]
+        for s in names:
+            if s.kind == "separate":
+                s.score = SEPARATE_SCORE
+            elif s.kind == "first":
+                s.score = FOUND_SCORE
+            else:
+                s.score = KIND_SCORES[s.kind]
+            s.near_location = any(abs(p.start - s.start) <= PROXIMITY_CHARS for p in places)
+            if s.near_location:
+                s.score = min(1.0, s.score + LOCATION_BONUS)
+        return sorted(names, key=lambda s: (-s.score, not s.near_location, s.start))
+
+    def find(self, text: str) -> List[Match]:
+        return self.score(self.spans(text))
+
+    def best(self, text: str) -> Optional[Match]:
+        found = self.find(text)
+        return found[0] if found else None
+
+    def stream(self) -> "MatchStream":
+        return MatchStream(self)
+
+
+class MatchStream:
+    """Incremental matching over text fed run by run (see htmlscan.scan)."""
+
+    def __init__(self, matcher: NameMatcher):
+        self.matcher = matcher
+        self.buffer = ""
+        self.base = 0       # absolute offset of buffer[0]
+        self.raw: List[Match] = []
+        self._seen = set()
+
+    def feed(self, text: str):
+        joined = f"{self.buffer} {text}" if self.buffer else text
+        new_from = len(self.buffer)
+        for m in self.matcher.spans(joined, self.base):
+            key = (m.start, m.kind)
+            if m.end - self.base > new_from and key not in self._seen:
+                self._seen.add(key)
+                self.raw.append(m)
+        keep = joined[-OVERLAP_CHARS:]
+        self.base += len(joined) - len(keep)
+        self.buffer = keep
+
+    @property
+    def done(self) -> bool:
+        """A confident match: full name next to the client's location (or no location given)."""
+        best = self.best
+        if best is None or best.kind != "full":
+            return False
+        return best.near_location or not (self.matcher.city or self.matcher.state)
+
+    @property
+    def matches(self) -> List[Match]:
+        return self.matcher.score([Match(m.start, m.end, m.kind, m.text) for m in self.raw])
+
+    @property
+    def best(self) -> Optional[Match]:
+        found = self.matches
+        return found[0] if found else None
+
+
+@lru_cache(maxsize=256)
+def _cached(first, middle, last, city, state) -> NameMatcher:
+    return NameMatcher(first, list(middle), last, city, state)
+
+
+def matcher_for(profile: ClientProfile) -> NameMatcher:
+    """Compiled matcher for a profile, built once and reused across brokers."""
+    k = profile.query_keys()
+    return _cached(k.get("first"), tuple(k.get("middle_names") or ()), k.get("last"), k.get("city"), k.get("state"))
@@ -0,0 +1,231 @@
+"""Operational counters for long-running monitoring.
+
+Updates are per-thread: every thread increments its own dicts without taking a
+lock, and readers merge all threads' dicts when metrics are scraped or dumped.
+
+Exposed two ways:
+- serve(port): Prometheus text format at http://127.0.0.1:<port>/metrics
+- JsonlDumper(path, interval): appends one JSON snapshot per interval
+
+Cache and circuit-breaker state come from their own modules at scrape time
+(see COLLECTORS), so they cost nothing on the request path.
+"""
+import json, os, threading, time
+from typing import Callable, Dict, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# name -> (type, help)
+METRICS: Dict[str, Tuple[str, str]] = {
+    "argus_http_requests_total": ("counter", "HTTP responses by host and status"),
+    "argus_http_errors_total": ("counter", "HTTP attempts that raised (timeouts, connection errors)"),
+    "argus_http_retries_total": ("counter", "Retry attempts after a failed first attempt"),
+    "argus_http_bytes_total": ("counter", "Response body bytes downloaded"),
+    "argus_http_seconds": ("histogram", "HTTP attempt latency"),
+    "argus_parse_seconds": ("histogram", "HTML scan/collect time per page"),
+    "argus_broker_results_total": ("counter", "Broker results by broker and outcome (found, not_found, error)"),
+    "argus_broker_seconds": ("histogram", "Time per broker search"),
+    "argus_circuit_trips_total": ("counter", "Times a host's circuit breaker opened"),
+    "argus_hedges_total": ("counter", "Hedged requests sent"),
+    "argus_cache_events_total": ("counter", "Response cache hits, revalidations, misses and evictions"),
+    "argus_circuit_open": ("gauge", "1 while a host's circuit breaker is open or half-open"),
+}
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+_local = threading.local()
+_shards: List[Tuple[threading.Thread, Dict, Dict]] = []   # (thread, counters, histograms) per live thread
+_retired: Tuple[Dict, Dict] = ({}, {})                      # merged shards of threads that have exited
+_shards_lock = threading.Lock()
+
+
+def _shard() -> Tuple[Dict, Dict]:
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = ({}, {})
+        with _shards_lock:
+            _shards.append((threading.current_thread(), *shard))
+    return shard
+
+
+def _merge(into: Tuple[Dict, Dict], counters: Dict, hists: Dict):
+    for key, v in counters.items():
+        into[0][key] = into[0].get(key, 0) + v
+    for key, (buckets, total, count) in hists.items():
+        m = into[1].setdefault(key, [[0] * len(BUCKETS), 0.0, 0])
+        m[0] = [a + b for a, b in zip(m[0], buckets)]
+        m[1] += total
+        m[2] += count
+
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+
+def inc(name: str, labels: Optional[Dict[str, str]] = None, n: float = 1):
+    counters = _shard()[0]
+    key = (name, _labels(labels))
+    counters[key] = counters.get(key, 0) + n
+
+
+def observe(name: str, value: float, labels: Optional[Dict[str, str]] = None):
+    hists = _shard()[1]
+    key = (name, _labels(labels))
+    h = hists.get(key)
+    if h is None:
+        h = hists[key] = [[0] * len(BUCKETS), 0.0, 0]   # bucket counts, sum, count
+    for i, bound in enumerate(BUCKETS):
+        if value <= bound:
+            h[0][i] += 1
+            break
+    h[1] += value
+    h[2] += 1
+
+
+def _copy(d: Dict) -> Dict:
+    # Another thread may be inserting a new key right now; just try again
+    while True:
+        try:
+            return dict(d)
+        except RuntimeError:
+            continue
+
+
+def snapshot() -> Tuple[Dict, Dict, Dict]:
+    """Merged (counters, histograms, gauges) across all threads plus COLLECTORS."""
+    merged: Tuple[Dict, Dict] = ({}, {})
+    with _shards_lock:
+        # Fold exited threads (e.g. finished discovery pools) into _retired
+        for shard in [sh for sh in _shards if not sh[0].is_alive()]:
+            _shards.remove(shard)
+            _merge(_retired, shard[1], shard[2])
+        _merge(merged, *_retired)
+        live = list(_shards)
+    for _, c, h in live:
+        _merge(merged, _copy(c), _copy(h))
+    counters, hists = merged
+    gauges: Dict = {}
+    for collect in COLLECTORS:
+        try:
+            for name, labels, value, kind in collect():
+                (counters if kind == "counter" else gauges)[(name, _labels(labels))] = value
+        except Exception:
+            pass
+    return counters, hists, gauges
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def render() -> str:
+    """Prometheus text exposition format."""
+    counters, hists, gauges = snapshot()
+    by_name: Dict[str, List[str]] = {}
+    for (name, labels), v in sorted(counters.items()) + sorted(gauges.items()):
+        by_name.setdefault(name, []).append(f"{name}{_fmt_labels(labels)} {v:g}")
+    for (name, labels), (buckets, total, count) in sorted(hists.items()):
+        lines = by_name.setdefault(name, [])
+        running = 0
+        for bound, n in zip(BUCKETS, buckets):
+            running += n
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', le))} {running}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {total:g}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+    out = []
+    for name, lines in by_name.items():
+        kind, help_text = METRICS.get(name, ("untyped", ""))
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
+
+
+def to_dict() -> Dict:
+    """JSON-friendly snapshot: {"counters": {...}, "histograms": {...}, "gauges": {...}}."""
+    counters, hists, gauges = snapshot()
+    key = lambda name, labels: name + _fmt_labels(labels)
+    return {
+        "counters": {key(*k): v for k, v in counters.items()},
+        "histograms": {key(*k): {"sum": h[1], "count": h[2], "buckets": h[0]} for k, h in hists.items()},
+        "gauges": {key(*k): v for k, v in gauges.items()},
+    }
+
+
+# --- Scrape-time collectors ---
+def _cache_collector():
+    from cache import get_cache
+    rc = get_cache()
+    if rc is None:
+        return []
+    s = rc.stats()
+    return [("argus_cache_events_total", {"event": e}, s[k], "counter")
+            for e, k in (("hit", "hits"), ("revalidated", "revalidated"), ("miss", "misses"), ("eviction", "evictions"))]
+
+
+def _policy_collector():
+    from policy import get_policy
+    return [("argus_circuit_open", {"host": host}, int(s["state"] != "closed"), "gauge")
+            for host, s in get_policy().stats().items()]
+
+
+COLLECTORS: List[Callable[[], List]] = [_cache_collector, _policy_collector]
+
+
+# --- Exposition ---
+def serve(port: int, host: str = "127.0.0.1"):
+    """Serve /metrics on a daemon thread; returns the server (call .shutdown() to stop)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="argus-metrics", daemon=True).start()
+    return server
+
+
+class JsonlDumper:
+    """Append a metrics snapshot to `path` every `interval` seconds (and once more on stop())."""
+
+    def __init__(self, path: str, interval: float = 60.0):
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="argus-metrics-dump", daemon=True)
+
+    def start(self) -> "JsonlDumper":
+        self._thread.start()
+        return self
+
+    def dump(self):
+        line = json.dumps({"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), **to_dict()})
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.dump()
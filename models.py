@@ -11,9 +11,12 @@ class ClientProfile:
 
     def query_keys(self) -> Dict[str, Any]:
         parts = self.name.split()
+        middle = parts[1:-1]
         return {
             "name": self.name,
             "first": parts[0] if parts else None,
+            "middle": " ".join(middle) or None,
+            "middle_names": middle,
             "last": parts[-1] if parts else None,
             "city": self.city,
             "state": self.state,
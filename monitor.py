@@ -0,0 +1,180 @@
+"""Incremental re-monitoring of a client across runs.
+
+A Monitor keeps .cache/<slug>_state.json with, per broker: the URL last
+fetched, its ETag/Last-Modified, a hash of the raw body, a fingerprint of the
+normalized result region and the last BrokerResult. On the next scan:
+
+- requests carry If-None-Match/If-Modified-Since; a 304 reuses the stored result
+- an identical body, or an unchanged result-region fingerprint, skips parsing
+  (a page the module's is_blocked() rejects is an error, never "unchanged")
+- changes() lists only brokers whose result differs from the previous scan
+
+Brokers without build_url/parse are searched normally; their results still
+take part in change detection. Incremental runs do not batch generic sites
+(see app.run_discovery). A broker that errors (unreachable, blocked) is
+reported as an error and its saved state is left as it was.
+"""
+import hashlib, json, os, threading, time
+from typing import Dict, List, Optional, Tuple
+from models import ClientProfile, BrokerResult
+from brokers import load_module
+from ratelimit import host_key
+from utils import polite_get
+
+# Fields that define a broker's visible state for change reporting
+COMPARED_FIELDS = ("found", "url", "title")
+
+
+def site_key(site: Dict) -> str:
+    return f"{site.get('module')}:{host_key(site.get('domain') or site.get('name') or '')}"
+
+
+def state_path(profile: ClientProfile) -> str:
+    return f".cache/{profile.name.replace(' ', '_').lower()}_state.json"
+
+
+def _is_error(result: BrokerResult) -> bool:
+    return (result.notes or "").startswith("Error during search")
+
+
+class Monitor:
+    def __init__(self, path: str):
+        self.path = path
+        self.state: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.state = json.load(f).get("brokers", {})
+            except (OSError, ValueError):
+                self.state = {}
+        self.previous = {k: dict(v.get("result") or {}) for k, v in self.state.items()}
+        self.labels: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.not_modified = 0   # 304 responses
+        self.unchanged = 0      # same body or same fingerprint: parse skipped
+        self.parsed = 0
+
+    @classmethod
+    def for_profile(cls, profile: ClientProfile) -> "Monitor":
+        return cls(state_path(profile))
+
+    def search(self, profile: ClientProfile, site: Dict) -> BrokerResult:
+        """Conditional fetch + fingerprint check, parsing only pages that changed."""
+        from htmlscan import fingerprint, response_bytes
+        from parsepool import get_pool
+        mod = load_module(site["module"])
+        generic = site.get("module") == "generic"
+        if not (hasattr(mod, "build_url") and hasattr(mod, "parse")):
+            return mod.search(profile, site) if generic else mod.search(profile)
+
+        key = site_key(site)
+        url = mod.build_url(profile, site) if generic else mod.build_url(profile)
+        with self._lock:
+            prev = self.state.get(key)
+        if prev and prev.get("url") != url:
+            prev = None  # profile or query changed; nothing to compare against
+        headers = {}
+        if prev and prev.get("etag"):
+            headers["If-None-Match"] = prev["etag"]
+        if prev and prev.get("last_modified"):
+            headers["If-Modified-Since"] = prev["last_modified"]
+
+        r = polite_get(url, timeout=10.0, attempts=2, allow_fail=True, headers=headers,
+                       cache_ttl=site.get("cache_ttl") if generic else None)
+        status = getattr(r, "status_code", 0)
+        if status == 0:
+            # Unreachable: an error for this scan, not evidence the listing is gone
+            return BrokerResult(broker=site.get("name") or site.get("domain") or key, found=False, url=url,
+                                notes="Error during search: no response")
+        if prev and status == 304:
+            with self._lock:
+                self.not_modified += 1
+            return BrokerResult(**prev["result"])
+
+        body, encoding = response_bytes(r)
+        # A block/captcha page has no result region, so it would fingerprint like an
+        # empty result page: check for it before reusing anything
+        if getattr(mod, "is_blocked", None) is not None and mod.is_blocked(body):
+            return mod.blocked_result(site, url)
+        body_hash = hashlib.sha1(body).hexdigest()
+        region = getattr(mod, "FINGERPRINT_REGION", None)
+        fp = fingerprint(body, encoding, *(region or ()))
+        if prev and prev.get("result") and (prev.get("body_hash") == body_hash or prev.get("fingerprint") == fp):
+            result = BrokerResult(**prev["result"])
+            with self._lock:
+                self.unchanged += 1
+        elif get_pool() is not None:
+            result = get_pool().parse(profile, site, body, url, encoding)
+            with self._lock:
+                self.parsed += 1
+        else:
+            result = mod.parse(profile, site, body, url, encoding) if generic else mod.parse(profile, body, url, encoding)
+            with self._lock:
+                self.parsed += 1
+
+        if _is_error(result):
+            return result
+        headers_in = getattr(r, "headers", None) or {}
+        with self._lock:
+            self.state[key] = {
+                "url": url,
+                "etag": headers_in.get("ETag"),
+                "last_modified": headers_in.get("Last-Modified"),
+                "body_hash": body_hash,
+                "fingerprint": fp,
+                "result": result.to_dict(),
+                "checked_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+        return result
+
+    def record(self, site: Dict, result: BrokerResult):
+        """Remember the final result for a site (called for every site in the run).
+
+        Errored searches are skipped, keeping the last known state.
+        """
+        if _is_error(result):
+            return
+        key = site_key(site)
+        with self._lock:
+            self.labels[key] = result.broker
+            entry = self.state.setdefault(key, {})
+            entry["result"] = result.to_dict()
+            entry.setdefault("checked_at", time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+    def changes(self) -> List[Tuple[str, Optional[Dict], Dict]]:
+        """(broker, previous result or None, new result) for brokers whose state changed."""
+        out = []
+        with self._lock:
+            for key, label in self.labels.items():
+                new = self.state[key]["result"]
+                old = self.previous.get(key)
+                if not old or any(old.get(f) != new.get(f) for f in COMPARED_FIELDS):
+                    out.append((label, old or None, new))
+        return out
+
+    def summary(self) -> str:
+        return (f"Incremental: {self.not_modified} not modified, {self.unchanged} unchanged "
+                f"(parse skipped), {self.parsed} parsed")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with self._lock:
+            data = {"saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "brokers": self.state}
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def format_changes(changes) -> str:
+    if not changes:
+        return "No broker changes since the last scan."
+    lines = ["Changed since the last scan:"]
+    for label, old, new in changes:
+        if old is None:
+            lines.append(f"- {label}: new ({'found' if new.get('found') else 'not found'})")
+        elif old.get("found") != new.get("found"):
+            lines.append(f"- {label}: {'now listed' if new.get('found') else 'no longer listed'}")
+        else:
+            lines.append(f"- {label}: listing changed ({new.get('url') or ''})")
+    return "\n".join(lines)
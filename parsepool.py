@@ -0,0 +1,199 @@
+"""Process-pool parse stage, decoupled from network I/O.
+
+HTML parsing and name matching hold the GIL, so with many fetches in flight
+the broker threads end up queueing behind each other's parses. With a parse
+pool, a broker search is split in two stages:
+
+1. fetch: the I/O worker (thread or coroutine) builds the URL and downloads
+   the page bytes with polite_get, using the module's FETCH_OPTS
+2. parse: the bytes go to a process pool, which runs the module's parse()
+   and sends back a small BrokerResult
+
+Only modules with build_url() and parse() are split; others (and batched
+generic groups) run as before. At most MAX_PENDING_PER_PROC pages per process
+are in the pool at once: when it falls behind, fetchers wait before handing
+over more pages (backpressure), so downloaded bodies never pile up in memory.
+
+This is not a full handoff: the engines need each BrokerResult back in the
+thread that searched the broker, so a sync fetcher waits for its own page's
+parse (holding its slot) before it fetches the next. What the pool buys is
+parsing off the GIL, not fetcher threads freed during the parse; the async
+engine does get that, since it awaits the parse instead of blocking.
+
+Settings: ARGUS_PARSE_PROCS (default 0 = parse in the fetching thread), or
+--parse-procs on the CLI; discover-batch defaults to BATCH_PROCS. Each spawned
+process costs start-up time and memory (it imports the brokers), so more
+than a few only pays off on very large batches.
+"""
+import asyncio, os, threading, time, weakref
+from typing import Dict, Optional, Tuple
+from models import BrokerResult, ClientProfile
+from brokers import load_module
+from tracing import stage
+import metrics
+
+MAX_PENDING_PER_PROC = 2
+BATCH_PROCS = 2  # discover-batch default
+
+
+def splittable(site: Dict) -> bool:
+    mod = load_module(site["module"])
+    return hasattr(mod, "build_url") and hasattr(mod, "parse")
+
+
+def fetch(profile: ClientProfile, site: Dict) -> Tuple[int, bytes, Optional[str], str]:
+    """Stage 1: (status, body, encoding, url) for the broker's search page (status 0: no response)."""
+    from htmlscan import response_bytes
+    from utils import polite_get
+    mod = load_module(site["module"])
+    generic = site.get("module") == "generic"
+    url = mod.build_url(profile, site) if generic else mod.build_url(profile)
+    opts = dict(getattr(mod, "FETCH_OPTS", {}))
+    if generic:
+        opts["cache_ttl"] = site.get("cache_ttl")
+    r = polite_get(url, **opts)
+    body, encoding = response_bytes(r)
+    return getattr(r, "status_code", 0), body, encoding, url
+
+
+async def async_fetch(profile: ClientProfile, site: Dict) -> Tuple[int, bytes, Optional[str], str]:
+    from htmlscan import response_bytes
+    from utils import async_polite_get
+    mod = load_module(site["module"])
+    generic = site.get("module") == "generic"
+    url = mod.build_url(profile, site) if generic else mod.build_url(profile)
+    opts = dict(getattr(mod, "FETCH_OPTS", {}))
+    if generic:
+        opts["cache_ttl"] = site.get("cache_ttl")
+    r = await async_polite_get(url, **opts)
+    body, encoding = response_bytes(r)
+    return getattr(r, "status_code", 0), body, encoding, url
+
+
+def parse_page(profile: ClientProfile, site: Dict, body: bytes, url: str, encoding: Optional[str]) -> BrokerResult:
+    """Stage 2: the module's parse() (runs inside the pool's processes)."""
+    mod = load_module(site["module"])
+    if site.get("module") == "generic":
+        return mod.parse(profile, site, body, url, encoding)
+    return mod.parse(profile, body, url, encoding)
+
+
+def failed(profile: ClientProfile, site: Dict, url: str) -> BrokerResult:
+    """What the module's own search() returns when the fetch got no response (parsed here, not in the pool)."""
+    mod = load_module(site["module"])
+    if hasattr(mod, "failed_result"):
+        return mod.failed_result(site, url)
+    return parse_page(profile, site, b"", url, None)
+
+
+class ParsePool:
+    def __init__(self, procs: int, max_pending: Optional[int] = None):
+        self.procs = procs
+        self.max_pending = max_pending or procs * MAX_PENDING_PER_PROC
+        # Imported here: multiprocessing is only needed once a pool is started
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn, not fork: the parent has live threads (and their locks) by now
+        self._pool = ProcessPoolExecutor(max_workers=procs, mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.waited = 0.0   # seconds fetchers spent blocked on a full queue
+
+    def parse(self, profile: ClientProfile, site: Dict, body: bytes, url: str,
+              encoding: Optional[str] = None) -> BrokerResult:
+        """Parse in the pool and wait for the result; blocks first while max_pending pages are in the pool."""
+        started = time.perf_counter()
+        with stage("parse_wait"):
+            self._slots.acquire()
+        waited = time.perf_counter() - started
+        try:
+            with stage("parse", pooled=True):
+                t = time.perf_counter()
+                result = self._pool.submit(parse_page, profile, site, body, url, encoding).result()
+                metrics.observe("argus_parse_seconds", time.perf_counter() - t)
+        finally:
+            self._slots.release()
+        self._done(waited)
+        return result
+
+    async def parse_async(self, profile: ClientProfile, site: Dict, body: bytes, url: str,
+                          encoding: Optional[str] = None) -> BrokerResult:
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = self._async_slots[loop] = asyncio.Semaphore(self.max_pending)
+        started = time.perf_counter()
+        async with slots:
+            waited = time.perf_counter() - started
+            with stage("parse", pooled=True):
+                t = time.perf_counter()
+                result = await asyncio.wrap_future(self._pool.submit(parse_page, profile, site, body, url, encoding))
+                metrics.observe("argus_parse_seconds", time.perf_counter() - t)
+        self._done(waited)
+        return result
+
+    def _done(self, waited: float):
+        with self._lock:
+            self.parsed += 1
+            self.waited += waited
+
+    def summary(self) -> str:
+        return (f"Parse pool: {self.procs} processes, {self.parsed} pages parsed, "
+                f"{self.waited:.1f}s fetchers waited on a full queue")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+_pool: Optional[ParsePool] = None
+_configured = False
+_lock = threading.Lock()
+
+
+def default_procs() -> int:
+    """--parse-procs default for discover-batch."""
+    return min(BATCH_PROCS, os.cpu_count() or 1)
+
+
+def configure(procs: Optional[int]) -> Optional[ParsePool]:
+    """Start (procs >= 1) or stop (0/None) the shared parse pool."""
+    global _pool, _configured
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = ParsePool(procs) if procs and procs > 0 else None
+        _configured = True
+    return _pool
+
+
+def get_pool() -> Optional[ParsePool]:
+    """The shared parse pool (sized by ARGUS_PARSE_PROCS on first use), or None."""
+    global _pool, _configured
+    if not _configured:
+        with _lock:
+            if not _configured:
+                try:
+                    procs = int(os.getenv("ARGUS_PARSE_PROCS") or 0)
+                except ValueError:
+                    procs = 0
+                _pool = ParsePool(procs) if procs > 0 else None
+                _configured = True
+    return _pool
+
+
+def search(profile: ClientProfile, site: Dict) -> BrokerResult:
+    """A broker search with its parse on the pool (fetch stays in the calling thread)."""
+    status, body, encoding, url = fetch(profile, site)
+    if status == 0:
+        return failed(profile, site, url)
+    return get_pool().parse(profile, site, body, url, encoding)
+
+
+async def async_search(profile: ClientProfile, site: Dict) -> BrokerResult:
+    status, body, encoding, url = await async_fetch(profile, site)
+    if status == 0:
+        return failed(profile, site, url)
+    return await get_pool().parse_async(profile, site, body, url, encoding)
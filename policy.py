@@ -0,0 +1,320 @@
+"""Adaptive timeout, retry and circuit-breaker policy for outbound requests.
+
+Per host, utils.polite_get feeds every attempt's latency and outcome into a
+rolling window. From it:
+
+- the per-attempt timeout is TIMEOUT_FACTOR x the observed p95 latency,
+  clamped between MIN_TIMEOUT and the caller's timeout (which stays the ceiling)
+- backoff between attempts is exponential with jitter
+- a host that keeps failing is circuit-broken: requests fail fast for a
+  cooldown, then one half-open probe decides whether it closes again (the
+  cooldown doubles, up to MAX_COOLDOWN, each time a probe fails)
+
+Hosts marked "hedge": true in sites.json also get request hedging: if an
+attempt has not answered by the host's p90 latency, a second identical request
+goes out and whichever answers first wins. Hedges are capped at HEDGE_BUDGET of
+the host's requests (credit is earned per request and persisted, so a single
+scan can hedge too) and only sent when the rate limiter has a token to spare.
+
+A circuit is per host, so one that several brokers share (DuckDuckGo, behind
+every generic broker) takes all of them out at once. That is intended: they
+fail together anyway. Such hosts are registered with set_shared() so the
+summary carries one note for the open circuit rather than leaving it to
+dozens of per-broker errors.
+
+State survives runs in ARGUS_POLICY_PATH (default .cache/site_health.json), so
+a dead broker stops costing its full timeout on every scan. ARGUS_POLICY=0
+turns the adaptive behaviour off (fixed timeouts, no circuit breaking, no
+hedging); ARGUS_HEDGE=0 turns off hedging only.
+"""
+import atexit, json, os, random, threading, time
+from collections import deque
+from typing import Dict, Iterable, Optional
+from ratelimit import host_key
+import metrics
+
+WINDOW = 50             # attempts remembered per host
+MIN_SAMPLES = 5         # successful latencies needed before adapting the timeout
+TIMEOUT_FACTOR = 2.0
+MIN_TIMEOUT = 2.0
+FAILURE_THRESHOLD = 3   # consecutive failures that open the circuit
+FAILURE_RATE_TRIP = 0.6 # ...or this failure rate over at least MIN_SAMPLES attempts
+COOLDOWN = 60.0
+MAX_COOLDOWN = 30 * 60.0
+BACKOFF_CAP = 8.0
+HEDGE_PERCENTILE = 90
+HEDGE_BUDGET = 0.1      # hedge credit earned per request to a host...
+HEDGE_CREDIT_MAX = 2.0  # ...saved up to this many hedges; one hedge spends 1.0
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_shared: Dict[str, str] = {}  # host -> label, see set_shared
+
+
+def set_shared(host: str, label: str):
+    """Mark host as an endpoint many brokers go through (named in the summary when its circuit opens)."""
+    _shared[host_key(host)] = label
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised by polite_get(allow_fail=False) for a host whose circuit is open."""
+
+
+def _percentile(values, pct: float) -> float:
+    s = sorted(values)
+    if not s:
+        return 0.0
+    k = min(len(s) - 1, max(0, int(round(pct / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+
+class HostHealth:
+    def __init__(self):
+        self.latencies = deque(maxlen=WINDOW)   # seconds, successful attempts only
+        self.outcomes = deque(maxlen=WINDOW)    # True = success
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0                    # wall clock, so it survives restarts
+        self.cooldown = COOLDOWN
+        self.skipped = 0                        # requests refused while open (this process)
+        self.hedge = False
+        self.hedge_credit = 0.0
+        self.requests = self.hedges = self.hedge_wins = 0
+
+    @property
+    def failure_rate(self) -> float:
+        return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def p95(self) -> Optional[float]:
+        return self.percentile(95)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        return _percentile(self.latencies, pct)
+
+    def earn(self):
+        self.requests += 1
+        # Rounded so ten 0.1 steps add up to a full hedge rather than 0.999...
+        self.hedge_credit = min(HEDGE_CREDIT_MAX, round(self.hedge_credit + HEDGE_BUDGET, 6))
+
+    def to_dict(self) -> Dict:
+        return {
+            "latencies": [round(x, 3) for x in self.latencies],
+            "outcomes": [int(x) for x in self.outcomes],
+            "consecutive_failures": self.consecutive_failures,
+            "state": OPEN if self.state == HALF_OPEN else self.state,
+            "opened_at": self.opened_at,
+            "cooldown": self.cooldown,
+            "hedge_credit": round(self.hedge_credit, 3),
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "HostHealth":
+        h = cls()
+        h.latencies.extend(float(x) for x in d.get("latencies", []))
+        h.outcomes.extend(bool(x) for x in d.get("outcomes", []))
+        h.consecutive_failures = int(d.get("consecutive_failures", 0))
+        h.state = d.get("state") if d.get("state") in (CLOSED, OPEN) else CLOSED
+        h.opened_at = float(d.get("opened_at", 0.0))
+        h.cooldown = float(d.get("cooldown", COOLDOWN))
+        h.hedge_credit = float(d.get("hedge_credit", 0.0))
+        return h
+
+
+class RequestPolicy:
+    def __init__(self, path: Optional[str] = None, adaptive: bool = True, hedging: bool = True):
+        self.path = path
+        self.adaptive = adaptive
+        self.hedging = adaptive and hedging
+        self._hedge_hosts = set()
+        self._hosts: Dict[str, HostHealth] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for host, d in json.load(f).get("hosts", {}).items():
+                        self._hosts[host] = HostHealth.from_dict(d)
+            except (OSError, ValueError):
+                self._hosts = {}
+
+    def _health(self, url: str) -> HostHealth:
+        key = host_key(url)
+        h = self._hosts.get(key)
+        if h is None:
+            h = self._hosts[key] = HostHealth()
+            h.hedge = key in self._hedge_hosts
+        return h
+
+    def set_hedge(self, host: str, enabled: bool = True):
+        key = host_key(host)
+        with self._lock:
+            (self._hedge_hosts.add if enabled else self._hedge_hosts.discard)(key)
+            if key in self._hosts:
+                self._hosts[key].hedge = enabled
+
+    def is_open(self, url: str) -> bool:
+        """True while the host's circuit is not closed."""
+        if not self.adaptive:
+            return False
+        with self._lock:
+            return self._health(url).state != CLOSED
+
+    def timeout_for(self, url: str, ceiling: float) -> float:
+        """Per-attempt timeout for url: from its p95 latency, never above the caller's timeout."""
+        if not self.adaptive:
+            return ceiling
+        with self._lock:
+            p95 = self._health(url).p95()
+        if p95 is None:
+            return ceiling
+        return max(MIN_TIMEOUT, min(float(ceiling), p95 * TIMEOUT_FACTOR))
+
+    def backoff(self, attempt: int, base: float) -> float:
+        """Seconds to wait after failed attempt number `attempt` (0-based)."""
+        if not self.adaptive:
+            return base * (attempt + 1)
+        delay = min(BACKOFF_CAP, base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def allow(self, url: str) -> bool:
+        """False while the host's circuit is open; lets one probe through once the cooldown passed."""
+        if not self.adaptive:
+            return True
+        with self._lock:
+            h = self._health(url)
+            if h.state == CLOSED:
+                h.earn()
+                return True
+            if h.state == OPEN and time.time() - h.opened_at >= h.cooldown:
+                h.state = HALF_OPEN  # this caller is the probe; others keep failing fast
+                h.earn()
+                return True
+            h.skipped += 1
+            return False
+
+    def hedge_delay(self, url: str) -> Optional[float]:
+        """Seconds to wait before hedging a request to url, or None if it should not be hedged."""
+        if not self.hedging:
+            return None
+        with self._lock:
+            h = self._health(url)
+            if not h.hedge or h.state != CLOSED:
+                return None
+            return h.percentile(HEDGE_PERCENTILE)
+
+    def hedge_allowed(self, url: str) -> bool:
+        """True if the host has a full hedge of credit left (see HEDGE_BUDGET)."""
+        with self._lock:
+            return self._health(url).hedge_credit >= 1.0
+
+    def hedged(self, url: str):
+        with self._lock:
+            h = self._health(url)
+            h.hedges += 1
+            metrics.inc("argus_hedges_total", {"host": host_key(url)})
+            h.hedge_credit = max(0.0, h.hedge_credit - 1.0)
+
+    def hedge_won(self, url: str):
+        with self._lock:
+            self._health(url).hedge_wins += 1
+
+    def record(self, url: str, ok: bool, latency: Optional[float] = None):
+        with self._lock:
+            h = self._health(url)
+            h.outcomes.append(ok)
+            if ok:
+                if latency is not None:
+                    h.latencies.append(latency)
+                h.consecutive_failures = 0
+                if h.state != CLOSED:
+                    h.state, h.cooldown = CLOSED, COOLDOWN
+                    h.outcomes.clear()  # recovered: old failures no longer count toward the rate
+                    h.outcomes.append(True)
+                return
+            h.consecutive_failures += 1
+            if h.state == HALF_OPEN:
+                h.state = OPEN
+                h.opened_at = time.time()
+                h.cooldown = min(MAX_COOLDOWN, h.cooldown * 2)
+                metrics.inc("argus_circuit_trips_total", {"host": host_key(url)})
+            elif h.state == CLOSED and (
+                    h.consecutive_failures >= FAILURE_THRESHOLD
+                    or (len(h.outcomes) >= MIN_SAMPLES and h.failure_rate >= FAILURE_RATE_TRIP)):
+                h.state = OPEN
+                h.opened_at = time.time()
+                metrics.inc("argus_circuit_trips_total", {"host": host_key(url)})
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                host: {
+                    "state": h.state,
+                    "p95_ms": int(h.p95() * 1000) if h.p95() is not None else None,
+                    "failure_rate_pct": int(100 * h.failure_rate),
+                    "skipped": h.skipped,
+                    "requests": h.requests,
+                    "hedges": h.hedges,
+                    "hedge_wins": h.hedge_wins,
+                }
+                for host, h in self._hosts.items()
+            }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        broken = sorted(host for host, s in stats.items() if s["state"] != CLOSED)
+        skipped = sum(s["skipped"] for s in stats.values())
+        hedges = sum(s["hedges"] for s in stats.values())
+        wins = sum(s["hedge_wins"] for s in stats.values())
+        line = (f"Policy: {len(broken)} hosts circuit-broken, {skipped} requests skipped, "
+                f"{hedges} hedged ({wins} won)")
+        line += f" ({', '.join(broken)})" if broken else ""
+        for host in broken:
+            if host in _shared:
+                line += (f"\n{_shared[host]} circuit open: every broker searched through it was"
+                         " reported as an error and will be retried on the next run")
+        return line
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {"saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "hosts": {host: h.to_dict() for host, h in self._hosts.items()}}
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+def configure_from_sites(sites: Iterable[Dict], hosts: Optional[Dict[str, Dict]] = None):
+    """Apply "hedge" settings from sites.json entries and its "hosts" section."""
+    p = get_policy()
+    for host, cfg in (hosts or {}).items():
+        if cfg.get("hedge") is not None:
+            p.set_hedge(host, bool(cfg["hedge"]))
+    for site in sites:
+        if site.get("hedge") is not None:
+            p.set_hedge(site.get("domain") or site.get("name") or "", bool(site["hedge"]))
+
+
+_policy: Optional[RequestPolicy] = None
+_policy_lock = threading.Lock()
+
+
+def get_policy() -> RequestPolicy:
+    """The shared policy (loaded from ARGUS_POLICY_PATH on first use, saved at exit)."""
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                adaptive = (os.getenv("ARGUS_POLICY") or "1").strip().lower() not in ("0", "false", "no", "off")
+                path = os.getenv("ARGUS_POLICY_PATH") or os.path.join(".cache", "site_health.json")
+                hedging = (os.getenv("ARGUS_HEDGE") or "1").strip().lower() not in ("0", "false", "no", "off")
+                _policy = RequestPolicy(path if adaptive else None, adaptive=adaptive, hedging=hedging)
+                atexit.register(_policy.save)
+    return _policy
@@ -0,0 +1,138 @@
+"""Per-host token-bucket rate limiting for outbound broker requests.
+
+Requests to different hosts never wait on each other; politeness is only
+enforced per host. Limits come from sites.json:
+
+- per site: "rate_per_sec" / "burst" apply to that site's domain
+- top level "hosts": { "<host>": { "rate_per_sec": ..., "burst": ... } } for
+  shared endpoints such as the DuckDuckGo HTML search used by generic brokers
+"""
+import threading, time
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_RATE = 2.0   # sustained requests per second, per host
+DEFAULT_BURST = 2    # requests allowed back-to-back before throttling
+
+
+def host_key(url_or_host: str) -> str:
+    """Normalize a URL or hostname to the key used for per-host limits."""
+    s = (url_or_host or "").strip().lower()
+    if "://" in s:
+        s = s.split("://", 1)[1]
+    for sep in ("/", "?", "#"):
+        s = s.split(sep, 1)[0]
+    s = s.rsplit("@", 1)[-1].split(":", 1)[0]
+    if s.startswith("www."):
+        s = s[4:]
+    return s
+
+
+class TokenBucket:
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST):
+        self.rate = max(0.01, float(rate))
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens (default one) and return how many seconds the caller must wait to use them.
+
+        Tokens may go negative, so concurrent callers queue up fairly instead of
+        all waking at once when the bucket refills.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_take(self) -> bool:
+        """Take a token only if one is available right now."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    def wait_time(self) -> float:
+        """Seconds the next reserve() would have to wait (nothing is taken)."""
+        with self._lock:
+            tokens = min(self.burst, self._tokens + (time.monotonic() - self._stamp) * self.rate)
+            return 0.0 if tokens >= 1.0 else (1.0 - tokens) / self.rate
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST):
+        self.default = (rate, burst)
+        self._limits: Dict[str, Tuple[float, float]] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, host: str, rate: Optional[float] = None, burst: Optional[float] = None,
+                  replace: bool = True):
+        """Set the limit for a host. With replace=False an existing limit is kept."""
+        key = host_key(host)
+        if not key:
+            return
+        with self._lock:
+            if not replace and key in self._limits:
+                return
+            d_rate, d_burst = self._limits.get(key, self.default)
+            limit = (rate if rate is not None else d_rate, burst if burst is not None else d_burst)
+            if self._limits.get(key) == limit and key in self._buckets:
+                return  # keep the live bucket (and its tokens) on re-configure
+            self._limits[key] = limit
+            self._buckets[key] = TokenBucket(*limit)
+
+    def limits(self) -> Dict[str, Tuple[float, float]]:
+        """Configured (rate, burst) per host; other hosts use self.default."""
+        with self._lock:
+            return dict(self._limits)
+
+    def bucket(self, url_or_host: str) -> TokenBucket:
+        key = host_key(url_or_host)
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                b = self._buckets[key] = TokenBucket(*self._limits.get(key, self.default))
+            return b
+
+    def reserve(self, url_or_host: str) -> float:
+        return self.bucket(url_or_host).reserve()
+
+    def acquire(self, url_or_host: str) -> float:
+        """Block until a request to this host is allowed; returns seconds waited."""
+        return self.bucket(url_or_host).acquire()
+
+    def try_acquire(self, url_or_host: str) -> bool:
+        """Take a request slot for this host only if no wait is needed (used for hedges)."""
+        return self.bucket(url_or_host).try_take()
+
+
+# Shared by every broker through utils.polite_get
+limiter = HostRateLimiter()
+
+
+def configure_from_sites(sites: Iterable[Dict], hosts: Optional[Dict[str, Dict]] = None):
+    """Apply "rate_per_sec"/"burst" settings from sites.json entries and its "hosts" section."""
+    for host, cfg in (hosts or {}).items():
+        if cfg.get("rate_per_sec") is not None or cfg.get("burst") is not None:
+            limiter.configure(host, cfg.get("rate_per_sec"), cfg.get("burst"))
+    for site in sites:
+        if site.get("rate_per_sec") is None and site.get("burst") is None:
+            continue
+        limiter.configure(site.get("domain") or site.get("name") or "",
+                          site.get("rate_per_sec"), site.get("burst"))
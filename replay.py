@@ -0,0 +1,157 @@
+"""Record/replay transport under utils.polite_get.
+
+In record mode every response fetched from the network is also written to an
+archive; in replay mode polite_get answers from the archive alone, with no
+network, rate limiting, retries or response cache, so a recorded scan can be
+re-run at memory speed (matcher and scheduler tuning, load tests of
+run_discovery, reporter.save_results and the GUIs).
+
+The archive is one SQLite file. Bodies are stored once, zlib-compressed and
+keyed by their SHA-256, so thousands of scans of mostly identical pages stay
+small; each normalized URL points at the body of its latest recording. A URL
+missing from the archive fails like an unreachable host (ReplayMissError).
+
+Settings:
+- ARGUS_REPLAY=record|replay (default off), or --record/--replay on the CLI
+- ARGUS_REPLAY_PATH (default .cache/replay.sqlite3)
+"""
+import hashlib, json, os, sqlite3, threading, time, zlib
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from cache import CachedResponse, normalize_url
+
+RECORD, REPLAY = "record", "replay"
+DEFAULT_PATH = os.path.join(".cache", "replay.sqlite3")
+# Response headers worth keeping (response_bytes and monitor.py read these)
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+BODY_CACHE = 512   # decompressed bodies kept in memory while replaying
+
+
+class ReplayMissError(LookupError):
+    """The URL is not in the replay archive."""
+
+
+class ReplayedResponse(CachedResponse):
+    """A response served from the replay archive."""
+    from_cache = False
+    replayed = True
+
+    def __init__(self, url, status_code, content, encoding, headers):
+        super().__init__(url, status_code, content, encoding)
+        self.headers = dict(headers)
+
+
+class Archive:
+    def __init__(self, path: str, mode: str = REPLAY):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"unknown replay mode {mode!r}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        if mode == REPLAY and not os.path.exists(path):
+            raise FileNotFoundError(f"no replay archive at {path}")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS bodies (sha TEXT PRIMARY KEY, data BLOB)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, status INTEGER, encoding TEXT, headers TEXT, sha TEXT, recorded_at REAL)"
+        )
+        # The whole index lives in memory; bodies are read (and decompressed) on demand
+        self._index: Dict[str, Tuple[int, Optional[str], Dict[str, str], str]] = {
+            key: (status, encoding, json.loads(headers or "{}"), sha)
+            for key, status, encoding, headers, sha in self._conn.execute(
+                "SELECT key, status, encoding, headers, sha FROM responses")
+        }
+        self._body = lru_cache(maxsize=BODY_CACHE)(self._read_body)
+        self.served = self.missed = self.recorded = 0
+
+    def _read_body(self, sha: str) -> bytes:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM bodies WHERE sha = ?", (sha,)).fetchone()
+        return zlib.decompress(row[0]) if row else b""
+
+    def record(self, url: str, r):
+        body = getattr(r, "content", None) or b""
+        sha = hashlib.sha256(body).hexdigest()
+        resp_headers = getattr(r, "headers", None) or {}
+        headers = {h: resp_headers[h] for h in KEPT_HEADERS if resp_headers.get(h)}
+        key = normalize_url(url)
+        with self._lock:
+            if not self._conn.execute("SELECT 1 FROM bodies WHERE sha = ?", (sha,)).fetchone():
+                self._conn.execute("INSERT INTO bodies VALUES (?, ?)", (sha, zlib.compress(body, 6)))
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, r.status_code, getattr(r, "encoding", None), json.dumps(headers), sha, time.time()))
+            self._index[key] = (r.status_code, getattr(r, "encoding", None), headers, sha)
+            self.recorded += 1
+
+    def lookup(self, url: str) -> Optional[ReplayedResponse]:
+        entry = self._index.get(normalize_url(url))
+        if entry is None:
+            with self._lock:
+                self.missed += 1
+            return None
+        status, encoding, headers, sha = entry
+        with self._lock:
+            self.served += 1
+        return ReplayedResponse(url, status, self._body(sha), encoding, headers)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            bodies, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM bodies").fetchone()
+        return {"urls": len(self._index), "bodies": bodies, "bytes": size,
+                "served": self.served, "missed": self.missed, "recorded": self.recorded}
+
+    def summary(self) -> str:
+        s = self.stats()
+        if self.mode == RECORD:
+            return (f"Recording: {s['recorded']} responses this run; archive has {s['urls']} URLs, "
+                    f"{s['bodies']} unique bodies, {s['bytes'] // 1024} KiB ({self.path})")
+        return f"Replay: {s['served']} served, {s['missed']} not in archive ({self.path})"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_archive: Optional[Archive] = None
+_configured = False
+_lock = threading.Lock()
+
+
+def _open(mode: Optional[str], path: Optional[str]) -> Optional[Archive]:
+    mode = (mode or "").strip().lower()
+    return Archive(path or DEFAULT_PATH, mode) if mode not in ("", "0", "off", "false", "no") else None
+
+
+def configure(mode: Optional[str], path: Optional[str] = None) -> Optional[Archive]:
+    """Switch the shared transport to record/replay (mode None or "off" turns it off)."""
+    global _archive, _configured
+    with _lock:
+        if _archive is not None:
+            _archive.close()
+        _archive = _open(mode, path)
+        _configured = True
+    return _archive
+
+
+def get_archive() -> Optional[Archive]:
+    """The active archive (from ARGUS_REPLAY/ARGUS_REPLAY_PATH on first use), or None."""
+    global _archive, _configured
+    if not _configured:
+        with _lock:
+            if not _configured:
+                _archive = _open(os.getenv("ARGUS_REPLAY"), os.getenv("ARGUS_REPLAY_PATH"))
+                _configured = True
+    return _archive
+
+
+def replaying() -> Optional[Archive]:
+    a = get_archive()
+    return a if a is not None and a.mode == REPLAY else None
+
+
+def recording() -> Optional[Archive]:
+    a = get_archive()
+    return a if a is not None and a.mode == RECORD else None
@@ -1,10 +1,11 @@
 import os, json, csv
-from typing import List
-import pandas as pd
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 from tabulate import tabulate
 from models import BrokerResult, ClientProfile
 
-def save_results(name: str, results: List[BrokerResult], outdir: str):
+def save_results(name: str, results: List[BrokerResult], outdir: str,
+                 timings: Optional[Dict[str, Dict[str, float]]] = None):
     os.makedirs(outdir, exist_ok=True)
     base = os.path.join(outdir, name.lower().replace(' ', '_'))
     csv_path = f"{base}_results.csv"
@@ -19,7 +20,7 @@ def save_results(name: str, results: List[BrokerResult], outdir: str):
     # Write a human-readable text summary including a table and checklist
     txt_path = f"{base}_results.txt"
     try:
-        table = tabulate(pd.DataFrame([r.to_dict() for r in results]).fillna(""), headers="keys", tablefmt="github", showindex=False)
+        table = _table(results)
     except Exception:
         table = ""
     checklist = generate_todo(name, ClientProfile(name=name), results)
@@ -29,15 +30,30 @@ def save_results(name: str, results: List[BrokerResult], outdir: str):
             f.write("\n\n")
         f.write(checklist)
         f.write("\n")
+        if timings:
+            f.write("\n")
+            f.write(slowest_brokers(timings))
+            f.write("\n")
     return csv_path, json_path, txt_path
 
+def _table(results: List[BrokerResult]) -> str:
+    # Plain rows are enough for tabulate; pandas cost ~0.4s of import for this alone
+    rows = [{k: ("" if v is None else v) for k, v in r.to_dict().items()} for r in results]
+    return tabulate(rows, headers="keys", tablefmt="github", showindex=False)
+
+def slowest_brokers(timings: Dict[str, Dict[str, float]], n: int = 10) -> str:
+    """Table of the n slowest brokers from tracing.Tracer.broker_times() (seconds per stage)."""
+    rows = sorted(timings.items(), key=lambda kv: -kv[1].get("total", 0.0))[:n]
+    stages = ("http", "rate_wait", "backoff", "parse")
+    table = tabulate([[broker] + [f"{t.get(k, 0.0):.2f}" for k in ("total",) + stages] for broker, t in rows],
+                     headers=["broker", "total s"] + [f"{k} s" for k in stages], tablefmt="github")
+    return f"Slowest brokers:\n{table}"
+
 def print_summary(results: List[BrokerResult]):
-    rows = [r.to_dict() for r in results]
-    df = pd.DataFrame(rows)
-    if df.empty:
+    if not results:
         print("No results.")
         return
-    print(tabulate(df.fillna(""), headers="keys", tablefmt="github", showindex=False))
+    print(_table(results))
 
 def generate_todo(name: str, profile: ClientProfile, results: List[BrokerResult]) -> str:
     found_sites = [r for r in results if r.found]
@@ -54,3 +70,18 @@ def generate_todo(name: str, profile: ClientProfile, results: List[BrokerResult]
         "- Proof of address (utility bill)"
     ]
     return "\n".join(lines)
+
+def save_webclear_report(report: Dict[str, Any], outdir: str = os.path.join("reports", "webclear"),
+                         run_id: Optional[int] = None) -> str:
+    """Write a Web Clear run (client fields + per-provider results) to a JSON file.
+
+    With the results store's run_id the file is named after the run (re-exports
+    overwrite it), otherwise it is timestamped.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    slug = (report.get("name") or "client").lower().replace(" ", "_")
+    tag = f"run{run_id}" if run_id is not None else datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(outdir, f"{slug}_{tag}_webclear.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return path
@@ -0,0 +1,116 @@
+"""Shared connection-pooling HTTP session used by utils.polite_get.
+
+One requests.Session is shared by every worker thread. Its adapters keep
+HTTP/1.1 keep-alive connections per host, so repeated queries (e.g. every
+generic broker hitting DuckDuckGo) reuse a warm TCP+TLS connection instead of
+handshaking each time.
+
+Pool sizes:
+- ARGUS_POOL_MAXSIZE: keep-alive connections per host (default POOL_MAXSIZE)
+- sites.json "pool_size" on a site, or under "hosts", overrides it for that host
+
+requests is imported on first use, so importing this module (and the CLI) stays cheap.
+"""
+import os, threading
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+from ratelimit import host_key
+
+if TYPE_CHECKING:
+    import requests
+    from requests.adapters import HTTPAdapter
+
+POOL_CONNECTIONS = 64  # distinct hosts kept pooled before least-recent eviction
+POOL_MAXSIZE = 8       # keep-alive connections per host; matches default worker count
+
+_session: Optional["requests.Session"] = None
+_adapters: Dict[str, "HTTPAdapter"] = {}
+_lock = threading.Lock()
+
+
+def _default_pool_size() -> int:
+    try:
+        return max(1, int(os.getenv("ARGUS_POOL_MAXSIZE") or POOL_MAXSIZE))
+    except ValueError:
+        return POOL_MAXSIZE
+
+
+def _adapter(pool_maxsize: int) -> "HTTPAdapter":
+    from requests.adapters import HTTPAdapter
+    # Retries are handled by polite_get; pool_block=False lets a burst open
+    # extra (non-pooled) connections rather than stall a worker.
+    return HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=pool_maxsize,
+                       max_retries=0, pool_block=False)
+
+
+def get_session() -> "requests.Session":
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import requests
+                s = requests.Session()
+                default = _adapter(_default_pool_size())
+                s.mount("https://", default)
+                s.mount("http://", default)
+                _adapters["*"] = default
+                s.headers["Connection"] = "keep-alive"
+                _session = s
+    return _session
+
+
+def set_pool_size(host: str, size: int):
+    """Give a host its own adapter with `size` keep-alive connections."""
+    key = host_key(host)
+    if not key or size is None:
+        return
+    s = get_session()
+    with _lock:
+        current = _adapters.get(key)
+        if current is not None and current._pool_maxsize == int(size):
+            return
+        adapter = _adapter(max(1, int(size)))
+        # requests matches mounts by longest URL prefix
+        for prefix in (f"https://{key}", f"https://www.{key}", f"http://{key}", f"http://www.{key}"):
+            s.mount(prefix, adapter)
+        _adapters[key] = adapter
+
+
+def configure_from_sites(sites: Iterable[Dict], hosts: Optional[Dict[str, Dict]] = None):
+    """Apply "pool_size" settings from sites.json entries and its "hosts" section."""
+    for host, cfg in (hosts or {}).items():
+        if cfg.get("pool_size") is not None:
+            set_pool_size(host, cfg["pool_size"])
+    for site in sites:
+        if site.get("pool_size") is not None:
+            set_pool_size(site.get("domain") or site.get("name") or "", site["pool_size"])
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """Per-host connection reuse counters from the live urllib3 pools.
+
+    requests: HTTP requests sent, connections: TCP connections opened,
+    reused: requests that went over an already-open connection.
+    """
+    stats: Dict[str, Dict[str, int]] = {}
+    with _lock:
+        adapters = list({id(a): a for a in _adapters.values()}.values())
+    for adapter in adapters:
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            entry = stats.setdefault(host_key(pool.host), {"requests": 0, "connections": 0, "reused": 0})
+            entry["requests"] += pool.num_requests
+            entry["connections"] += pool.num_connections
+            entry["reused"] += max(0, pool.num_requests - pool.num_connections)
+    return stats
+
+
+def pool_summary() -> str:
+    stats = pool_stats()
+    reqs = sum(s["requests"] for s in stats.values())
+    conns = sum(s["connections"] for s in stats.values())
+    reused = sum(s["reused"] for s in stats.values())
+    return f"HTTP: {reqs} requests over {conns} connections ({reused} reused) across {len(stats)} hosts"
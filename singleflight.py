@@ -0,0 +1,78 @@
+"""In-flight request coalescing ("single-flight").
+
+Concurrent calls that share a key run the underlying function once; the
+other callers wait for and receive the same result (or exception). With
+memoize=True the result is also kept for later callers, which is how one
+discovery run shares a parsed BrokerResult between duplicate sites.
+"""
+import asyncio, threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("event", "result", "exc")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.exc = None
+
+
+class SingleFlight:
+    def __init__(self, memoize: bool = False):
+        self.memoize = memoize
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.event.wait()
+            if call.exc is not None:
+                raise call.exc
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.exc = e
+            raise
+        finally:
+            with self._lock:
+                if not self.memoize or call.exc is not None:
+                    self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop."""
+
+    def __init__(self, memoize: bool = False):
+        self.memoize = memoize
+        self._calls: Dict[Hashable, "asyncio.Future"] = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        fut = self._calls.get(key)
+        if fut is not None:
+            self.shared += 1
+            # shield: one waiter being cancelled must not cancel the shared call
+            return await asyncio.shield(fut)
+        self.executed += 1
+        fut = asyncio.ensure_future(fn(*args, **kwargs))
+        self._calls[key] = fut
+        try:
+            return await asyncio.shield(fut)
+        finally:
+            if not self.memoize or not fut.done() or fut.cancelled() or fut.exception() is not None:
+                self._calls.pop(key, None)
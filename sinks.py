@@ -0,0 +1,144 @@
+"""Streaming result sinks for discovery runs.
+
+run_discovery(sink=...) hands every BrokerResult to the sink as soon as its
+broker finishes, instead of only returning the full list at the end. The
+StreamSink here appends each result to .cache/<slug>_latest.jsonl and
+.cache/<slug>_latest.csv, so partial results survive a crash or a closed
+window and `app.py report` builds the final report from the stream.
+
+Every result is flushed to the OS as soon as it is written, so a crashed
+process loses nothing; fsync (surviving a power loss) is batched, every
+FSYNC_EVERY results or FSYNC_INTERVAL seconds and when a client finishes, so
+durability costs one fsync per batch rather than one per broker.
+
+Streams are kept per client identity (journal.client_key): two clients with
+the same name in one run get separate files, the second with a short
+identity hash in its name.
+"""
+import csv, hashlib, json, os, time
+from dataclasses import fields
+from typing import Dict, List, Optional
+from models import BrokerResult, ClientProfile
+from journal import client_key
+
+FSYNC_EVERY = 16
+FSYNC_INTERVAL = 1.0
+CSV_FIELDS = ["index"] + [f.name for f in fields(BrokerResult)]
+
+
+def stream_path(name: str, ext: str = "jsonl", directory: str = ".cache", tag: Optional[str] = None) -> str:
+    slug = name.replace(' ', '_').lower() + (f"_{tag}" if tag else "")
+    return os.path.join(directory, f"{slug}_latest.{ext}")
+
+
+class _SyncedFile:
+    """Append-only text file, flushed on every write and fsync'ed every `every` writes or `interval` seconds."""
+
+    def __init__(self, path: str, every: int = FSYNC_EVERY, interval: float = FSYNC_INTERVAL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.f = open(path, "w", encoding="utf-8", newline="")
+        self.every = every
+        self.interval = interval
+        self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def wrote(self):
+        self.f.flush()
+        self._pending += 1
+        if self._pending >= self.every or time.monotonic() - self._synced_at >= self.interval:
+            self.sync()
+
+    def sync(self):
+        if self._pending:
+            os.fsync(self.f.fileno())
+            self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def close(self):
+        self.sync()
+        self.f.close()
+
+
+class JsonlWriter(_SyncedFile):
+    def write(self, record: Dict):
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.wrote()
+
+
+class CsvWriter(_SyncedFile):
+    def __init__(self, path: str, fieldnames: List[str], **kwargs):
+        super().__init__(path, **kwargs)
+        self.w = csv.DictWriter(self.f, fieldnames=fieldnames)
+        self.w.writeheader()
+
+    def write(self, record: Dict):
+        self.w.writerow(record)
+        self.wrote()
+
+
+class StreamSink:
+    """Per-client JSONL + CSV streams, opened on a client's first result and closed by finish().
+
+    Engines call write() and finish() from the thread (or event loop) that
+    drives the run, so no locking is needed here.
+    """
+
+    def __init__(self, directory: str = ".cache", fsync_every: int = FSYNC_EVERY,
+                 fsync_interval: float = FSYNC_INTERVAL):
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._open: Dict[str, List] = {}
+        self._paths: Dict[str, str] = {}  # client key -> its JSONL path (kept after finish)
+
+    def _writers(self, profile: ClientProfile) -> List:
+        key = client_key(profile)
+        writers = self._open.get(key)
+        if writers is None:
+            tag = None
+            plain = stream_path(profile.name, "jsonl", self.directory)
+            if any(path == plain for k, path in self._paths.items() if k != key):
+                tag = hashlib.sha1(key.encode("utf-8")).hexdigest()[:6]  # same name, different client
+            opts = {"every": self.fsync_every, "interval": self.fsync_interval}
+            writers = self._open[key] = [
+                JsonlWriter(stream_path(profile.name, "jsonl", self.directory, tag), **opts),
+                CsvWriter(stream_path(profile.name, "csv", self.directory, tag), CSV_FIELDS, **opts),
+            ]
+            self._paths[key] = writers[0].path
+        return writers
+
+    def write(self, profile: ClientProfile, index: int, result: BrokerResult):
+        record = {"index": index, **result.to_dict()}
+        for w in self._writers(profile):
+            w.write(record)
+
+    def finish(self, profile: ClientProfile):
+        """The client's run is complete: sync and close its files."""
+        for w in self._open.pop(client_key(profile), []):
+            w.close()
+
+    def close(self):
+        for key in list(self._open):
+            for w in self._open.pop(key):
+                w.close()
+
+
+def read_results(path: str) -> List[BrokerResult]:
+    """Results from a JSONL stream in broker order (the last record per index wins).
+
+    A line cut off by a crash mid-write is skipped.
+    """
+    by_index: Dict[int, BrokerResult] = {}
+    known = set(CSV_FIELDS)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            index: Optional[int] = record.pop("index", None)
+            if index is None:
+                index = len(by_index)
+            by_index[index] = BrokerResult(**{k: v for k, v in record.items() if k in known})
+    return [by_index[i] for i in sorted(by_index)]
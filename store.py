@@ -0,0 +1,256 @@
+"""Results store: every discovery run and its BrokerResults in one SQLite file.
+
+Runs used to leave a CSV, JSON and TXT file per client per run under
+reports/, which grows without bound and can only be searched by opening
+files. Now every finished run is recorded here with its metadata (client,
+source, start/finish time, per-broker timings, the Web Clear report), and the
+files are export views built on demand (`app.py report`, store.export()).
+
+Runs are keyed by the client's full identity (journal.client_key: name,
+city, state, phone, address), so two clients who share a name stay apart;
+--client filters match every client with that name. A scan that failed
+outright is kept with status "failed" (for its report) but never counts as a
+client's latest run.
+
+Broker names are kept once in a lookup table and results are indexed by
+(broker, found), so cross-client questions stay cheap:
+
+    python app.py query --broker Spokeo --month     # which clients are on Spokeo this month
+    python app.py runs --client "Jane Doe"
+    python app.py import-reports                    # load old reports/ files once
+
+Settings: ARGUS_STORE_PATH (default reports/results.sqlite3)
+"""
+import glob, json, os, sqlite3, threading, time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+from models import BrokerResult, ClientProfile
+from journal import client_key
+
+DEFAULT_PATH = os.path.join("reports", "results.sqlite3")
+_PROFILE_FIELDS = ("name", "city", "state", "phone", "address")
+OK, FAILED = "ok", "failed"
+
+
+def _name_range(name: str) -> Tuple[str, str]:
+    """Bounds of the client keys for every client called name (keys are "name|city|...")."""
+    prefix = name.strip().lower() + "|"
+    return prefix, prefix[:-1] + "}"
+
+
+class ResultsStore:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, client TEXT, name TEXT, city TEXT, state TEXT, phone TEXT,"
+            " address TEXT, source TEXT, started_at REAL, finished_at REAL, found INTEGER, total INTEGER,"
+            " timings TEXT, meta TEXT, status TEXT DEFAULT 'ok')"
+        )
+        if "status" not in {r[1] for r in self._conn.execute("PRAGMA table_info(runs)")}:
+            self._migrate()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS brokers (id INTEGER PRIMARY KEY, name TEXT UNIQUE COLLATE NOCASE)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " run_id INTEGER, idx INTEGER, broker_id INTEGER, found INTEGER, url TEXT, title TEXT, notes TEXT,"
+            " raw_snippet TEXT, PRIMARY KEY (run_id, idx)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_client ON runs(client, finished_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_finished ON runs(finished_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_broker ON results(broker_id, found, run_id)")
+        self._brokers: Dict[str, int] = {}
+
+    def _migrate(self):
+        """Stores from before status and identity keys: add the column, re-key runs by client_key."""
+        self._conn.execute("ALTER TABLE runs ADD COLUMN status TEXT DEFAULT 'ok'")
+        rows = self._conn.execute("SELECT id, name, city, state, phone, address FROM runs").fetchall()
+        self._conn.executemany("UPDATE runs SET client = ? WHERE id = ?",
+                               [(client_key(profile_of(r)), r["id"]) for r in rows])
+
+    def _exec(self, sql: str, args=()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def _broker_id(self, name: str) -> int:
+        """Lookup-table id for a broker name (call with the lock held)."""
+        key = (name or "").lower()
+        bid = self._brokers.get(key)
+        if bid is None:
+            self._conn.execute("INSERT OR IGNORE INTO brokers (name) VALUES (?)", (name or "",))
+            bid = self._brokers[key] = self._conn.execute("SELECT id FROM brokers WHERE name = ?", (name or "",)).fetchone()[0]
+        return bid
+
+    def add_run(self, profile: ClientProfile, results: List[BrokerResult], source: str = "discover",
+                started_at: Optional[float] = None, finished_at: Optional[float] = None,
+                timings: Optional[Dict] = None, meta: Optional[Dict] = None, status: str = OK) -> int:
+        """Record a finished run (status FAILED for a scan that did not complete); returns its id."""
+        finished_at = finished_at or time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cur = self._conn.execute(
+                    "INSERT INTO runs (client, name, city, state, phone, address, source, started_at, finished_at,"
+                    " found, total, timings, meta, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (client_key(profile), profile.name, profile.city, profile.state, profile.phone,
+                     profile.address, source, started_at or finished_at, finished_at,
+                     sum(1 for r in results if r.found), len(results),
+                     json.dumps(timings) if timings else None, json.dumps(meta, ensure_ascii=False) if meta else None,
+                     status))
+                run_id = cur.lastrowid
+                self._conn.executemany(
+                    "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(run_id, i, self._broker_id(r.broker), int(bool(r.found)), r.url, r.title, r.notes, r.raw_snippet)
+                     for i, r in enumerate(results)])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return run_id
+
+    def set_meta(self, run_id: int, meta: Dict):
+        self._exec("UPDATE runs SET meta = ? WHERE id = ?", (json.dumps(meta, ensure_ascii=False), run_id))
+
+    def run(self, run_id: int) -> Optional[Dict]:
+        rows = self._exec("SELECT * FROM runs WHERE id = ?", (run_id,))
+        return _run(rows[0]) if rows else None
+
+    def latest_run(self, client: Union[ClientProfile, str]) -> Optional[Dict]:
+        """The newest completed run for this client (a profile), or for anyone with this name (a str)."""
+        if isinstance(client, ClientProfile):
+            where, args = "client = ?", (client_key(client),)
+        else:
+            where, args = "client >= ? AND client < ?", _name_range(client)
+        rows = self._exec(f"SELECT * FROM runs WHERE {where} AND status = ? ORDER BY finished_at DESC, id DESC LIMIT 1",
+                          args + (OK,))
+        return _run(rows[0]) if rows else None
+
+    def runs(self, client: Optional[str] = None, since: Optional[float] = None, limit: int = 50) -> List[Dict]:
+        """Runs (newest first), optionally only those of clients called client."""
+        sql, args = "SELECT * FROM runs WHERE finished_at >= ?", [since or 0]
+        if client:
+            sql += " AND client >= ? AND client < ?"
+            args.extend(_name_range(client))
+        return [_run(r) for r in self._exec(sql + " ORDER BY finished_at DESC, id DESC LIMIT ?", args + [limit])]
+
+    def results(self, run_id: int) -> List[BrokerResult]:
+        rows = self._exec("SELECT b.name, x.found, x.url, x.title, x.notes, x.raw_snippet FROM results x"
+                          " JOIN brokers b ON b.id = x.broker_id WHERE x.run_id = ? ORDER BY x.idx", (run_id,))
+        return [BrokerResult(broker=b, found=bool(f), url=u, title=t, notes=n, raw_snippet=s) for b, f, u, t, n, s in rows]
+
+    def listings(self, broker: Optional[str] = None, client: Optional[str] = None, since: Optional[float] = None,
+                 until: Optional[float] = None, latest_only: bool = False) -> List[Dict]:
+        """Found results grouped per (client, broker): the latest sighting plus how many runs found it.
+
+        client filters by name; clients are told apart by identity (city and
+        state are returned for display). latest_only keeps just each client's
+        most recent completed run (is the client listed now).
+        """
+        sql = ("SELECT r.name AS client, r.city, r.state, b.name AS broker, x.url, x.title,"
+               " MAX(r.finished_at) AS seen_at,"
+               " COUNT(*) AS runs, r.id AS run_id FROM results x JOIN runs r ON r.id = x.run_id"
+               " JOIN brokers b ON b.id = x.broker_id WHERE x.found = 1 AND r.finished_at >= ? AND r.finished_at < ?")
+        args = [since or 0, until or float("inf")]
+        if broker:
+            sql += " AND b.name = ?"
+            args.append(broker)
+        if client:
+            sql += " AND r.client >= ? AND r.client < ?"
+            args.extend(_name_range(client))
+        if latest_only:
+            sql += (" AND r.id = (SELECT id FROM runs r2 WHERE r2.client = r.client AND r2.status = 'ok'"
+                    " ORDER BY finished_at DESC, id DESC LIMIT 1)")
+        # SQLite takes the bare columns (url, title, run id) from the row holding MAX(finished_at)
+        sql += " GROUP BY r.client, x.broker_id ORDER BY r.name, b.name"
+        return [dict(r) for r in self._exec(sql, args)]
+
+    def export(self, run_id: int, outdir: str) -> Tuple[str, str, str]:
+        """Write the run as the classic <slug>_results.csv/.json/.txt files; returns their paths."""
+        from reporter import save_results
+        run = self.run(run_id)
+        if run is None:
+            raise KeyError(f"No stored run #{run_id}")
+        return save_results(run["name"], self.results(run_id), outdir, timings=run["timings"])
+
+    def import_reports(self, directory: str = "reports") -> int:
+        """Load old *_results.json and Web Clear JSON files under directory; returns runs added.
+
+        Files already imported (same client and file time) are skipped, so this can be re-run.
+        """
+        added = 0
+        for path in sorted(glob.glob(os.path.join(directory, "**", "*.json"), recursive=True)):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            stamp = os.path.getmtime(path)
+            if isinstance(data, list) and os.path.basename(path).endswith("_results.json"):
+                slug = os.path.basename(path)[:-len("_results.json")]
+                profile = ClientProfile(name=slug.replace("_", " ").title())
+                results = [BrokerResult(**{k: r.get(k) for k in ("broker", "found", "url", "title", "notes", "raw_snippet")})
+                           for r in data if isinstance(r, dict) and "broker" in r]
+                meta, started = None, None
+            elif isinstance(data, dict) and isinstance(data.get("providers"), dict) and data.get("name"):
+                profile = ClientProfile(**{k: (data.get(k) or None) for k in _PROFILE_FIELDS})
+                results = [BrokerResult(broker=p.get("display_name") or key, found=p.get("status") == "found",
+                                        url=(p.get("urls") or [None])[0], title=p.get("title"),
+                                        notes=None if p.get("status") == "found" else p.get("message"))
+                           for key, p in data["providers"].items()]
+                meta, started = data, _epoch(data.get("started_at"))
+                stamp = _epoch(data.get("finished_at")) or stamp
+            else:
+                continue
+            if self._exec("SELECT 1 FROM runs WHERE client = ? AND finished_at = ?", (client_key(profile), stamp)):
+                continue
+            failed = str((meta or {}).get("status") or "").startswith("failed")
+            self.add_run(profile, results, source="import", started_at=started, finished_at=stamp, meta=meta,
+                         status=FAILED if failed else OK)
+            added += 1
+        return added
+
+    def summary(self) -> str:
+        runs, clients = self._exec("SELECT COUNT(*), COUNT(DISTINCT client) FROM runs")[0]
+        results = self._exec("SELECT COUNT(*) FROM results")[0][0]
+        size = os.path.getsize(self.path) / 1024 if os.path.exists(self.path) else 0
+        return f"Results store: {runs} runs, {clients} clients, {results} broker results, {size:.0f} KB ({self.path})"
+
+
+def _run(row: sqlite3.Row) -> Dict:
+    run = dict(row)
+    run["timings"] = json.loads(run["timings"]) if run["timings"] else None
+    run["meta"] = json.loads(run["meta"]) if run["meta"] else None
+    return run
+
+
+def _epoch(iso: Optional[str]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(iso).timestamp() if iso else None
+    except ValueError:
+        return None
+
+
+def profile_of(run: Dict) -> ClientProfile:
+    return ClientProfile(**{k: run[k] for k in _PROFILE_FIELDS})
+
+
+_store: Optional[ResultsStore] = None
+_lock = threading.Lock()
+
+
+def get_store() -> ResultsStore:
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = ResultsStore(os.getenv("ARGUS_STORE_PATH") or DEFAULT_PATH)
+    return _store
+
+
+def record(profile: ClientProfile, results: List[BrokerResult], source: str = "discover", **kwargs) -> int:
+    """add_run on the shared store."""
+    return get_store().add_run(profile, results, source, **kwargs)
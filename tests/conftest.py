@@ -0,0 +1,40 @@
+import os, sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import BrokerResult  # noqa: E402
+
+SITES = [{"name": f"Broker{i}", "domain": f"broker{i}.com", "module": f"stub{i}"} for i in range(5)]
+
+
+@pytest.fixture(autouse=True)
+def _isolated(tmp_path, monkeypatch):
+    """Run each test in its own directory with no network-facing state."""
+    monkeypatch.chdir(tmp_path)
+    for var, value in (("ARGUS_CACHE", "0"), ("ARGUS_POLICY", "0"), ("ARGUS_PARSE_PROCS", "0")):
+        monkeypatch.setenv(var, value)
+
+
+@pytest.fixture
+def stub_brokers(monkeypatch):
+    """Five non-generic stub brokers; returns the list of (client, broker) searches made.
+
+    Put a broker name in stub_brokers.failing to make its search raise.
+    """
+    import app
+
+    class Calls(list):
+        failing = set()
+
+    calls = Calls()
+
+    def search(profile, site):
+        calls.append((profile.name, site["name"]))
+        if site["name"] in calls.failing:
+            raise RuntimeError("broker down")
+        return BrokerResult(broker=site["name"], found=site["name"] == "Broker0", url=f"https://{site['domain']}/x")
+
+    monkeypatch.setattr(app, "_selected_sites", lambda include_disabled=False: [dict(s) for s in SITES])
+    monkeypatch.setattr(app, "_call_broker", search)
+    return calls
@@ -0,0 +1,80 @@
+import time
+import pytest
+import cache, utils
+
+
+class _Response:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.encoding = "utf-8"
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """polite_get backed by a fresh cache and a scripted server; returns (cache, requests seen, replies)."""
+    rc = cache.ResponseCache(str(tmp_path / "http.sqlite3"), default_ttl=60)
+    seen, replies = [], []
+
+    def get(url, headers, timeout, **kwargs):
+        seen.append(dict(headers))
+        return replies.pop(0)
+
+    monkeypatch.setattr(utils, "get_cache", lambda: rc)
+    monkeypatch.setattr(utils, "_hedged_get", get)
+    monkeypatch.setattr(utils.limiter, "acquire", lambda url: 0.0)
+    return rc, seen, replies
+
+
+def test_fresh_entry_is_served_without_a_request(server):
+    rc, seen, replies = server
+    replies.append(_Response(200, b"<p>Jane</p>", {"ETag": '"v1"'}))
+    first = utils.polite_get("https://Example.com/p?b=2&a=1#top")
+    again = utils.polite_get("https://example.com/p?a=1&b=2")
+    assert first.content == again.content == b"<p>Jane</p>"
+    assert again.from_cache and len(seen) == 1
+    assert (rc.hits, rc.misses) == (1, 1)
+
+
+def test_stale_entry_is_revalidated_and_a_304_refreshes_it(server):
+    rc, seen, replies = server
+    replies.append(_Response(200, b"<p>Jane</p>", {"ETag": '"v1"', "Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT"}))
+    utils.polite_get("https://example.com/p")
+    rc._db().execute("UPDATE responses SET fetched_at = ?", (time.time() - 120,))
+    replies.append(_Response(304))
+    r = utils.polite_get("https://example.com/p")
+    assert seen[1]["If-None-Match"] == '"v1"'
+    assert seen[1]["If-Modified-Since"] == "Mon, 05 Oct 2026 10:00:00 GMT"
+    assert r.status_code == 200 and r.content == b"<p>Jane</p>" and rc.revalidated == 1
+    utils.polite_get("https://example.com/p")
+    assert len(seen) == 2  # refreshed by the 304, so fresh again
+
+
+def test_zero_ttl_and_uncacheable_statuses_always_go_to_the_network(server):
+    rc, seen, replies = server
+    replies.extend([_Response(200, b"a"), _Response(200, b"b"), _Response(503), _Response(503)])
+    utils.polite_get("https://example.com/p", cache_ttl=0)
+    utils.polite_get("https://example.com/p", cache_ttl=0)
+    utils.polite_get("https://example.com/down", attempts=1)
+    utils.polite_get("https://example.com/down", attempts=1)
+    assert len(seen) == 4 and rc.stores == 0
+
+
+def test_forget_drops_the_entry(server):
+    rc, seen, replies = server
+    replies.extend([_Response(200, b"captcha"), _Response(200, b"<p>Jane</p>")])
+    utils.polite_get("https://example.com/p")
+    rc.forget("https://example.com/p")
+    assert utils.polite_get("https://example.com/p").content == b"<p>Jane</p>"
+    assert rc.stats()["bytes"] == len(b"<p>Jane</p>")
+
+
+def test_least_recently_used_entries_are_evicted_over_the_cap(tmp_path):
+    rc = cache.ResponseCache(str(tmp_path / "http.sqlite3"), max_bytes=250)
+    for name in ("a", "b"):
+        rc.store(f"https://example.com/{name}", _Response(200, b"x" * 100))
+    rc.hit(rc.lookup("https://example.com/a"))
+    rc.store("https://example.com/c", _Response(200, b"x" * 100))
+    assert rc.lookup("https://example.com/b") is None
+    assert rc.lookup("https://example.com/a") is not None and rc.evictions == 1
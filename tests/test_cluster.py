@@ -0,0 +1,81 @@
+import threading
+import pytest
+import requests
+import cluster
+from models import BrokerResult, ClientProfile
+
+JANE = ClientProfile(name="Jane Doe", city="Austin", state="TX")
+SITES = [{"name": "Nuwber", "domain": "nuwber.com", "module": "nuwber"},
+         {"name": "Radaris", "domain": "radaris.com", "module": "radaris"},
+         {"name": "Spokeo", "domain": "spokeo.com", "module": "spokeo"}]
+GENERIC = {"name": "Clustrmaps", "domain": "clustrmaps.com", "module": "generic"}
+
+
+class _Node(cluster.Node):
+    """A node without the HTTP side: answers every task itself, or raises `fail`."""
+
+    def __init__(self, url, rate=1.0, burst=1.0, slots=2, fail=None):
+        self.url, self.http, self.slots = url, None, slots
+        self.default, self.limits, self.buckets = (rate, burst), {}, {}
+        self.inflight, self.alive, self.done = 0, True, 0
+        self.fail = fail
+
+    def run(self, profile, sites, batched):
+        if self.fail is not None:
+            raise self.fail
+        return {"results": [BrokerResult(broker=s["name"], found=False, url=f"https://{s['domain']}/x").to_dict()
+                            for s in sites], "timings": {}}
+
+
+def _coordinator(*nodes):
+    co = cluster.Coordinator.__new__(cluster.Coordinator)
+    co.http, co.nodes, co._cond = None, list(nodes), threading.Condition()
+    return co
+
+
+def _run(co, plan):
+    got = []
+    co.run([JANE], SITES, [plan], lambda c, idx, r, timings: got.append((idx, r)))
+    return sorted(got, key=lambda item: item[0])
+
+
+def test_same_host_tasks_are_spread_over_the_nodes():
+    a, b = _Node("a"), _Node("b")
+    co = _coordinator(a, b)
+    host = cluster.task_host(SITES[0])
+    assert co._place(host) is a
+    assert co._place(host) is b  # a's bucket for the host is empty now
+    assert co._place(cluster.task_host(SITES[1])) is a
+    assert (a.inflight, b.inflight) == (2, 1)
+
+
+def test_batched_task_reserves_its_page_budget():
+    a, b = _Node("a", burst=3.0), _Node("b", burst=3.0)
+    co = _coordinator(a, b)
+    host, cost = cluster.task_host(GENERIC), cluster.task_cost(GENERIC, True)
+    assert cost == 3 and cluster.task_cost(GENERIC, False) == 1
+    assert co._place(host, cost) is a
+    assert co._place(host) is b
+
+
+def test_tasks_of_a_dead_node_move_to_the_others():
+    a, b = _Node("a", fail=requests.ConnectionError("refused")), _Node("b")
+    co = _coordinator(a, b)
+    got = _run(co, [([0], False), ([1], False), ([2], False)])
+    assert [(idx, r.broker, r.notes) for idx, r in got] == [(0, "Nuwber", None), (1, "Radaris", None),
+                                                          (2, "Spokeo", None)]
+    assert not a.alive and b.done == 3 and b.inflight == 0
+
+
+def test_a_task_that_fails_on_a_node_becomes_an_error_result():
+    a = _Node("a", fail=RuntimeError("bad response"))
+    got = _run(_coordinator(a), [([0, 1], False)])
+    assert [r.notes for _, r in got] == ["Error during search: bad response"] * 2
+    assert a.alive
+
+
+def test_run_stops_when_every_node_has_failed():
+    co = _coordinator(_Node("a", fail=requests.ConnectionError("refused")),
+                      _Node("b", fail=requests.ConnectionError("refused")))
+    with pytest.raises(cluster.NoNodesError):
+        _run(co, [([0], False), ([1], False), ([2], False)])
@@ -0,0 +1,70 @@
+import threading, time
+import pytest
+import policy, utils
+
+URL = "https://slow.example/search"
+
+
+def _policy(credit=0.0):
+    p = policy.RequestPolicy()
+    p.set_hedge("slow.example")
+    for _ in range(policy.MIN_SAMPLES):
+        p.record(URL, True, 0.05)
+    p._health(URL).hedge_credit = credit
+    return p
+
+
+@pytest.fixture
+def legs(monkeypatch):
+    """_get_once where the first leg takes 0.5s and any later leg answers at once; returns the legs started."""
+    started, lock = [], threading.Lock()
+
+    def get(url, headers, timeout, **kwargs):
+        with lock:
+            started.append(url)
+            first = len(started) == 1
+        if first:
+            time.sleep(0.5)
+        return "slow" if first else "fast"
+
+    monkeypatch.setattr(utils, "_get_once", get)
+    monkeypatch.setattr(utils.limiter, "try_acquire", lambda url: True)
+    return started
+
+
+def test_credit_is_earned_per_request_and_spent_per_hedge():
+    p = policy.RequestPolicy()
+    for _ in range(round(1 / policy.HEDGE_BUDGET)):
+        assert not p.hedge_allowed(URL)
+        p.allow(URL)
+    assert p.hedge_allowed(URL)
+    p.hedged(URL)
+    assert not p.hedge_allowed(URL) and p.stats()["slow.example"]["hedges"] == 1
+    for _ in range(100):
+        p.allow(URL)
+    assert p._health(URL).hedge_credit == policy.HEDGE_CREDIT_MAX
+
+
+def test_slow_request_is_hedged_and_the_fast_leg_wins(monkeypatch, legs):
+    p = _policy(credit=1.0)
+    monkeypatch.setattr(utils, "get_policy", lambda: p)
+    assert utils._hedged_get(URL, {}, 5.0) == "fast"
+    assert len(legs) == 2
+    s = p.stats()["slow.example"]
+    assert (s["hedges"], s["hedge_wins"]) == (1, 1) and not p.hedge_allowed(URL)
+
+
+def test_no_hedge_once_the_budget_is_spent(monkeypatch, legs):
+    p = _policy(credit=0.5)
+    monkeypatch.setattr(utils, "get_policy", lambda: p)
+    assert utils._hedged_get(URL, {}, 5.0) == "slow"
+    assert len(legs) == 1 and p.stats()["slow.example"]["hedges"] == 0
+
+
+def test_only_hosts_marked_for_hedging_with_a_closed_circuit_are_hedged():
+    p = _policy(credit=2.0)
+    assert p.hedge_delay(URL) == 0.05
+    assert p.hedge_delay("https://other.example/") is None
+    p._health(URL).state = policy.OPEN
+    assert p.hedge_delay(URL) is None
+    assert policy.RequestPolicy(hedging=False).hedge_delay(URL) is None
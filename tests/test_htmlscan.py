@@ -0,0 +1,51 @@
+import htmlscan
+from models import ClientProfile
+
+FILLER = b"<p>" + b"unrelated listing text " * 4000 + b"</p>"
+
+
+def test_scan_stops_once_everything_is_found():
+    page = b"<html><head><title>Jane Doe in Austin</title></head><body><p>Jane Doe, 42, Austin TX</p>" + FILLER
+    r = htmlscan.scan(page, terms=("jane doe", "austin"), title_tags=("title",), chunk_size=1024)
+    assert r.terms_found and r.title == "Jane Doe in Austin"
+    assert not r.complete and r.bytes_read < len(page) // 10
+
+
+def test_scan_reads_the_whole_page_when_something_is_missing():
+    page = b"<html><body><p>Jane Doe</p>" + FILLER + b"</body></html>"
+    r = htmlscan.scan(page, terms=("jane doe", "austin"), chunk_size=1024)
+    assert not r.terms_found and r.complete and r.bytes_read == len(page)
+
+
+def test_script_and_style_text_never_matches():
+    page = b"<html><head><style>.jane-doe{}</style><script>var q = 'jane doe';</script></head><body>x</body></html>"
+    assert not htmlscan.scan(page, terms=("jane doe",)).terms_found
+
+
+def test_terms_split_across_chunks_and_text_runs_still_match():
+    page = b"<html><body><p>Jane <b>Doe</b></p>" + FILLER + b"</body></html>"
+    assert htmlscan.scan(page, terms=("jane doe",), chunk_size=7).terms_found
+
+
+def test_match_element_by_tag_and_class():
+    page = (b"<html><body><a class='ad' href='/ad'>Jane Doe</a>"
+            b"<a class='result__a other' href='/jane'>Jane Doe - Austin</a>" + FILLER)
+    r = htmlscan.scan(page, match_tag="a", match_class=("result__a",), match=lambda text, attrib: "jane" in text.lower(),
+                      chunk_size=1024)
+    assert r.element_text == "Jane Doe - Austin" and r.element_attrib["href"] == "/jane"
+    assert not r.complete
+
+
+def test_scan_profile_stops_at_a_confident_name_match():
+    page = b"<html><body><h1>Jane Doe</h1><p>Jane Doe, Austin, TX</p>" + FILLER
+    r = htmlscan.scan_profile(page, ClientProfile(name="Jane Doe", city="Austin", state="TX"))
+    assert htmlscan.is_found(r) and r.title == "Jane Doe" and not r.complete
+
+
+def test_fingerprint_ignores_markup_outside_the_result_region():
+    a = b"<html><body><div class='ad'>Ad 1</div><a class='result__a' href='/j'>Jane Doe</a></body></html>"
+    b = b"<html><body><div class='ad'>Ad 2</div><a class='result__a' href='/j'>Jane  Doe</a></body></html>"
+    c = b"<html><body><div class='ad'>Ad 1</div><a class='result__a' href='/k'>Jane Doe</a></body></html>"
+    fp = lambda page: htmlscan.fingerprint(page, tag="a", classes=("result__a",))
+    assert fp(a) == fp(b) != fp(c)
+    assert htmlscan.fingerprint(a) != htmlscan.fingerprint(b)
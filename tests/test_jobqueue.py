@@ -0,0 +1,82 @@
+import time
+import pytest
+from jobqueue import CANCELLED, DONE, FAILED, MAX_ATTEMPTS, QUEUED, RETRY_BACKOFF, RUNNING, STALE_AFTER, JobQueue, \
+    parse_interval
+from models import ClientProfile
+
+
+@pytest.fixture
+def queue():
+    return JobQueue("jobs.sqlite3")
+
+
+def _due(queue, job_id):
+    """Make a backed-off job claimable now."""
+    with queue._db() as db:
+        db.execute("UPDATE jobs SET run_at = 0 WHERE id = ?", (job_id,))
+
+
+def test_claim_takes_highest_priority_once(queue):
+    low = queue.submit(ClientProfile(name="A"))
+    high = queue.submit(ClientProfile(name="B"), priority=1)
+    assert queue.claim("w1")["id"] == high
+    assert queue.claim("w2")["id"] == low
+    assert queue.claim("w3") is None
+    assert queue.get(low)["status"] == RUNNING and queue.get(low)["worker"] == "w2"
+
+
+def test_one_running_job_per_client(queue):
+    first = queue.submit(ClientProfile(name="A"))
+    second = queue.submit(ClientProfile(name="A"))
+    assert queue.claim("w1")["id"] == first
+    assert queue.claim("w2") is None
+    queue.finish(first, 1, 5, stored_id=7)
+    assert queue.get(first)["status"] == DONE and queue.get(first)["stored_id"] == 7
+    assert queue.claim("w2")["id"] == second
+
+
+def test_fail_backs_off_then_gives_up(queue):
+    job_id = queue.submit(ClientProfile(name="A"))
+    for attempt in range(1, MAX_ATTEMPTS):
+        queue.claim("w1")
+        queue.fail(job_id, "boom")
+        job = queue.get(job_id)
+        assert job["status"] == QUEUED
+        assert job["run_at"] - time.time() == pytest.approx(RETRY_BACKOFF * 2 ** (attempt - 1), abs=5)
+        assert queue.claim("w1") is None  # not due yet
+        _due(queue, job_id)
+    queue.claim("w1")
+    queue.fail(job_id, "boom")
+    assert queue.get(job_id)["status"] == FAILED
+
+
+def test_requeue_stale_respects_max_attempts(queue):
+    queue.heartbeat("live")
+    job_id = queue.submit(ClientProfile(name="A"))
+    kept = queue.submit(ClientProfile(name="B"))
+    queue.claim("dead")
+    queue.claim("live")
+    assert queue.requeue_stale() == 1
+    assert queue.get(job_id)["status"] == QUEUED and queue.get(kept)["status"] == RUNNING
+    for _ in range(MAX_ATTEMPTS - 1):
+        assert queue.claim("dead")["id"] == job_id
+        queue.requeue_stale()
+    assert queue.get(job_id)["status"] == FAILED
+
+
+def test_workers_alive_and_cancel(queue):
+    queue.heartbeat("w1")
+    with queue._db() as db:
+        db.execute("INSERT INTO workers VALUES ('old', 0, ?)", (time.time() - STALE_AFTER - 1,))
+    assert queue.workers_alive() == 1
+    job_id = queue.submit(ClientProfile(name="A"))
+    assert queue.cancel(job_id) and queue.get(job_id)["status"] == CANCELLED
+    assert not queue.cancel(job_id)
+
+
+def test_schedule_enqueues_once_per_slot(queue):
+    sid = queue.schedule(ClientProfile(name="A"), parse_interval("1h"), start_at=time.time() - 10)
+    assert len(queue.enqueue_due()) == 1
+    assert queue.enqueue_due() == []
+    assert queue.schedules()[0]["next_run_at"] > time.time()
+    assert queue.unschedule(sid) and queue.schedules() == []
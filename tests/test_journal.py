@@ -0,0 +1,75 @@
+from app import run_discovery, run_discovery_batch
+from journal import Journal
+from models import BrokerResult, ClientProfile
+from conftest import SITES
+
+JANE = ClientProfile(name="Jane Doe", city="Austin", state="TX")
+
+
+def _interrupted(journal, profiles, finished=(), errored=(), in_flight=()):
+    """Leave a run as a killed process would: some brokers done, some failed, some mid-search."""
+    run = journal.open_run(profiles)
+    for profile in profiles:
+        for i in finished:
+            run.started(profile, SITES[i])
+            run.finished(profile, SITES[i], BrokerResult(broker=SITES[i]["name"], found=True, url="https://saved"))
+        for i in errored:
+            run.started(profile, SITES[i])
+            run.finished(profile, SITES[i], BrokerResult(broker=SITES[i]["name"], found=False,
+                                                          notes="Error during search: timed out"))
+        for i in in_flight:
+            run.started(profile, SITES[i])
+    return run
+
+
+def test_resume_searches_only_unfinished_brokers(stub_brokers):
+    journal = Journal("journal.sqlite3")
+    _interrupted(journal, [JANE], finished=(0, 1), in_flight=(2,))
+    run = journal.open_run([JANE])
+    assert run.resumed
+    results = run_discovery(JANE, journal=run)
+    assert sorted(b for _, b in stub_brokers) == ["Broker2", "Broker3", "Broker4"]
+    assert [r.url for r in results[:2]] == ["https://saved"] * 2
+    assert len(results) == len(SITES) and all(results)
+    assert journal.open_run([JANE]).resumed is False  # the resumed run was completed
+
+
+def test_errored_brokers_are_searched_again(stub_brokers):
+    journal = Journal("journal.sqlite3")
+    _interrupted(journal, [JANE], finished=(0, 1, 2, 3), errored=(4,))
+    results = run_discovery(JANE, journal=journal.open_run([JANE]))
+    assert stub_brokers == [("Jane Doe", "Broker4")]
+    assert results[4].notes is None
+
+
+def test_fresh_run_starts_over(stub_brokers):
+    journal = Journal("journal.sqlite3")
+    _interrupted(journal, [JANE], finished=(0, 1, 2))
+    run = journal.open_run([JANE], resume=False)
+    assert not run.resumed
+    run_discovery(JANE, journal=run)
+    assert len(stub_brokers) == len(SITES)
+
+
+def test_errors_during_the_run_stay_unfinished(stub_brokers):
+    journal = Journal("journal.sqlite3")
+    stub_brokers.failing.add("Broker3")
+    run = journal.open_run([JANE])
+    run_discovery(JANE, journal=run)
+    assert "Broker3" not in {r.broker for r in run.completed(JANE).values()}
+    assert len(run.completed(JANE)) == len(SITES) - 1
+
+
+def test_batch_fires_on_client_done_for_fully_resumed_clients(stub_brokers):
+    journal = Journal("journal.sqlite3")
+    john = ClientProfile(name="John Roe")
+    run = journal.open_run([JANE, john])
+    for i, site in enumerate(SITES):
+        run.started(JANE, site)
+        run.finished(JANE, site, BrokerResult(broker=site["name"], found=False))
+    done = {}
+    run_discovery_batch([JANE, john], on_client_done=lambda p, rs: done.setdefault(p.name, list(rs)),
+                        journal=journal.open_run([JANE, john]))
+    assert set(done) == {"Jane Doe", "John Roe"}
+    assert len(done["Jane Doe"]) == len(SITES) and all(done["Jane Doe"])
+    assert {c for c, _ in stub_brokers} == {"John Roe"}
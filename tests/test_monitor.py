@@ -0,0 +1,63 @@
+import cache, monitor
+from models import ClientProfile
+
+JANE = ClientProfile(name="Jane Doe")
+SITE = {"name": "Nuwber", "domain": "nuwber.com", "module": "generic"}
+NO_RESULTS = b"<html><body><div class='no-results'>No results.</div></body></html>"
+LISTED = (b"<html><body><a class='result__a' href='https://nuwber.com/person/jane-doe'>Jane Doe - Nuwber</a>"
+          b"</body></html>")
+CAPTCHA = b"<html><body><form id='challenge-form'>Unfortunately, bots use DuckDuckGo too.</form></body></html>"
+
+
+class _Response:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.encoding = "utf-8"
+        self.headers = headers or {}
+
+
+def _scan(monkeypatch, response):
+    """One incremental scan of SITE answered with response; returns (monitor, result)."""
+    seen = {}
+    monkeypatch.setattr(monitor, "polite_get", lambda url, headers=None, **kw: seen.update(headers=headers) or response)
+    m = monitor.Monitor.for_profile(JANE)
+    r = m.search(JANE, SITE)
+    m.record(SITE, r)
+    m.save()
+    return m, r, seen["headers"]
+
+
+def test_unchanged_page_skips_parse_and_304_reuses_result(monkeypatch):
+    _scan(monkeypatch, _Response(200, LISTED, {"ETag": '"v1"'}))
+    m, r, _ = _scan(monkeypatch, _Response(200, LISTED, {"ETag": '"v1"'}))
+    assert r.found and m.unchanged == 1 and m.parsed == 0
+    m, r, headers = _scan(monkeypatch, _Response(304))
+    assert headers["If-None-Match"] == '"v1"'
+    assert r.found and m.not_modified == 1 and m.changes() == []
+
+
+def test_new_listing_is_reported_as_a_change(monkeypatch):
+    _scan(monkeypatch, _Response(200, NO_RESULTS))
+    m, r, _ = _scan(monkeypatch, _Response(200, LISTED))
+    assert r.found and m.parsed == 1
+    assert [(broker, old["found"], new["found"]) for broker, old, new in m.changes()] == [("Nuwber", False, True)]
+
+
+def test_captcha_page_is_an_error_and_keeps_the_saved_state(monkeypatch):
+    forgotten = []
+    monkeypatch.setattr(cache, "forget", forgotten.append)
+    first, _, _ = _scan(monkeypatch, _Response(200, NO_RESULTS))
+    saved = dict(first.state[monitor.site_key(SITE)])
+    m, r, _ = _scan(monkeypatch, _Response(200, CAPTCHA))
+    assert r.notes.startswith("Error during search") and m.unchanged == 0
+    assert forgotten == [saved["url"]]
+    assert monitor.Monitor.for_profile(JANE).state[monitor.site_key(SITE)] == saved
+    assert m.changes() == []
+
+
+def test_unreachable_broker_is_an_error_and_keeps_the_saved_state(monkeypatch):
+    _scan(monkeypatch, _Response(200, LISTED))
+    m, r, _ = _scan(monkeypatch, _Response(0))
+    assert r.notes == "Error during search: no response"
+    assert monitor.Monitor.for_profile(JANE).previous[monitor.site_key(SITE)]["found"] is True
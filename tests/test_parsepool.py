@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+import parsepool, utils
+from models import ClientProfile
+
+JANE = ClientProfile(name="Jane Doe")
+SITE = {"name": "Nuwber", "domain": "nuwber.com", "module": "generic"}
+PAGE = (b"<html><body><a class='result__a' href='https://nuwber.com/person/jane-doe'>Jane Doe - Nuwber</a>"
+        b"</body></html>")
+
+
+class _Response:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+        self.encoding = "utf-8"
+        self.headers = {}
+
+
+@pytest.fixture
+def pool():
+    pool = parsepool.configure(1)
+    yield pool
+    parsepool.configure(0)
+
+
+def _serve(monkeypatch, response):
+    async def async_get(url, **kwargs):
+        return response
+    monkeypatch.setattr(utils, "polite_get", lambda url, **kwargs: response)
+    monkeypatch.setattr(utils, "async_polite_get", async_get)
+
+
+def test_pooled_search_parses_in_the_pool(monkeypatch, pool):
+    _serve(monkeypatch, _Response(200, PAGE))
+    r = parsepool.search(JANE, SITE)
+    assert r.found and r.url == "https://nuwber.com/person/jane-doe"
+    assert pool.parsed == 1
+
+
+def test_failed_fetch_is_an_error_not_a_miss(monkeypatch, pool):
+    _serve(monkeypatch, _Response(0))  # what polite_get(allow_fail=True) returns after giving up
+    for r in (parsepool.search(JANE, SITE), asyncio.run(parsepool.async_search(JANE, SITE))):
+        assert not r.found
+        assert r.notes == "Error during search: no response from DuckDuckGo"
+    assert pool.parsed == 0
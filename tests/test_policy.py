@@ -0,0 +1,74 @@
+import policy
+
+URL = "https://broker.example/search"
+
+
+def _tripped():
+    p = policy.RequestPolicy()
+    for _ in range(policy.FAILURE_THRESHOLD):
+        assert p.allow(URL)
+        p.record(URL, False)
+    return p
+
+
+def _cooled(p):
+    h = p._health(URL)
+    h.opened_at -= h.cooldown
+    return h
+
+
+def test_consecutive_failures_open_the_circuit():
+    p = _tripped()
+    assert p.is_open(URL) and not p.allow(URL) and not p.allow(URL)
+    assert p.stats()["broker.example"]["skipped"] == 2
+    assert p.allow("https://other.example/")
+
+
+def test_half_open_probe_success_closes_the_circuit():
+    p = _tripped()
+    _cooled(p)
+    assert p.allow(URL)       # the probe
+    assert not p.allow(URL)   # everyone else keeps failing fast meanwhile
+    p.record(URL, True, 0.2)
+    h = p._health(URL)
+    assert h.state == policy.CLOSED and h.cooldown == policy.COOLDOWN and p.allow(URL)
+
+
+def test_failed_probe_reopens_with_a_doubled_cooldown():
+    p = _tripped()
+    _cooled(p)
+    assert p.allow(URL)
+    p.record(URL, False)
+    h = p._health(URL)
+    assert h.state == policy.OPEN and h.cooldown == 2 * policy.COOLDOWN and not p.allow(URL)
+
+
+def test_failure_rate_trips_without_consecutive_failures():
+    p = policy.RequestPolicy()
+    for ok in (False, False, True, False, False):
+        p.record(URL, ok, 0.1)
+    assert p.is_open(URL)
+
+
+def test_timeout_follows_p95_latency_under_the_callers_ceiling():
+    p = policy.RequestPolicy()
+    assert p.timeout_for(URL, 12.0) == 12.0
+    for latency in (1.0, 1.2, 1.5, 1.1, 2.0):
+        p.record(URL, True, latency)
+    assert p.timeout_for(URL, 12.0) == 4.0
+    assert p.timeout_for(URL, 3.0) == 3.0
+
+
+def test_open_circuit_survives_a_restart(tmp_path):
+    path = str(tmp_path / "health.json")
+    p = _tripped()
+    p.path = path
+    p.save()
+    assert not policy.RequestPolicy(path).allow(URL)
+
+
+def test_disabled_policy_never_breaks_the_circuit():
+    p = policy.RequestPolicy(adaptive=False)
+    for _ in range(10):
+        p.record(URL, False)
+    assert p.allow(URL) and not p.is_open(URL) and p.timeout_for(URL, 12.0) == 12.0
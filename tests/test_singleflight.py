@@ -0,0 +1,78 @@
+import asyncio, threading, time
+import pytest
+import utils
+from singleflight import SingleFlight
+
+
+class _Response:
+    status_code = 200
+    content = b"<p>Jane</p>"
+    headers = {}
+
+
+@pytest.fixture
+def slow_server(monkeypatch):
+    """A server that holds every request for 0.2s; returns the list of requests it saw."""
+    seen = []
+
+    def get(url, headers, timeout, **kwargs):
+        seen.append((url, timeout))
+        time.sleep(0.2)
+        return _Response()
+
+    async def async_get(url, headers, timeout, **kwargs):
+        seen.append((url, timeout))
+        await asyncio.sleep(0.2)
+        return _Response()
+
+    monkeypatch.setattr(utils, "_async_hedged_get", async_get)
+    monkeypatch.setattr(utils, "_hedged_get", get)
+    monkeypatch.setattr(utils.limiter, "acquire", lambda url: 0.0)
+    monkeypatch.setattr(utils.limiter, "reserve", lambda url: 0.0)
+    return seen
+
+
+def _concurrently(*calls):
+    threads = [threading.Thread(target=utils.polite_get, args=("https://example.com/p",), kwargs=kw) for kw in calls]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_identical_concurrent_fetches_share_one_request(slow_server):
+    _concurrently({}, {}, {"timeout": 12.0})
+    assert len(slow_server) == 1
+
+
+@pytest.mark.parametrize("options", [{"cache_ttl": 0}, {"timeout": 3.0}, {"attempts": 1}, {"allow_fail": False},
+                                     {"headers": {"Accept": "text/html"}}])
+def test_fetches_with_different_options_do_not_share(slow_server, options):
+    _concurrently({}, options)
+    assert len(slow_server) == 2
+
+
+def test_async_fetches_share_by_the_same_key(slow_server):
+    async def scan():
+        url = "https://example.com/p"
+        return await asyncio.gather(utils.async_polite_get(url), utils.async_polite_get(url),
+                                    utils.async_polite_get(url, timeout=3.0))
+
+    assert len(asyncio.run(scan())) == 3
+    assert sorted(t for _, t in slow_server) == [3.0, 12.0]
+
+
+def test_memoized_results_are_shared_but_errors_are_not():
+    flights, calls = SingleFlight(memoize=True), []
+
+    def search(fail):
+        calls.append(fail)
+        if fail:
+            raise RuntimeError("down")
+        return "found"
+
+    assert flights.do("a", search, False) == flights.do("a", search, False) == "found"
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            flights.do("b", search, True)
+    assert calls == [False, True, True] and (flights.executed, flights.shared) == (3, 1)
@@ -0,0 +1,69 @@
+import os
+import sinks
+from app import run_discovery, run_discovery_batch
+from models import BrokerResult, ClientProfile
+from conftest import SITES
+
+JANE = ClientProfile(name="Jane Doe", city="Austin", state="TX")
+OTHER_JANE = ClientProfile(name="Jane Doe", city="Reno", state="NV")
+
+
+def _result(i, **kw):
+    return BrokerResult(broker=f"Broker{i}", found=False, url=f"https://broker{i}.com/x", **kw)
+
+
+def test_read_results_orders_by_index_and_keeps_the_last_record():
+    sink = sinks.StreamSink()
+    sink.write(JANE, 2, _result(2))
+    sink.write(JANE, 0, _result(0, notes="Error during search: timed out"))
+    sink.write(JANE, 1, _result(1))
+    sink.write(JANE, 0, _result(0))  # the retry
+    sink.finish(JANE)
+    results = sinks.read_results(sinks.stream_path(JANE.name))
+    assert [r.broker for r in results] == ["Broker0", "Broker1", "Broker2"]
+    assert results[0].notes is None
+
+
+def test_a_line_cut_off_mid_write_is_skipped():
+    sink = sinks.StreamSink()
+    sink.write(JANE, 0, _result(0))
+    sink.finish(JANE)
+    path = sinks.stream_path(JANE.name)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"index": 1, "broker": "Bro')
+    assert [r.broker for r in sinks.read_results(path)] == ["Broker0"]
+
+
+def test_same_name_clients_get_separate_streams():
+    sink = sinks.StreamSink()
+    sink.write(JANE, 0, _result(0))
+    sink.write(OTHER_JANE, 0, _result(1))
+    sink.write(JANE, 1, _result(2))
+    sink.close()
+    files = sorted(os.listdir(".cache"))
+    assert len(files) == 4 and "jane_doe_latest.jsonl" in files
+    tagged = next(f for f in files if f.endswith(".jsonl") and f != "jane_doe_latest.jsonl")
+    assert [r.broker for r in sinks.read_results(os.path.join(".cache", tagged))] == ["Broker1"]
+    assert [r.broker for r in sinks.read_results(sinks.stream_path(JANE.name))] == ["Broker0", "Broker2"]
+
+
+def test_fsync_is_batched(monkeypatch):
+    synced = []
+    monkeypatch.setattr(sinks.os, "fsync", synced.append)
+    sink = sinks.StreamSink(fsync_every=4, fsync_interval=3600)
+    for i in range(5):
+        sink.write(JANE, i, _result(i))
+    assert len(synced) == 2  # one per file after the 4th write
+    sink.finish(JANE)
+    assert len(synced) == 4  # the leftover write in each file
+
+
+def test_engines_stream_every_result(stub_brokers):
+    sink = sinks.StreamSink()
+    results = run_discovery(JANE, sink=sink)
+    assert sinks.read_results(sinks.stream_path(JANE.name)) == results
+    with open(sinks.stream_path(JANE.name, "csv"), encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == len(SITES) + 1
+    finished = []
+    run_discovery_batch([JANE, OTHER_JANE], on_client_done=lambda p, r: finished.append(p), sink=sinks.StreamSink())
+    assert len(finished) == 2 and len(os.listdir(".cache")) == 4
@@ -0,0 +1,66 @@
+import json, os
+import pytest
+from models import BrokerResult, ClientProfile
+from store import FAILED, ResultsStore
+
+AUSTIN = ClientProfile(name="Jane Doe", city="Austin", state="TX")
+BOSTON = ClientProfile(name="Jane Doe", city="Boston", state="MA")
+
+
+def _found(*brokers):
+    return [BrokerResult(broker=b, found=True, url=f"https://{b.lower()}.com/jane") for b in brokers]
+
+
+@pytest.fixture
+def rs():
+    return ResultsStore("results.sqlite3")
+
+
+def test_runs_are_kept_per_client_identity(rs):
+    a = rs.add_run(AUSTIN, _found("Spokeo"), finished_at=100)
+    b = rs.add_run(BOSTON, _found("Spokeo"), finished_at=200)
+    assert rs.latest_run(AUSTIN)["id"] == a
+    assert rs.latest_run(BOSTON)["id"] == b
+    assert rs.latest_run("jane doe")["id"] == b  # by name: anyone called that
+    assert len(rs.runs("Jane Doe")) == 2 and rs.runs("Jane") == []
+    rows = rs.listings(broker="Spokeo")
+    assert [(r["client"], r["city"]) for r in rows] == [("Jane Doe", "Austin"), ("Jane Doe", "Boston")]
+
+
+def test_listings_latest_only_and_counts(rs):
+    rs.add_run(AUSTIN, _found("Spokeo", "Radaris"), finished_at=100)
+    rs.add_run(AUSTIN, _found("Spokeo"), finished_at=200)
+    rows = {r["broker"]: r for r in rs.listings(client="Jane Doe")}
+    assert rows["Spokeo"]["runs"] == 2 and rows["Spokeo"]["seen_at"] == 200
+    assert rows["Radaris"]["runs"] == 1
+    assert [r["broker"] for r in rs.listings(latest_only=True)] == ["Spokeo"]
+    assert rs.listings(since=150, until=250)[0]["broker"] == "Spokeo"
+    assert rs.listings(broker="Whitepages") == []
+
+
+def test_failed_runs_are_never_latest(rs):
+    ok = rs.add_run(AUSTIN, _found("Spokeo"), finished_at=100)
+    failed = rs.add_run(AUSTIN, [], source="webclear", finished_at=200, meta={"status": "failed: boom"},
+                        status=FAILED)
+    assert rs.latest_run(AUSTIN)["id"] == ok
+    assert [r["run_id"] for r in rs.listings(latest_only=True)] == [ok]
+    assert rs.run(failed)["meta"]["status"] == "failed: boom"
+
+
+def test_results_round_trip_and_export(rs):
+    results = _found("Spokeo") + [BrokerResult(broker="Radaris", found=False, notes="Opt-out: x")]
+    run_id = rs.add_run(AUSTIN, results, timings={"Spokeo": {"http": 0.5}})
+    assert rs.results(run_id) == results
+    paths = rs.export(run_id, "out")
+    assert all(os.path.exists(p) for p in paths)
+    with pytest.raises(KeyError):
+        rs.export(run_id + 1, "out")
+
+
+def test_import_reports_is_idempotent(rs):
+    os.makedirs("reports")
+    with open(os.path.join("reports", "jane_doe_results.json"), "w", encoding="utf-8") as f:
+        json.dump([r.to_dict() for r in _found("Spokeo")], f)
+    assert rs.import_reports("reports") == 1
+    assert rs.import_reports("reports") == 0
+    assert rs.listings(broker="Spokeo")[0]["client"] == "Jane Doe"
@@ -0,0 +1,124 @@
+"""Per-broker, per-stage timing spans for discovery runs.
+
+run_discovery(tracer=Tracer()) wraps every broker search in a "broker" span;
+inside it the HTTP layer and parsers add stage spans:
+
+- rate_wait: waiting on the per-host rate limiter
+- http: the request itself (args: status, bytes, ttfb_ms = time to headers)
+- backoff: sleeping between retries
+- parse: streaming HTML scan/collect (name matching included)
+- parse_wait: waiting for room in the parse pool's queue (parsepool.py)
+- sleep: utils.jitter_sleep
+
+The current tracer and broker travel in a context variable, so stages only
+cost a lookup when nothing is being traced. Traces export as plain JSON or
+as Chrome trace events (open in chrome://tracing or ui.perfetto.dev).
+"""
+import contextvars, json, os, threading, time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+STAGES = ("rate_wait", "http", "backoff", "parse", "parse_wait", "sleep")
+
+_current: "contextvars.ContextVar[Optional[Tuple[Tracer, str]]]" = contextvars.ContextVar("argus_trace", default=None)
+
+
+class Tracer:
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, cat: str, start: float, end: float, broker: Optional[str] = None, **args):
+        """Record a finished span; start/end are time.perf_counter() values."""
+        span = {
+            "name": name, "cat": cat, "broker": broker,
+            "start": start - self._t0, "dur": end - start,
+            "tid": threading.get_ident(), "thread": threading.current_thread().name,
+            "args": args,
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, cat: str, broker: Optional[str] = None, **args):
+        """Time a block; the yielded dict can be filled with extra args."""
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, cat, start, time.perf_counter(), broker, **args)
+
+    def broker_times(self) -> Dict[str, Dict[str, float]]:
+        """Seconds per broker: "total" (its broker span) plus the sum of each stage."""
+        out: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            if not s["broker"]:
+                continue
+            row = out.setdefault(s["broker"], {"total": 0.0, **{st: 0.0 for st in STAGES}})
+            if s["cat"] == "broker":
+                row["total"] += s["dur"]
+            elif s["cat"] in row:
+                row[s["cat"]] += s["dur"]
+        return out
+
+    def slowest(self, n: int = 10) -> List[Tuple[str, Dict[str, float]]]:
+        return sorted(self.broker_times().items(), key=lambda kv: -kv[1]["total"])[:n]
+
+    def to_json(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+        return {"name": self.name, "started_at": self.started_at, "spans": spans}
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Chrome trace-event format: one complete ("X") event per span, one row per thread."""
+        with self._lock:
+            spans = list(self.spans)
+        events = []
+        threads = {}
+        for s in spans:
+            threads.setdefault(s["tid"], s["thread"])
+            args = dict(s["args"])
+            if s["broker"]:
+                args["broker"] = s["broker"]
+            events.append({"name": s["name"], "cat": s["cat"], "ph": "X", "pid": 1, "tid": s["tid"],
+                           "ts": int(s["start"] * 1e6), "dur": max(1, int(s["dur"] * 1e6)), "args": args})
+        for tid, thread in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread}})
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"name": self.name}}
+
+    def save(self, path: str, fmt: str = "json") -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome() if fmt == "chrome" else self.to_json(), f)
+        return path
+
+
+@contextmanager
+def traced_broker(tracer: Optional[Tracer], broker: str):
+    """Make `broker` the current broker for stage() calls in this thread/task, inside a broker span."""
+    if tracer is None:
+        yield
+        return
+    token = _current.set((tracer, broker))
+    try:
+        with tracer.span(broker, "broker", broker):
+            yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str, **args):
+    """Time a stage of the current broker's search (a no-op when not tracing)."""
+    cur = _current.get()
+    if cur is None:
+        yield args
+        return
+    tracer, broker = cur
+    with tracer.span(name, name, broker, **args) as a:
+        yield a
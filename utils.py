@@ -1,32 +1,186 @@
-import time, random
-import requests
+import asyncio, functools, os, threading, time, random, weakref
+from typing import Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from ratelimit import host_key, limiter
+from session import get_session
+from cache import get_cache, normalize_url
+from policy import CircuitOpenError, get_policy
+from replay import ReplayMissError, recording, replaying
+from tracing import stage
+import metrics
+from singleflight import SingleFlight, AsyncSingleFlight
 
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
     "Accept-Language": "en-US,en;q=0.9"
 }
 
-def polite_get(url, *, timeout: float = 12.0, attempts: int = 2, sleep_base: float = 1.0, allow_fail: bool = True, **kwargs):
-    """HTTP GET with sane defaults and quick failure.
+# Blocking socket I/O for async_polite_get runs on this small fixed pool, so an
+# event loop can drive hundreds of searches without a thread per site.
+ASYNC_IO_THREADS = 16
+_io_pool = None
+_io_pool_lock = threading.Lock()
 
-    - Shorter default timeout per attempt
-    - Fewer retries
-    - Returns a dummy empty response if allow_fail and all attempts fail
-    """
-    headers = kwargs.pop("headers", {})
-    merged = {**DEFAULT_HEADERS, **headers}
-    last_exc = None
-    last_resp = None
-    for attempt in range(attempts):
+def _io_executor() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        with _io_pool_lock:
+            if _io_pool is None:
+                size = int(os.getenv("ARGUS_ASYNC_IO_THREADS") or ASYNC_IO_THREADS)
+                _io_pool = ThreadPoolExecutor(max_workers=max(1, size), thread_name_prefix="argus-io")
+    return _io_pool
+
+# Statuses that count as a healthy answer for the per-host policy
+HEALTHY_STATUS = (200, 304, 404, 410)
+
+# Identical concurrent fetches share one request: same normalized URL and the same
+# options that shape the answer (see _flight_key); calls with extra kwargs never do
+_fetches = SingleFlight()
+_async_fetches: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncSingleFlight]" = weakref.WeakKeyDictionary()
+
+def _flight_key(url, allow_fail, timeout, attempts, cache_ttl):
+    return normalize_url(url), allow_fail, timeout, attempts, cache_ttl
+
+def _get_once(url, headers, timeout, **kwargs):
+    r = get_session().get(url, headers={**DEFAULT_HEADERS, **(headers or {})}, timeout=timeout, **kwargs)
+    tape = recording()
+    if tape is not None and not kwargs.get("stream"):
+        tape.record(url, r)
+    return r
+
+def _replay(tape, url, allow_fail):
+    """Answer from the replay archive: no network, rate limit, retries or cache."""
+    with stage("http", url=url, replayed=True) as span:
+        r = tape.lookup(url)
+        if r is not None:
+            _describe(span, r)
+    if r is None:
+        return _give_up(url, allow_fail, None, ReplayMissError(f"{url} is not in {tape.path}"))
+    return r
+
+def _describe(span, r):
+    # Trace args for an http stage; elapsed is requests' time until headers arrived
+    span["status"] = r.status_code
+    span["bytes"] = len(r.content or b"")
+    elapsed = getattr(r, "elapsed", None)
+    if elapsed is not None:
+        span["ttfb_ms"] = int(elapsed.total_seconds() * 1000)
+
+def _count(url, r, seconds, attempt):
+    labels = {"host": host_key(url)}
+    metrics.inc("argus_http_requests_total", {**labels, "status": r.status_code})
+    metrics.inc("argus_http_bytes_total", labels, len(r.content or b""))
+    metrics.observe("argus_http_seconds", seconds)
+    if attempt:
+        metrics.inc("argus_http_retries_total", labels)
+
+def _count_error(url, attempt):
+    labels = {"host": host_key(url)}
+    metrics.inc("argus_http_errors_total", labels)
+    if attempt:
+        metrics.inc("argus_http_retries_total", labels)
+
+def _discard(fut):
+    # Losing hedge leg: drop its response so the connection goes back to the pool
+    if not fut.cancelled() and fut.exception() is None:
         try:
-            r = requests.get(url, headers=merged, timeout=timeout, **kwargs)
-            last_resp = r
-            if r.status_code in (200, 404):
-                return r
-        except Exception as e:
-            last_exc = e
-        # backoff between attempts
-        time.sleep(sleep_base * (attempt + 1))
+            fut.result().close()
+        except Exception:
+            pass
+
+def _hedged_get(url, headers, timeout, **kwargs):
+    """_get_once, plus a second identical request if the first is slower than the host's p90.
+
+    The first leg to answer wins; the other is cancelled if it has not started,
+    otherwise its response is discarded when it arrives.
+    """
+    policy = get_policy()
+    delay = policy.hedge_delay(url)
+    # No hedge possible (host not hedged, no credit left): plain request on this thread
+    if delay is None or delay >= timeout or not policy.hedge_allowed(url):
+        return _get_once(url, headers, timeout, **kwargs)
+    pool = _io_executor()
+    legs = [pool.submit(_get_once, url, headers, timeout, **kwargs)]
+    done, _ = wait(legs, timeout=delay)
+    if not done and policy.hedge_allowed(url) and limiter.try_acquire(url):
+        policy.hedged(url)
+        legs.append(pool.submit(_get_once, url, headers, timeout, **kwargs))
+    pending, winner = set(legs), None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = next((f for f in legs if f in done and f.exception() is None), None)
+        if winner is not None or not pending:
+            break
+    for f in pending:
+        if not f.cancel():
+            f.add_done_callback(_discard)
+    if winner is None:
+        raise legs[0].exception()
+    if winner is not legs[0]:
+        policy.hedge_won(url)
+    return winner.result()
+
+async def _async_hedged_get(url, headers, timeout, **kwargs):
+    """Awaitable _hedged_get; both legs run on the shared I/O pool."""
+    loop = asyncio.get_running_loop()
+    policy = get_policy()
+    call = functools.partial(_get_once, url, headers, timeout, **kwargs)
+    legs = [loop.run_in_executor(_io_executor(), call)]
+    delay = policy.hedge_delay(url)
+    if delay is None or delay >= timeout or not policy.hedge_allowed(url):
+        return await legs[0]
+    done, _ = await asyncio.wait(legs, timeout=delay)
+    if not done and policy.hedge_allowed(url) and limiter.try_acquire(url):
+        policy.hedged(url)
+        legs.append(loop.run_in_executor(_io_executor(), call))
+    pending, winner = set(legs), None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        winner = next((f for f in legs if f in done and f.exception() is None), None)
+        if winner is not None or not pending:
+            break
+    for f in pending:
+        f.add_done_callback(_discard)
+    if winner is None:
+        raise legs[0].exception()
+    if winner is not legs[0]:
+        policy.hedge_won(url)
+    return winner.result()
+
+def _cache_begin(url, cache_ttl, headers, kwargs):
+    """Look url up in the response cache.
+
+    Returns (cache, entry, response): response is set on a fresh hit; entry is
+    a stale entry whose validators were merged into headers for revalidation.
+    """
+    rc = get_cache()
+    # While recording, every response comes from the network so the archive is complete
+    if rc is None or "params" in kwargs or kwargs.get("stream") or recording() is not None:
+        return None, None, None
+    ttl = rc.ttl_for(url, cache_ttl)
+    if ttl <= 0:
+        return None, None, None
+    entry = rc.lookup(url)
+    if entry is not None and rc.is_fresh(entry, ttl):
+        return rc, entry, rc.hit(entry)
+    if entry is not None:
+        for k, v in rc.conditional_headers(entry).items():
+            headers.setdefault(k, v)
+    return rc, entry, None
+
+def _cache_finish(rc, entry, url, r):
+    """Resolve a network response against the cache; returns the response to use or None."""
+    if r.status_code == 304:
+        # Without a cache entry the validators were the caller's own (see monitor.py)
+        return rc.revalidated_response(entry) if entry is not None else r
+    if r.status_code in (200, 404):
+        if rc is not None:
+            rc.miss()
+            rc.store(url, r)
+        return r
+    return None
+
+def _give_up(url, allow_fail, last_resp, last_exc):
     if allow_fail:
         class _Dummy:
             status_code = 0
@@ -43,5 +197,133 @@ def polite_get(url, *, timeout: float = 12.0, attempts: int = 2, sleep_base: flo
         raise last_exc
     raise RuntimeError("polite_get failed without response or exception")
 
+def polite_get(url, *, timeout: float = 12.0, attempts: int = 2, sleep_base: float = 1.0, allow_fail: bool = True,
+               cache_ttl: Optional[float] = None, **kwargs):
+    """HTTP GET with sane defaults and quick failure.
+
+    - Shorter default timeout per attempt
+    - Fewer retries
+    - Returns a dummy empty response if allow_fail and all attempts fail
+    - Waits on the per-host rate limiter before every attempt, so politeness
+      is enforced per host rather than by sleeping after each search
+    - Goes through the shared pooled session, so keep-alive connections are
+      reused across brokers and worker threads
+    - Serves fresh copies from the on-disk response cache and revalidates
+      stale ones with ETag/Last-Modified (cache_ttl overrides the per-host TTL)
+    - Concurrent calls for the same URL with the same timeout, attempts,
+      allow_fail and cache_ttl (and no other options) share a single request
+    - timeout is a ceiling: policy.get_policy() shortens it from the host's
+      observed p95 latency, spaces retries with jittered exponential backoff
+      and fails fast (no request) while the host's circuit is open
+    - For hosts with "hedge": true, an attempt slower than the host's p90
+      latency is hedged with a second request (see policy.py for the budget)
+    - ARGUS_REPLAY=record archives every response; ARGUS_REPLAY=replay serves
+      them back without any network access (see replay.py)
+    """
+    if kwargs:
+        return _polite_get(url, timeout=timeout, attempts=attempts, sleep_base=sleep_base,
+                           allow_fail=allow_fail, cache_ttl=cache_ttl, **kwargs)
+    return _fetches.do(_flight_key(url, allow_fail, timeout, attempts, cache_ttl), _polite_get, url,
+                       timeout=timeout, attempts=attempts, sleep_base=sleep_base, allow_fail=allow_fail,
+                       cache_ttl=cache_ttl)
+
+def _polite_get(url, *, timeout: float = 12.0, attempts: int = 2, sleep_base: float = 1.0, allow_fail: bool = True,
+                cache_ttl: Optional[float] = None, **kwargs):
+    tape = replaying()
+    if tape is not None:
+        return _replay(tape, url, allow_fail)
+    headers = dict(kwargs.pop("headers", {}))
+    rc, entry, cached = _cache_begin(url, cache_ttl, headers, kwargs)
+    if cached is not None:
+        return cached
+    last_exc = None
+    last_resp = None
+    policy = get_policy()
+    for attempt in range(attempts):
+        if not policy.allow(url):
+            last_exc = last_exc or CircuitOpenError(f"circuit open for {url}")
+            break
+        with stage("rate_wait"):
+            limiter.acquire(url)
+        started = time.monotonic()
+        try:
+            with stage("http", url=url) as span:
+                r = _hedged_get(url, headers, policy.timeout_for(url, timeout), **kwargs)
+                _describe(span, r)
+            policy.record(url, r.status_code in HEALTHY_STATUS, time.monotonic() - started)
+            _count(url, r, time.monotonic() - started, attempt)
+            last_resp = r
+            done = _cache_finish(rc, entry, url, r)
+            if done is not None:
+                return done
+        except Exception as e:
+            policy.record(url, False)
+            _count_error(url, attempt)
+            last_exc = e
+        if attempt + 1 < attempts:
+            with stage("backoff"):
+                time.sleep(policy.backoff(attempt, sleep_base))
+    return _give_up(url, allow_fail, last_resp, last_exc)
+
+async def async_polite_get(url, *, timeout: float = 12.0, attempts: int = 2, sleep_base: float = 1.0, allow_fail: bool = True,
+                           cache_ttl: Optional[float] = None, **kwargs):
+    """Awaitable polite_get: same arguments, retries and return value.
+
+    Rate-limit waits and backoff are awaited on the event loop; only the
+    request itself runs on the shared I/O pool.
+    """
+    if kwargs:
+        return await _async_polite_get(url, timeout=timeout, attempts=attempts, sleep_base=sleep_base,
+                                       allow_fail=allow_fail, cache_ttl=cache_ttl, **kwargs)
+    loop = asyncio.get_running_loop()
+    flights = _async_fetches.get(loop)
+    if flights is None:
+        flights = _async_fetches[loop] = AsyncSingleFlight()
+    return await flights.do(_flight_key(url, allow_fail, timeout, attempts, cache_ttl), _async_polite_get, url,
+                            timeout=timeout, attempts=attempts, sleep_base=sleep_base, allow_fail=allow_fail,
+                            cache_ttl=cache_ttl)
+
+async def _async_polite_get(url, *, timeout: float = 12.0, attempts: int = 2, sleep_base: float = 1.0, allow_fail: bool = True,
+                            cache_ttl: Optional[float] = None, **kwargs):
+    tape = replaying()
+    if tape is not None:
+        return _replay(tape, url, allow_fail)
+    headers = dict(kwargs.pop("headers", {}))
+    rc, entry, cached = _cache_begin(url, cache_ttl, headers, kwargs)
+    if cached is not None:
+        return cached
+    last_exc = None
+    last_resp = None
+    policy = get_policy()
+    for attempt in range(attempts):
+        if not policy.allow(url):
+            last_exc = last_exc or CircuitOpenError(f"circuit open for {url}")
+            break
+        delay = limiter.reserve(url)
+        if delay > 0:
+            with stage("rate_wait"):
+                await asyncio.sleep(delay)
+        started = time.monotonic()
+        try:
+            with stage("http", url=url) as span:
+                r = await _async_hedged_get(url, headers, policy.timeout_for(url, timeout), **kwargs)
+                _describe(span, r)
+            policy.record(url, r.status_code in HEALTHY_STATUS, time.monotonic() - started)
+            _count(url, r, time.monotonic() - started, attempt)
+            last_resp = r
+            done = _cache_finish(rc, entry, url, r)
+            if done is not None:
+                return done
+        except Exception as e:
+            policy.record(url, False)
+            _count_error(url, attempt)
+            last_exc = e
+        if attempt + 1 < attempts:
+            with stage("backoff"):
+                await asyncio.sleep(policy.backoff(attempt, sleep_base))
+    return _give_up(url, allow_fail, last_resp, last_exc)
+
 def jitter_sleep(min_s=0.2, max_s=0.5):
-    time.sleep(random.uniform(min_s, max_s))
+    # Kept for external callers; brokers rely on ratelimit.limiter instead.
+    with stage("sleep"):
+        time.sleep(random.uniform(min_s, max_s))
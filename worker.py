@@ -0,0 +1,163 @@
+"""Worker daemon: runs discovery jobs from the local job queue (jobqueue.py).
+
+    python app.py worker --concurrency 2
+
+Each worker sends a heartbeat, submits jobs for schedules that have come
+due, and runs up to `concurrency` jobs at once, each a normal run_discovery
+with a result stream, journal run and trace. Progress goes to the job row,
+where `app.py jobs` and the GUIs read it. Ctrl-C / SIGTERM stop claiming new
+jobs and wait for the running ones to finish; a second Ctrl-C aborts.
+
+discover() is the GUI entry point: it hands the scan to a running worker and
+polls the job, or runs it in-process when no worker is up.
+"""
+import os, signal, socket, threading, time, traceback, uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from models import BrokerResult, ClientProfile
+from jobqueue import FAILED, CANCELLED, DONE, HEARTBEAT_EVERY, JobQueue, get_queue, profile_of
+from journal import Run, get_journal, open_run
+
+PROGRESS_EVERY = 0.5  # seconds between progress writes to the queue
+
+
+def execute(profile: ClientProfile, options: Optional[Dict] = None,
+            progress_cb=None) -> Tuple[List[BrokerResult], Optional[Run], int]:
+    """Run one discovery job in this process, the way a worker does.
+
+    Returns the results, the journal run and the id the run was stored under
+    in the results store.
+
+    options: include_disabled, batch_search, incremental (compare with the
+    last scan and record this one as the new baseline), source (run label in
+    the results store, default "job").
+    """
+    # Imported here: app imports the queue for its CLI
+    from app import run_discovery, save_trace
+    from monitor import Monitor
+    from sinks import StreamSink
+    from tracing import Tracer
+    import store
+    options = options or {}
+    monitor = Monitor.for_profile(profile) if options.get("incremental") else None
+    tracer = Tracer(profile.name)
+    sink = StreamSink()
+    run = open_run([profile])
+    started = time.time()
+    try:
+        results = run_discovery(profile, progress_cb=progress_cb, include_disabled=options.get("include_disabled", False),
+                                batch_search=options.get("batch_search"), monitor=monitor, tracer=tracer,
+                                sink=sink, journal=run)
+    finally:
+        sink.close()
+    save_trace(profile, tracer)
+    stored_id = store.record(profile, results, options.get("source") or "job", started_at=started,
+                             timings=tracer.broker_times())
+    if monitor is not None:
+        monitor.save()
+    return results, run, stored_id
+
+
+class Worker:
+    def __init__(self, queue: Optional[JobQueue] = None, concurrency: int = 2, poll: float = 2.0):
+        self.queue = queue or get_queue()
+        self.concurrency = max(1, concurrency)
+        self.poll = poll
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _on_signal(self, signum, frame):
+        print("Stopping: waiting for running jobs to finish (Ctrl-C again to abort)")
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        self.stop()
+
+    def run(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self._on_signal)
+            signal.signal(signal.SIGTERM, self._on_signal)
+        print(f"Worker {self.id}: up to {self.concurrency} jobs at once, queue {self.queue.path}")
+        running = set()
+        beat_at = 0.0
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as pool:
+                while not self._stop.is_set():
+                    if time.monotonic() - beat_at >= HEARTBEAT_EVERY:
+                        self.queue.heartbeat(self.id)
+                        requeued = self.queue.requeue_stale()
+                        if requeued:
+                            print(f"Requeued {requeued} job(s) from a stopped worker")
+                        beat_at = time.monotonic()
+                    for job_id in self.queue.enqueue_due():
+                        print(f"Scheduled job #{job_id} queued")
+                    running = {f for f in running if not f.done()}
+                    while len(running) < self.concurrency and not self._stop.is_set():
+                        job = self.queue.claim(self.id)
+                        if job is None:
+                            break
+                        running.add(pool.submit(self._run_job, job))
+                    self._stop.wait(self.poll)
+        finally:
+            self.queue.unregister(self.id)
+
+    def _run_job(self, job: Dict):
+        profile = profile_of(job)
+        print(f"Job #{job['id']}: {profile.name} started")
+        last = [0.0]
+
+        def progress_cb(percent: int, message: str = ""):
+            now = time.monotonic()
+            if percent >= 100 or now - last[0] >= PROGRESS_EVERY:
+                last[0] = now
+                self.queue.progress(job["id"], percent, message)
+
+        try:
+            results, run, stored_id = execute(profile, job["options"], progress_cb)
+        except Exception as e:
+            self.queue.fail(job["id"], f"{e}\n{traceback.format_exc()}")
+            print(f"Job #{job['id']}: {profile.name} failed: {e}")
+            return
+        found = sum(1 for r in results if r.found)
+        self.queue.finish(job["id"], found, len(results), run.id if run is not None else None, stored_id)
+        print(f"Job #{job['id']}: {profile.name} done, {found}/{len(results)} likely listings")
+
+
+def discover(profile: ClientProfile, progress_cb=None, poll: float = 1.0,
+             **options) -> Tuple[List[BrokerResult], Optional[Run], int]:
+    """Results, journal run and results-store run id of a discovery scan, through a worker when one is running.
+
+    With a live worker the scan is submitted as a job and polled, so it keeps
+    going if the window is closed; otherwise it runs here via execute(). If
+    every worker stops while the job waits or runs, the job is taken back and
+    finished here (its journal run skips brokers already done).
+    progress_cb is called as progress_cb(percent, message) from this thread.
+    """
+    queue = get_queue()
+    if not queue.workers_alive():
+        return execute(profile, options, progress_cb)
+    job_id = queue.submit(profile, options, priority=1)  # someone is waiting on it
+    seen = None
+    while True:
+        job = queue.get(job_id)
+        if job["status"] in (DONE, FAILED, CANCELLED):
+            break
+        if not queue.workers_alive():
+            queue.requeue_stale()
+            if queue.cancel(job_id):
+                return execute(profile, options, progress_cb)
+        state = (job["progress"], job["message"] or ("Running" if job["status"] == "running" else "Waiting for a worker"))
+        if progress_cb and state != seen:
+            progress_cb(*state)
+            seen = state
+        time.sleep(poll)
+    if job["status"] != DONE:
+        reason = (job["error"] or "cancelled").splitlines()[0]
+        raise RuntimeError(f"Job #{job_id} {job['status']}: {reason}")
+    if progress_cb:
+        progress_cb(100, "Discovery complete")
+    j = get_journal()
+    run = Run(j, job["run_id"], resumed=False) if j is not None and job["run_id"] else None
+    import store
+    return store.get_store().results(job["stored_id"]), run, job["stored_id"]